@@ -0,0 +1,64 @@
+import argparse
+import sys
+
+from benchmarks.engine import measure, mid_game
+from game.action import can_place_road, can_place_settlement, robbable_players_on_tile
+from tests.bitboard_reference import (
+    check, reference_can_place_road, reference_can_place_settlement, reference_distance_rule, reference_robbable_players_on_tile,
+)
+
+'''
+Bitboard Benchmark
+
+Differential check and timings of the bit mask rules (game/bitboard.py) against the versions that walk the
+vertex/edge objects, kept as the reference in tests/bitboard_reference.py (the game/action.py functions before the bitboards).
+Random games (both board kinds) are played with random legal moves; after every action every rule is evaluated
+for every vertex, edge, tile and player both ways, and on a copy and a snapshot/restore of the game now and then.
+Exit code 1 if anything differs.
+
+    python -m benchmarks.bitboard
+    python -m benchmarks.bitboard --games 200 --seed 7
+'''
+def timings(seed: int = 1) -> dict:
+    # Microseconds for a whole board scan, reference -> bitboard
+    results = {}
+    for name, compact in (("board", False), ("compact_board", True)):
+        game = mid_game(seed, compact_board=compact)
+        board = game.board
+        results[name] = {
+            "can_place_settlement_all": (
+                measure(lambda: [reference_can_place_settlement(board, v, 1) for v in range(54)]),
+                measure(lambda: [can_place_settlement(board, v, 1) for v in range(54)]),
+            ),
+            "can_place_road_all": (
+                measure(lambda: [reference_can_place_road(board, e, 1) for e in range(72)]),
+                measure(lambda: [can_place_road(board, e, 1) for e in range(72)]),
+            ),
+            "distance_rule_all": (
+                measure(lambda: [reference_distance_rule(board, v) for v in range(54)]),
+                measure(lambda: [board.candidates.bits.distance_rule(v) for v in range(54)]),
+            ),
+            "robbable_players_all": (
+                measure(lambda: [reference_robbable_players_on_tile(board, game.players, t, 1) for t in range(19)]),
+                measure(lambda: [robbable_players_on_tile(board, game.players, t, 1) for t in range(19)]),
+            ),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bitboard rules against the object walking versions")
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for name, rows in timings(args.seed).items():
+        print(f"{name:26} {'reference us':>13} {'bitboard us':>12}")
+        for check_name, (reference_us, bitboard_us) in rows.items():
+            print(f"  {check_name:24} {reference_us:13.2f} {bitboard_us:12.2f} {reference_us / bitboard_us:6.1f}x")
+
+    positions, found = check(args.games, args.seed)
+    print(f"{positions} positions of {args.games} games checked, {len(found)} differences")
+    for difference in found[:20]:
+        print(f"  {difference}")
+    sys.exit(1 if found else 0)
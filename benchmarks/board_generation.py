@@ -0,0 +1,115 @@
+import argparse
+import math
+from collections import Counter
+
+from benchmarks.engine import measure
+from game import static_board
+from game.board_generator import HEXES, NUMBERS, PORTS, RED_TILE_SETS, BoardPool, random_layout
+from game.rng import GameRandom
+
+'''
+Board Generation Benchmark
+
+Compares game/board_generator.py with the rejection sampling it replaced (rejection_layout, kept here as the reference):
+time per layout, and chi-square homogeneity tests on samples of both that they produce the same distribution
+(number per tile, resource per tile, desert tile, port types, port config, which tiles get the 6s and 8s).
+The tests need no scipy, p-values use the Wilson-Hilferty approximation of the chi-square distribution.
+
+    python -m benchmarks.board_generation
+    python -m benchmarks.board_generation --samples 200000 --seed 3
+'''
+def rejection_layout(rng: GameRandom) -> tuple[int, tuple, tuple, tuple]:
+    # The old Board.generate_layout: reshuffle all numbers until no 6/8 are adjacent
+    port_config = rng.randint(0, 1)
+    hexes = list(HEXES)
+    ports = list(PORTS)
+    numbers = list(NUMBERS)
+    rng.shuffle(hexes)
+    rng.shuffle(ports)
+    while True:
+        rng.shuffle(numbers)
+        red = {i for i, number in enumerate(numbers) if number in (6, 8)}
+        if not any(neighbor in red for tile in red for neighbor in static_board.TILE_TILE[tile]):
+            break
+    resources = ['Desert' if number == 0 else hexes.pop() for number in numbers]
+    return port_config, tuple(resources), tuple(numbers), tuple(ports)
+
+
+def features(layout: tuple) -> dict:
+    # Category -> value of one layout, every category is tested on its own
+    port_config, resources, numbers, ports = layout
+    result = {"port_config": port_config, "desert": numbers.index(0)}
+    result["red_tiles"] = tuple(i for i, number in enumerate(numbers) if number in (6, 8))
+    for tile in range(19):
+        result[f"number_{tile}"] = numbers[tile]
+        result[f"resource_{tile}"] = resources[tile]
+    for i in range(9):
+        result[f"port_{i}"] = ports[i]
+    return result
+
+
+def chi2_sf(x: float, df: int) -> float:
+    # P(X >= x) for X ~ chi-square(df), Wilson-Hilferty: (X/df)^(1/3) is close to normal
+    if df <= 0:
+        return 1.0
+    z = ((x / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def homogeneity(a: Counter, b: Counter) -> tuple[float, int, float]:
+    # Chi-square test that two samples come from the same distribution: (statistic, degrees of freedom, p-value)
+    n_a, n_b = sum(a.values()), sum(b.values())
+    statistic, categories = 0.0, 0
+    for key in set(a) | set(b):
+        total = a[key] + b[key]
+        categories += 1
+        for count, n in ((a[key], n_a), (b[key], n_b)):
+            expected = total * n / (n_a + n_b)
+            statistic += (count - expected) ** 2 / expected
+    return statistic, categories - 1, chi2_sf(statistic, categories - 1)
+
+
+def sample(generate, samples: int, seed: int) -> dict[str, Counter]:
+    rng = GameRandom(seed)
+    counts = {}
+    for _ in range(samples):
+        for name, value in features(generate(rng)).items():
+            counts.setdefault(name, Counter())[value] += 1
+    return counts
+
+
+def compare(samples: int, seed: int) -> dict[str, tuple[float, int, float]]:
+    old = sample(rejection_layout, samples, seed)
+    new = sample(random_layout, samples, seed + 1)
+    return {name: homogeneity(old[name], new[name]) for name in old}
+
+
+def timings(pool_size: int = 1000) -> dict[str, float]:
+    rng = GameRandom(1)
+    pool = BoardPool(pool_size, seed=1)
+    return {
+        "rejection_layout": measure(lambda: rejection_layout(rng)),
+        "random_layout": measure(lambda: random_layout(rng)),
+        "pool_draw": measure(lambda: pool.draw(rng)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Board generation: speed and distribution against rejection sampling")
+    parser.add_argument("--samples", type=int, default=100000, help="layouts per generator for the tests")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--alpha", type=float, default=0.001, help="significance level after Bonferroni correction")
+    args = parser.parse_args()
+
+    for name, value in timings().items():
+        print(f"{name:20} {value:8.2f} us/layout")
+
+    results = compare(args.samples, args.seed)
+    alpha = args.alpha / len(results) # Bonferroni, one test per category
+    print(f"{len(RED_TILE_SETS)} possible 6/8 tile sets, {args.samples} layouts per generator, {len(results)} tests")
+    failed = [name for name, (_, _, p) in results.items() if p < alpha]
+    for name in ("port_config", "desert", "red_tiles", "number_0", "resource_0", "port_0"):
+        statistic, df, p = results[name]
+        print(f"{name:12} chi2 {statistic:9.1f}  df {df:4}  p {p:.3f}")
+    print(f"smallest p {min(p for _, _, p in results.values()):.4f}")
+    print(f"different distributions: {', '.join(failed)}" if failed else "same distribution")
@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+
+from game import action_space, static_board
+from game.action import calculate_longest_road, can_place_road, can_place_settlement, port_ratios_for_player, roll_dice
+from game.board import Board, BoardPool, CompactBoard
+from game.logic import Game
+from game.road_network import RoadNetwork, collect_component, longest_trail
+
+'''
+Engine Microbenchmarks
+
+Times the hot paths of the game engine and compares them with a stored baseline (benchmarks/baseline.json).
+Runs offline, only needs the game package.
+
+    python -m benchmarks.engine            # run and compare with the baseline, exit code 1 on a regression
+                                           # or a benchmark that has no baseline yet
+    python -m benchmarks.engine --save     # run and store the results as the new baseline
+    python -m benchmarks.engine --only roll_dice board_to_json
+
+Times are the best of several repeats, in microseconds per call. The baseline is machine specific,
+save a new one when moving to another machine.
+'''
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+THRESHOLD = 1.25 # slower than baseline * THRESHOLD counts as regression
+DENSE_TILES = (4, 5, 9) # three adjacent tiles, 15 roads with loops
+
+
+def mid_game(seed: int = 1, actions: int = 150, compact_board: bool = False) -> Game:
+    # A 4 player game after the initial placement and a few turns, played by random legal moves
+    game = Game(compact_board, seed=seed)
+    for player_id in range(1, 5):
+        game.add_player(player_id)
+    game.start_game()
+    rng = random.Random(seed)
+    for _ in range(actions):
+        player_id = game.waiting_for()[0]
+        legal = [i for i, ok in enumerate(game.legal_actions(player_id)) if ok]
+        legal = [i for i in legal if i not in (action_space.DISCARD_RESOURCES, action_space.PROPOSE_TRADE)]
+        if not legal:
+            break
+        game.call_action(player_id, action_space.decode_action(rng.choice(legal), port_ratios_for_player(player_id, game.players)), return_state=False)
+    return game
+
+
+def dense_roads(board: Board, player_id: int = 1) -> list[int]:
+    edges = sorted({edge for tile in DENSE_TILES for edge in static_board.TILE_EDGE[tile]})[:15]
+    for edge in edges:
+        board.edges[edge].owner = player_id
+    return edges
+
+
+def benchmarks() -> dict:
+    game = mid_game()
+    board = game.board
+    players = game.players
+    bank = dict(game.bank)
+    player_id = game.current_turn
+
+    def roll():
+        players[player_id]["dice_rolled"] = False
+        game.bank.update(bank)
+        roll_dice(board, players, player_id, game.bank)
+
+    dense = Board()
+    edges = dense_roads(dense)
+    dense_players = {1: {"longest_road_length": 0}}
+    component = collect_component(dense, 1, edges[0])
+    pool = BoardPool(1000, seed=1)
+
+    def add_road():
+        network = RoadNetwork()
+        network.add_road(dense, 1, edges[-1])
+
+    return {
+        "create_board": lambda: Board(),
+        "create_compact_board": lambda: CompactBoard(),
+        "create_board_from_pool": lambda: Board(pool=pool),
+        "roll_dice": roll,
+        "calculate_longest_road_dense": lambda: calculate_longest_road(dense, 1, dense_players),
+        "longest_trail_dense": lambda: longest_trail(dense, 1, component),
+        "road_network_add_road_dense": add_road,
+        "can_place_settlement_all": lambda: [can_place_settlement(board, v, player_id) for v in range(54)],
+        "can_place_road_all": lambda: [can_place_road(board, e, player_id) for e in range(72)],
+        "legal_actions": lambda: game.legal_actions(player_id),
+        "get_multiplayer_game_state": lambda: game.get_multiplayer_game_state(),
+        "board_to_json": lambda: board.board_to_json(),
+        "board_to_json_with_topology": lambda: board.board_to_json(include_topology=True),
+    }
+
+
+def measure(function, repeat: int = 5) -> float:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def run(only: list[str] | None = None) -> dict:
+    results = {}
+    for name, function in benchmarks().items():
+        if only and name not in only:
+            continue
+        results[name] = measure(function)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float = THRESHOLD) -> list[str]:
+    regressions = []
+    print(f"{'benchmark':32} {'us/call':>10} {'baseline':>10} {'ratio':>7}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        ratio = value / base if base else None
+        flag = ""
+        if ratio is not None and ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        base_text = f"{base:10.2f}" if base else f"{'-':>10}"
+        ratio_text = f"{ratio:6.2f}x" if ratio else f"{'-':>7}"
+        print(f"{name:32} {value:10.2f} {base_text} {ratio_text}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Game engine microbenchmarks")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--only", nargs="+", default=None)
+    args = parser.parse_args()
+
+    results = run(args.only)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    else:
+        missing = [name for name in results if name not in baseline]
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold}x: {', '.join(regressions)}")
+        if missing: # a new benchmark is not checked until the baseline has it
+            print(f"{len(missing)} benchmark(s) without a baseline, save a new one: {', '.join(missing)}")
+        if regressions or missing:
+            sys.exit(1)
@@ -0,0 +1,77 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.engine import measure, mid_game
+from rl.env import CatanEnv, CatanParallelEnv, ObservationEncoder
+
+'''
+Env Benchmark
+
+Steps per second of the gymnasium envs (rl/env.py) with uniformly random legal actions: CatanEnv (the opponents'
+greedy moves happen inside step) and CatanParallelEnv (one step per action, all seats from the benchmark).
+Also the time to encode one observation against building the JSON state a client gets.
+
+    python -m benchmarks.env
+    python -m benchmarks.env --steps 50000
+'''
+def single_agent(steps: int, seed: int = 1) -> dict:
+    env = CatanEnv(seed=seed)
+    rng = np.random.default_rng(seed)
+    obs, _ = env.reset()
+    episodes = actions = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        obs, _, terminated, truncated, _ = env.step(rng.choice(np.flatnonzero(obs["action_mask"])))
+        if terminated or truncated:
+            episodes += 1
+            actions += env.actions
+            obs, _ = env.reset()
+    seconds = time.perf_counter() - start
+    return {"steps_per_second": steps / seconds, "episodes": episodes, "actions_per_episode": actions / max(episodes, 1)}
+
+
+def multi_agent(steps: int, seed: int = 1) -> dict:
+    env = CatanParallelEnv(seed=seed)
+    rng = np.random.default_rng(seed)
+    obs, infos = env.reset()
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions = {
+            player_id: rng.choice(np.flatnonzero(obs[player_id]["action_mask"]))
+            for player_id in env.agents if infos[player_id]["acting"]
+        }
+        obs, _, _, _, infos = env.step(actions)
+        if not env.agents:
+            episodes += 1
+            obs, infos = env.reset()
+    seconds = time.perf_counter() - start
+    return {"steps_per_second": steps / seconds, "episodes": episodes}
+
+
+def encoding(seed: int = 1) -> dict:
+    game = mid_game(seed, compact_board=True)
+    encoder = ObservationEncoder()
+    encoder.attach(game)
+    return {
+        "encode_us": measure(lambda: encoder.fill(1)),
+        "json_state_us": measure(lambda: json.dumps(game.get_multiplayer_game_state()[1])),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gymnasium env speed")
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    single = single_agent(args.steps, args.seed)
+    print(f"CatanEnv          {single['steps_per_second']:9.0f} steps/s "
+          f"({single['episodes']} episodes, {single['actions_per_episode']:.0f} actions each)")
+    multi = multi_agent(args.steps, args.seed)
+    print(f"CatanParallelEnv  {multi['steps_per_second']:9.0f} steps/s ({multi['episodes']} episodes)")
+    for name, us in encoding(args.seed).items():
+        print(f"{name:17} {us:9.2f} us")
@@ -0,0 +1,59 @@
+import argparse
+import time
+
+from benchmarks.engine import mid_game
+from rl.mcts import MCTSPolicy
+
+'''
+MCTS Benchmark
+
+Runs the search bot (rl/mcts.py) on positions of random games and reports iterations per move and per second
+and the time a move took against the time limit, for every number of workers given.
+
+    python -m benchmarks.mcts
+    python -m benchmarks.mcts --time-limit 0.25 --workers 1 2 4 --positions 20
+'''
+def positions(count: int) -> list[tuple]:
+    # (game, player_id, legal) for positions with a real choice
+    found = []
+    seed = 0
+    while len(found) < count:
+        seed += 1
+        game = mid_game(seed, actions=40 + 40 * (seed % 6))
+        player_id = game.waiting_for()[0]
+        legal = MCTSPolicy(seed).legal(game, player_id)
+        if len(legal) > 1:
+            found.append((game, player_id, legal))
+    return found
+
+
+def run(time_limit: float, workers: int, count: int) -> dict:
+    policy = MCTSPolicy(seed=1, time_limit=time_limit, workers=workers)
+    policy.choose(*positions(1)[0]) # starts the process pool
+    iterations, seconds = [], []
+    for game, player_id, legal in positions(count):
+        start = time.perf_counter()
+        policy.choose(game, player_id, legal)
+        seconds.append(time.perf_counter() - start)
+        iterations.append(policy.last["iterations"])
+    seconds.sort()
+    return {
+        "iterations_per_move": sum(iterations) / count,
+        "iterations_per_second": sum(iterations) / sum(seconds),
+        "median_seconds": seconds[count // 2],
+        "max_seconds": seconds[-1],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCTS bot speed and latency")
+    parser.add_argument("--time-limit", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--positions", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'iter/move':>10} {'iter/s':>8} {'median s':>9} {'max s':>7}  (limit {args.time_limit} s)")
+    for workers in args.workers:
+        r = run(args.time_limit, workers, args.positions)
+        print(f"{workers:7} {r['iterations_per_move']:10.0f} {r['iterations_per_second']:8.0f} "
+              f"{r['median_seconds']:9.3f} {r['max_seconds']:7.3f}")
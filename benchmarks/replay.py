@@ -0,0 +1,67 @@
+import argparse
+import random
+import time
+
+from benchmarks.engine import measure
+from game import action_space
+from game.action import port_ratios_for_player
+from game.action_log import ActionLog, Replay
+from game.logic import Game
+
+'''
+Replay Benchmark
+
+Plays a 4 player game with random legal moves (game/action_log.py records it) and reports
+the log size and how long a full replay and a random step (Replay.game_at with its saved copies) take.
+
+    python -m benchmarks.replay
+'''
+def recorded_game(seed: int = 1, max_actions: int = 5000) -> ActionLog:
+    game = Game(seed=seed)
+    for player_id in range(1, 5):
+        game.add_player(player_id)
+    game.start_game()
+    log = ActionLog(game)
+    rng = random.Random(seed)
+    for _ in range(max_actions):
+        player_id = game.waiting_for()[0]
+        legal = [i for i, ok in enumerate(game.legal_actions(player_id)) if ok]
+        legal = [i for i in legal if i not in (action_space.DISCARD_RESOURCES, action_space.PROPOSE_TRADE)] or legal
+        index = rng.choice(legal)
+        action = action_space.decode_action(index, port_ratios_for_player(player_id, game.players))
+        if index == action_space.DISCARD_RESOURCES:
+            cards = [resource for resource, amount in game.players[player_id]["hand"].items() for _ in range(amount)]
+            action = {"type": "discard_resources", "resources": {}}
+            for resource in rng.sample(cards, game.pending_discard[player_id]):
+                action["resources"][resource] = action["resources"].get(resource, 0) + 1
+        result = log.call_action(player_id, action, return_state=False)
+        if result is not False and result is not True: # a player won
+            break
+    return log
+
+
+def run(seed: int = 1) -> dict:
+    data = recorded_game(seed).to_bytes()
+    steps = len(Replay(data))
+    rng = random.Random(seed)
+    replay = Replay(data)
+    start = time.perf_counter()
+    for _ in range(100):
+        replay.game_at(rng.randint(0, steps))
+    random_step = (time.perf_counter() - start) / 100 # the saved copies fill up on the way
+    return {
+        "steps": steps,
+        "log_bytes": len(data),
+        "full_replay_ms": measure(lambda: Replay(data).game_at(steps), repeat=3) / 1000,
+        "random_step_ms": random_step * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Action log replay")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    r = run(args.seed)
+    print(f"{r['steps']} actions, log {r['log_bytes']} bytes ({r['log_bytes'] / r['steps']:.1f} per action)")
+    print(f"full replay {r['full_replay_ms']:.2f} ms, random step {r['random_step_ms']:.2f} ms")
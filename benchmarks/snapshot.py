@@ -0,0 +1,45 @@
+import argparse
+import copy
+import pickle
+
+from benchmarks.engine import measure, mid_game
+from game.snapshot import restore_game, snapshot_game
+
+'''
+Snapshot Benchmark
+
+Compares the ways to clone a mid game Game: copy.deepcopy, pickle, Game.copy() and
+game/snapshot.py (snapshot_game + restore_game, with and without the random generator state).
+For both board kinds, times in microseconds and the size of the serialized forms.
+
+    python -m benchmarks.snapshot
+'''
+def compare(seed: int = 1) -> dict:
+    results = {}
+    for name, compact in (("board", False), ("compact_board", True)):
+        game = mid_game(seed, compact_board=compact)
+        data = snapshot_game(game)
+        data_no_rng = snapshot_game(game, rng=False)
+        pickled = pickle.dumps(game, pickle.HIGHEST_PROTOCOL)
+        results[name] = {
+            "deepcopy": (measure(lambda: copy.deepcopy(game)), None),
+            "pickle": (measure(lambda: pickle.loads(pickle.dumps(game, pickle.HIGHEST_PROTOCOL))), len(pickled)),
+            "game_copy": (measure(lambda: game.copy()), None),
+            "snapshot_restore": (measure(lambda: restore_game(snapshot_game(game))), len(data)),
+            "snapshot_restore_no_rng": (measure(lambda: restore_game(snapshot_game(game, rng=False))), len(data_no_rng)),
+            "snapshot_only": (measure(lambda: snapshot_game(game, rng=False)), None),
+            "restore_only": (measure(lambda: restore_game(data_no_rng)), None),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Game cloning and snapshots")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for name, rows in compare(args.seed).items():
+        deepcopy_us = rows["deepcopy"][0]
+        print(f"{name:26} {'us':>10} {'vs deepcopy':>12} {'bytes':>8}")
+        for method, (us, size) in rows.items():
+            print(f"  {method:24} {us:10.2f} {deepcopy_us / us:11.1f}x {size if size else '':>8}")
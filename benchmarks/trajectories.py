@@ -0,0 +1,106 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rl.env import CatanEnv
+from rl.trajectories import RECORD, TrajectoryReader, TrajectoryWriter, action_mask, observation
+
+'''
+Trajectory Store Benchmark
+
+Write and read throughput of rl/trajectories.py. Writers (one per process, all in the same directory) append
+observations of real positions (CatanEnv with random actions, encoded once up front so the engine is not measured)
+in games of GAME_RECORDS records. Readers sample random batches (memory-mapped, decoded to float32 observations
+and bool masks like a training step would) and read games front to back.
+The files are fresh, so reads mostly come from the page cache.
+
+    python -m benchmarks.trajectories
+    python -m benchmarks.trajectories --records 200000 --writers 1 2 4 --directory /data/bench
+'''
+GAME_RECORDS = 500
+
+
+def positions(count: int = 1000, seed: int = 1) -> list[dict]:
+    env = CatanEnv(seed=seed)
+    rng = np.random.default_rng(seed)
+    found = []
+    obs, _ = env.reset()
+    while len(found) < count:
+        found.append({name: array.copy() for name, array in obs.items()})
+        obs, _, terminated, truncated, _ = env.step(rng.choice(np.flatnonzero(obs["action_mask"])))
+        if terminated or truncated:
+            obs, _ = env.reset()
+    return found
+
+
+def write_task(task: tuple) -> float:
+    # Runs in a worker process, returns its seconds
+    directory, records, observations = task
+    writer = TrajectoryWriter(directory)
+    start = time.perf_counter()
+    for i in range(records):
+        obs = observations[i % len(observations)]
+        writer.append(i // GAME_RECORDS, i % 4 + 1, obs, int(np.flatnonzero(obs["action_mask"])[0]))
+        if (i + 1) % GAME_RECORDS == 0:
+            writer.end_episode(i // GAME_RECORDS, {1: 1.0})
+    writer.close()
+    return time.perf_counter() - start
+
+
+def write(directory: str, records: int, writers: int, observations: list[dict]) -> dict:
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=writers) as pool:
+        seconds = list(pool.map(write_task, [(directory, records // writers, observations)] * writers))
+    wall = time.perf_counter() - start
+    written = records // writers * writers
+    return {"records_per_second": written / max(seconds), "wall_seconds": wall, "mb_per_second": written * RECORD.itemsize / max(seconds) / 1e6}
+
+
+def read(directory: str, batches: int, batch_size: int, seed: int = 1) -> dict:
+    reader = TrajectoryReader(directory)
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for _ in range(batches):
+        batch = reader.sample(batch_size, rng)
+        observation(batch), action_mask(batch)
+    sampled = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count = 0
+    for _, first, length in reader.games:
+        count += len(reader.read(np.arange(first, first + length)))
+    sequential = time.perf_counter() - start
+    return {
+        "records": len(reader),
+        "random_records_per_second": batches * batch_size / sampled,
+        "sequential_records_per_second": count / sequential,
+        "sequential_mb_per_second": count * RECORD.itemsize / sequential / 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trajectory store throughput")
+    parser.add_argument("--records", type=int, default=100000, help="records written per run")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--directory", default=None, help="default: a temporary directory")
+    args = parser.parse_args()
+
+    observations = positions()
+    print(f"record {RECORD.itemsize} bytes")
+    for writers in args.writers:
+        directory = tempfile.mkdtemp(prefix="trajectories-", dir=args.directory)
+        try:
+            w = write(directory, args.records, writers, observations)
+            r = read(directory, args.batches, args.batch_size)
+        finally:
+            shutil.rmtree(directory)
+        print(f"{writers} writers: write {w['records_per_second']:9.0f} records/s ({w['mb_per_second']:.0f} MB/s)  "
+              f"random read {r['random_records_per_second']:9.0f} records/s  "
+              f"sequential read {r['sequential_records_per_second']:9.0f} records/s ({r['sequential_mb_per_second']:.0f} MB/s)")
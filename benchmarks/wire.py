@@ -0,0 +1,62 @@
+import argparse
+import json
+
+from benchmarks.engine import measure, mid_game
+from game import action_space
+from game.action import port_ratios_for_player
+from server import wire
+from server.state_sync import StateSync
+
+'''
+Wire Format Benchmark
+
+Compares the JSON frames with the binary frames of server/wire.py for a mid game state:
+frame size and encode/decode time, for full states and for a typical state delta (one action).
+
+    python -m benchmarks.wire
+'''
+def frames(seed: int = 1) -> dict:
+    game = mid_game(seed)
+    player_id = game.current_turn
+    sync = StateSync(delta=True)
+    full = game.get_multiplayer_game_state()[player_id]
+    sync.frame(full)
+    sync.ack(full["version"])
+
+    # one more accepted action for the delta
+    for index, ok in enumerate(game.legal_actions(game.waiting_for()[0])):
+        actor = game.waiting_for()[0]
+        if ok and index not in (action_space.DISCARD_RESOURCES, action_space.PROPOSE_TRADE):
+            if game.call_action(actor, action_space.decode_action(index, port_ratios_for_player(actor, game.players)), return_state=False):
+                break
+    delta = sync.frame(game.get_multiplayer_game_state()[player_id])
+    return {"full_state": full, "state_delta": delta}
+
+
+def compare(seed: int = 1) -> dict:
+    results = {}
+    for name, frame in frames(seed).items():
+        text = json.dumps(frame, separators=(",", ":"))
+        data = wire.encode_frame(frame)
+        results[name] = {
+            "json_bytes": len(text),
+            "binary_bytes": len(data),
+            "json_encode_us": measure(lambda: json.dumps(frame, separators=(",", ":"))),
+            "binary_encode_us": measure(lambda: wire.encode_frame(frame)),
+            "json_decode_us": measure(lambda: json.loads(text)),
+            "binary_decode_us": measure(lambda: wire.decode_frame(data)),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON vs binary state frames")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'frame':12} {'':8} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    for name, r in compare(args.seed).items():
+        for encoding in ("json", "binary"):
+            print(f"{name:12} {encoding:8} {r[encoding + '_bytes']:8} {r[encoding + '_encode_us']:10.2f} {r[encoding + '_decode_us']:10.2f}")
+        print(f"{'':12} {'ratio':8} {r['json_bytes'] / r['binary_bytes']:7.1f}x "
+              f"{r['json_encode_us'] / r['binary_encode_us']:9.1f}x {r['json_decode_us'] / r['binary_decode_us']:9.1f}x")
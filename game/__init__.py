@@ -1,4 +1,9 @@
 from .board import *
 from .action import *
 from .static_board import *
-from .logic import *
\ No newline at end of file
+from .road_network import *
+from .production import *
+from .placement import *
+from .logic import *
+from .snapshot import *
+from .rng import *
\ No newline at end of file
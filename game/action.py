@@ -2,39 +2,25 @@ from game import Board
 import random
 
 # Basic Actions
-def roll_dice(board: Board, players, player_id: int, bank: dict) -> int: 
+def roll_dice(board: Board, players, player_id: int, bank: dict, number: int | None = None, rng: random.Random = random) -> int: 
+    # number: dice total to use instead of rolling (replays, see game/action_log.py), rng: the game's generator (game/rng.py)
     if players[player_id]["dice_rolled"] == True or players[player_id]["current_turn"] == False:
         return False
     players[player_id]["dice_rolled"] = True
 
     # distribute resources
     # we have to check if there are enough resources in the bank and then distribute accordingly
-    number = random.randint(1, 6) + random.randint(1, 6)
+    if number is None:
+        number = rng.randint(1, 6) + rng.randint(1, 6)
     if number == 7: return 7 # Robber 
 
-    total_ressource = {"wood": 0, "brick": 0, "sheep": 0, "wheat": 0, "ore": 0}
-    for tile in board.tiles:
-        if tile.number == number and tile.robber == False:
-            for vertex in tile.vertices:
-                if board.vertices[vertex].owner != None:
-                    if board.vertices[vertex].building == "settlement":
-                        total_ressource[tile.resource] += 1
-                    elif board.vertices[vertex].building == "city":
-                        total_ressource[tile.resource] += 2
-    
+    total_ressource, per_player = board.production.roll(number)
     for resource, amount in total_ressource.items():
         if bank[resource] >= amount:
             bank[resource] -= amount
             # Distribute resources to players if enough in bank
-            for tile in board.tiles:
-                if tile.number == number and tile.robber == False and tile.resource == resource:
-                    for vertex in tile.vertices:
-                        if board.vertices[vertex].owner != None:
-                            owner = board.vertices[vertex].owner
-                            if board.vertices[vertex].building == "settlement":
-                                players[owner]["hand"][resource] += 1
-                            elif board.vertices[vertex].building == "city":
-                                players[owner]["hand"][resource] += 2
+            for owner, owner_amount in per_player[resource].items():
+                players[owner]["hand"][resource] += owner_amount
     
     # If not enough resources in bank, no resources are distributed
     return number
@@ -63,6 +49,7 @@ def move_robber(board: Board , new_tile_id: int) -> bool:
 
     for vertex in board.tiles[new_tile_id].vertices:
         board.vertices[vertex].blocked = True
+    board.production.move_robber(new_tile_id)
 
     # Steal logic is handled in steal_resource function
     return True
@@ -106,6 +93,8 @@ def place_settlement(board, vertex_id: int, player_id: int, players: dict, bank:
     bank["wheat"] += 1
     board.vertices[vertex_id].owner = player_id
     board.vertices[vertex_id].building = "settlement"
+    board.production.add_building(board, vertex_id, player_id, "settlement")
+    board.candidates.add_settlement(board, vertex_id, player_id)
 
     return True
 
@@ -128,6 +117,8 @@ def place_city(board: Board, vertex_id: int, player_id: int, players: dict, bank
     bank["ore"] += 3
     bank["wheat"] += 2
     board.vertices[vertex_id].building = "city"
+    board.production.add_building(board, vertex_id, player_id, "city")
+    board.candidates.add_city(vertex_id, player_id)
 
     return True
 
@@ -148,41 +139,22 @@ def place_road(board: Board, edge_id: int, player_id: int, players: dict, bank:
     bank["brick"] += 1
     bank["wood"] += 1
     board.edges[edge_id].owner = player_id
+    board.candidates.add_road(board, edge_id, player_id)
     return True
     
 
+# The rule checks use the bit masks of game/bitboard.py (kept up to date with board.candidates)
 def can_place_settlement(board: Board, vertex_id: int, player_id: int) -> bool: 
-    if board.vertices[vertex_id].owner != None and board.vertices[vertex_id].building != None:
-        return False
-    has_connection = False
-    for edge in board.vertices[vertex_id].edges:
-        if board.edges[edge].owner == player_id:
-                has_connection = True
-                break
-    if not has_connection:
-        return False
-    # Blocked by distance rule
-    for neighbor in board.vertices[vertex_id].vertices:
-        if board.vertices[neighbor].building != None or board.vertices[neighbor].owner != None:
-            return False
-    return True
+    # Empty, not blocked by the distance rule and next to one of the player's roads
+    return board.candidates.bits.can_place_settlement(vertex_id, player_id)
 
 
 def can_place_city(board: Board, vertex_id: int, player_id: int) -> bool: 
-    if board.vertices[vertex_id].owner == player_id and board.vertices[vertex_id].building == "settlement": 
-        return True
-    return False
+    return board.candidates.bits.can_place_city(vertex_id, player_id)
     
 
 def can_place_road(board: Board, edge_id: int, player_id: int) -> bool: 
-    if board.edges[edge_id].owner == None:
-        for vertex in board.edges[edge_id].vertices:
-            if board.vertices[vertex].owner == player_id:
-                return True
-        for edge_id2 in board.edges[edge_id].edges:
-            if board.edges[edge_id2].owner == player_id:
-                return True
-    return False
+    return board.candidates.bits.can_place_road(edge_id, player_id)
 
 
 # Development Card Actions
@@ -421,6 +393,9 @@ def trade_possible(player_id: int, offer: dict, request: dict, players: dict, ba
 
 # Misc Actions
 def calculate_longest_road(board, player_id: int, players: dict) -> None: 
+    # Not used by the engine any more (game/road_network.py), kept as the reference for benchmarks and tests.
+    # visited_edges is shared by all branches from a start edge, so it is exact on trees but can undercount
+    # through loops (13 instead of 14 for benchmarks.engine.dense_roads); RoadNetwork scores the full trail.
     max_length = 0
     for vertex in board.vertices:
         for edge in vertex.edges:
@@ -474,20 +449,22 @@ def update_longest_road(players: dict) -> None:
             return
 
 
-def steal_resource(board: Board, stealer_id: int, victim_id: int, players: dict) -> bool: 
+def steal_resource(board: Board, stealer_id: int, victim_id: int, players: dict, resource: str | None = None, rng: random.Random = random) -> str | bool: 
+    # Returns the stolen resource (True if the victim has no cards), resource: steal this one instead of drawing (replays)
     if not can_steal(board, stealer_id, victim_id):
         return False
     if sum(players[victim_id]["hand"].values()) == 0: # No resources to steal
         return True
     
-    resource = random.choices(
-        population=list(players[victim_id]["hand"].keys()),
-        weights=list(players[victim_id]["hand"].values()),
-        k=1
-    )[0]
+    if resource is None:
+        resource = rng.choices(
+            population=list(players[victim_id]["hand"].keys()),
+            weights=list(players[victim_id]["hand"].values()),
+            k=1
+        )[0]
     players[victim_id]["hand"][resource] -= 1
     players[stealer_id]["hand"][resource] += 1
-    return True
+    return resource
 
 
 def can_steal(board: Board, stealer_id: int, victim_id: int) -> bool: 
@@ -496,30 +473,19 @@ def can_steal(board: Board, stealer_id: int, victim_id: int) -> bool:
         return False
     if board.robber_tile == None:
         return False
-    for vertex in board.tiles[board.robber_tile].vertices:
-        if board.vertices[vertex].owner == victim_id:
-            return True
-    return False 
+    return board.candidates.bits.has_building_on_tile(board.robber_tile, victim_id)
 
 def robbable_players_on_tile(board: Board, players: dict, tile_id: int, current: int) -> list[int]:
-    vertices = board.tiles[tile_id].vertices
-    seen = set()
-    for vertex in vertices:
-        if board.vertices[vertex].building is not None and board.vertices[vertex].owner != current:
-            if sum(players[board.vertices[vertex].owner]["hand"].values()) > 0:
-                seen.add(board.vertices[vertex].owner)
-    
-    return sorted(seen)
+    return [player_id for player_id in board.candidates.bits.players_on_tile(tile_id) if player_id != current and any(players[player_id]["hand"].values())]
 
 
 def initial_placement_round(board: Board, vertex_id: int, player_id: int, players: dict) -> bool:
-    if board.vertices[vertex_id].owner != None and board.vertices[vertex_id].building != None:
+    if not board.candidates.bits.distance_rule(vertex_id):
         return False
-    for neighbor in board.vertices[vertex_id].vertices:
-        if board.vertices[neighbor].building != None or board.vertices[neighbor].owner != None:
-            return False
     board.vertices[vertex_id].owner = player_id
     board.vertices[vertex_id].building = "settlement"
+    board.production.add_building(board, vertex_id, player_id, "settlement")
+    board.candidates.add_settlement(board, vertex_id, player_id)
     players[player_id]["settlements"] -= 1
     players[player_id]["victory_points"] += 1
     
@@ -535,5 +501,6 @@ def initial_placement_round_road(board: Board, edge_id: int, player_id: int, pla
     if board.vertices[vertex_id].owner != player_id:
         return False
     board.edges[edge_id].owner = player_id
+    board.candidates.add_road(board, edge_id, player_id)
     players[player_id]["roads"] -= 1
     return True
\ No newline at end of file
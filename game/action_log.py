@@ -0,0 +1,165 @@
+import json
+import struct
+
+from game.logic import Game
+from game.snapshot import SnapshotError, is_seeded, restore_game, snapshot_game
+
+'''
+Action Log and Replay
+
+ActionLog records every accepted call_action of a game in an append-only byte stream:
+the start state once (a game/snapshot.py snapshot, it holds the board and the shuffled development cards),
+then one record per action with the player id, the action and the random outcomes it used (Game.draws).
+Replay re-applies the records to the start state, so any step of the game can be rebuilt exactly without storing states
+(persistence, post-mortem debugging, training data). The start state includes the game's generator (game/rng.py),
+so the replay draws the same outcomes again and checks them against the records; without it the recorded outcomes are used.
+
+Layout (little endian): header "<2sBI" = MAGIC, LOG_VERSION, snapshot length, snapshot, then records:
+"<BBBH" = player id, ACTION_TYPES index (OTHER: the type is in the JSON), draw, JSON length,
+followed by the other fields of the action as compact JSON (nothing for actions that only have a type).
+draw: the dice total for roll_dice, 1 + HAND index of the stolen resource for robber_steal, 0 for none.
+'''
+MAGIC = b"GL"
+LOG_VERSION = 1
+OTHER = 255
+
+HEADER = struct.Struct("<2sBI")
+RECORD = struct.Struct("<BBBH")
+HAND = ("wood", "brick", "sheep", "wheat", "ore")
+ACTION_TYPES = (
+    "place_settlement", "place_road", "place_city", "roll_dice", "end_turn", "discard_resources", "move_robber",
+    "robber_steal", "buy_development_card", "play_knight_card", "play_road_building_card", "play_year_of_plenty_card",
+    "play_monopoly_card", "Year of Plenty", "Monopoly", "bank_trade", "propose_trade", "accept_trade", "confirm_trade",
+    "decline_trade", "end_trade",
+)
+REPLAY_EVERY = 64 # Replay keeps a copy of the game every REPLAY_EVERY steps
+
+
+class ReplayError(ValueError):
+    pass
+
+
+def encode_record(player_id: int, action: dict, draws: dict) -> bytes:
+    action_type = action.get("type")
+    if action_type in ACTION_TYPES:
+        code = ACTION_TYPES.index(action_type)
+        fields = {key: value for key, value in action.items() if key != "type"}
+    else:
+        code, fields = OTHER, action
+    draw = 0
+    if "dice" in draws:
+        draw = draws["dice"]
+    elif "steal" in draws:
+        draw = 1 + HAND.index(draws["steal"])
+    data = json.dumps(fields, separators=(",", ":")).encode() if fields else b""
+    return RECORD.pack(player_id, code, draw, len(data)) + data
+
+
+def decode_records(data: bytes, offset: int) -> tuple[list[tuple[int, dict, dict]], int]:
+    # [(player_id, action, draws)] and the end of the last complete record (a crash can cut off the last one)
+    records = []
+    while offset + RECORD.size <= len(data):
+        player_id, code, draw, length = RECORD.unpack_from(data, offset)
+        if offset + RECORD.size + length > len(data):
+            break
+        start = offset + RECORD.size
+        fields = json.loads(data[start:start + length]) if length else {}
+        offset = start + length
+        if code == OTHER:
+            action = fields
+        else:
+            action = {"type": ACTION_TYPES[code], **fields}
+        draws = {}
+        if draw and action.get("type") == "roll_dice":
+            draws["dice"] = draw
+        elif draw and action.get("type") == "robber_steal":
+            draws["steal"] = HAND[draw - 1]
+        records.append((player_id, action, draws))
+    return records, offset
+
+
+class ActionLog:
+    def __init__(self, game: Game, out=None, start: bool = True) -> None:
+        # Create it after start_game. out: binary file that gets every record right away, otherwise the log stays in memory
+        # start=False continues an existing log of this game (out opened for appending), the start state is not written again
+        self.game = game
+        self.out = out
+        self.buffer = bytearray()
+        if start:
+            state = snapshot_game(game)
+            self.write(HEADER.pack(MAGIC, LOG_VERSION, len(state)) + state)
+
+    def write(self, data: bytes) -> None:
+        if self.out is None:
+            self.buffer += data
+        else:
+            self.out.write(data)
+            self.out.flush()
+
+    def record(self, player_id: int, action: dict, draws: dict) -> None:
+        self.write(encode_record(player_id, action, draws))
+
+    def call_action(self, player_id: int, action: dict, return_state: bool = True):
+        # Game.call_action that records accepted actions
+        result = self.game.call_action(player_id, action, return_state)
+        if result is not False:
+            self.record(player_id, action, self.game.draws)
+        return result
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.buffer)
+
+    def close(self) -> None:
+        if self.out is not None:
+            self.out.close()
+
+
+class Replay:
+    def __init__(self, data: bytes, every: int = REPLAY_EVERY) -> None:
+        magic, version, length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError("Not an action log")
+        if version != LOG_VERSION:
+            raise ReplayError(f"Unsupported log version {version}")
+        try:
+            self.start = restore_game(data[HEADER.size:HEADER.size + length])
+        except SnapshotError as e:
+            raise ReplayError(f"Broken start state: {e}")
+        self.records, self.end = decode_records(data, HEADER.size + length)
+        self.seeded = is_seeded(data[HEADER.size:HEADER.size + length])
+        self.every = every
+        self.saved = {0: self.start} # step -> game after that many actions
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def apply(self, game: Game, step: int) -> None:
+        player_id, action, draws = self.records[step]
+        if game.call_action(player_id, action, return_state=False, draws=None if self.seeded else draws) is False:
+            raise ReplayError(f"Step {step} was not accepted: player {player_id} {action}")
+        if game.draws != draws:
+            raise ReplayError(f"Step {step} drew {game.draws} instead of {draws}")
+
+    def game_at(self, step: int) -> Game:
+        # The game after the first step actions (0: the start state), a new Game that can be changed freely
+        if not 0 <= step <= len(self.records):
+            raise IndexError(step)
+        base = max(saved for saved in self.saved if saved <= step)
+        game = self.saved[base].copy()
+        for i in range(base, step):
+            self.apply(game, i)
+            if (i + 1) % self.every == 0 and i + 1 not in self.saved:
+                self.saved[i + 1] = game.copy()
+        return game
+
+    def __iter__(self):
+        # (game before the action, player_id, action, draws) for every step, the game is reused, copy it to keep it
+        game = self.start.copy()
+        for step, (player_id, action, draws) in enumerate(self.records):
+            yield game, player_id, action, draws
+            self.apply(game, step)
+
+
+def read_log(path: str, every: int = REPLAY_EVERY) -> Replay:
+    with open(path, "rb") as f:
+        return Replay(f.read(), every)
@@ -0,0 +1,78 @@
+'''
+Action Space
+
+Fixed-size enumeration of every action a player can send to Game.call_action, used by Game.legal_actions.
+Index -> action payload with decode_action. Two entries only mark the action type, their payload is open-ended:
+DISCARD_RESOURCES ("resources" must add up to what the player owes) and PROPOSE_TRADE ("offer"/"request").
+Bank trades are enumerated as unit trades (give the player's ratio of one resource for 1 of another).
+'''
+RESOURCES = ("wood", "brick", "sheep", "wheat", "ore")
+PLAYER_IDS = (1, 2, 3, 4)
+YEAR_OF_PLENTY_PICKS = [(RESOURCES[a], RESOURCES[b]) for a in range(5) for b in range(a, 5)] # 15
+BANK_TRADES = [(give, receive) for give in RESOURCES for receive in RESOURCES if give != receive] # 20
+
+# Action layout
+ROLL_DICE = 0
+END_TURN = 1
+BUY_DEVELOPMENT_CARD = 2
+PLAY_KNIGHT = 3
+PLAY_ROAD_BUILDING = 4
+PLAY_YEAR_OF_PLENTY = 5
+PLAY_MONOPOLY = 6
+DISCARD_RESOURCES = 7
+PROPOSE_TRADE = 8
+ACCEPT_TRADE = 9
+DECLINE_TRADE = 10
+END_TRADE = 11
+PLACE_SETTLEMENT = 12 # + vertex id
+PLACE_CITY = PLACE_SETTLEMENT + 54 # + vertex id
+PLACE_ROAD = PLACE_CITY + 54 # + edge id
+MOVE_ROBBER = PLACE_ROAD + 72 # + tile id
+ROBBER_STEAL = MOVE_ROBBER + 19 # + index in PLAYER_IDS
+CONFIRM_TRADE = ROBBER_STEAL + 4 # + index in PLAYER_IDS
+YEAR_OF_PLENTY = CONFIRM_TRADE + 4 # + index in YEAR_OF_PLENTY_PICKS
+MONOPOLY = YEAR_OF_PLENTY + 15 # + index in RESOURCES
+BANK_TRADE = MONOPOLY + 5 # + index in BANK_TRADES
+N_ACTIONS = BANK_TRADE + 20
+
+SIMPLE_ACTIONS = {
+    ROLL_DICE: "roll_dice",
+    END_TURN: "end_turn",
+    BUY_DEVELOPMENT_CARD: "buy_development_card",
+    PLAY_KNIGHT: "play_knight_card",
+    PLAY_ROAD_BUILDING: "play_road_building_card",
+    PLAY_YEAR_OF_PLENTY: "play_year_of_plenty_card",
+    PLAY_MONOPOLY: "play_monopoly_card",
+    DISCARD_RESOURCES: "discard_resources",
+    PROPOSE_TRADE: "propose_trade",
+    ACCEPT_TRADE: "accept_trade",
+    DECLINE_TRADE: "decline_trade",
+    END_TRADE: "end_trade",
+}
+
+
+def decode_action(index: int, ratios: dict | None = None) -> dict:
+    # Action index -> call_action payload, ratios (port_ratios_for_player) are needed for bank trades
+    if index in SIMPLE_ACTIONS:
+        return {"type": SIMPLE_ACTIONS[index]}
+    if index < PLACE_CITY:
+        return {"type": "place_settlement", "vertex_id": index - PLACE_SETTLEMENT}
+    if index < PLACE_ROAD:
+        return {"type": "place_city", "vertex_id": index - PLACE_CITY}
+    if index < MOVE_ROBBER:
+        return {"type": "place_road", "edge_id": index - PLACE_ROAD}
+    if index < ROBBER_STEAL:
+        return {"type": "move_robber", "target_tile": index - MOVE_ROBBER}
+    if index < CONFIRM_TRADE:
+        return {"type": "robber_steal", "victim_id": PLAYER_IDS[index - ROBBER_STEAL]}
+    if index < YEAR_OF_PLENTY:
+        return {"type": "confirm_trade", "target": PLAYER_IDS[index - CONFIRM_TRADE]}
+    if index < MONOPOLY:
+        return {"type": "Year of Plenty", "resources": list(YEAR_OF_PLENTY_PICKS[index - YEAR_OF_PLENTY])}
+    if index < BANK_TRADE:
+        return {"type": "Monopoly", "resource": RESOURCES[index - MONOPOLY]}
+    if index < N_ACTIONS:
+        give, receive = BANK_TRADES[index - BANK_TRADE]
+        ratio = ratios[give] if ratios else 4
+        return {"type": "bank_trade", "offer": {give: ratio}, "request": {receive: 1}}
+    raise ValueError(f"Unknown action index {index}")
@@ -0,0 +1,122 @@
+from game import static_board
+
+'''
+Bitboards
+
+Buildings and roads as Python int bit masks: bit v of a vertex mask is vertex v (54 bits), bit e of an edge mask
+is edge e (72 bits). The neighbourhoods from static_board are precomputed as masks, so the placement and robber
+rules are a couple of AND/OR operations instead of walks over vertex and edge objects:
+- distance rule: nothing built on the vertex or next to it, blocked & VERTEX_BIT[v] == 0
+- settlement: distance rule and one of the player's roads at the vertex (roads[p] & VERTEX_EDGES[v])
+- road: the edge is empty and touches one of the player's buildings or roads
+- robber: players with a building on the tile (buildings[p] & TILE_VERTICES[t])
+Bitboards lives in PlacementCandidates (game/placement.py) and is updated with it by the building functions in
+game/action.py, which use it for can_place_settlement, can_place_road, the initial placement distance rule,
+can_steal and robbable_players_on_tile. tests/test_bitboard.py checks it against the object walking versions (tests/bitboard_reference.py).
+'''
+def mask(ids) -> int:
+    bits = 0
+    for i in ids:
+        bits |= 1 << i
+    return bits
+
+
+def ids(bits: int) -> list[int]:
+    # Set bits of a mask, lowest first
+    found = []
+    while bits:
+        low = bits & -bits
+        found.append(low.bit_length() - 1)
+        bits ^= low
+    return found
+
+
+ALL_VERTICES = (1 << 54) - 1
+ALL_EDGES = (1 << 72) - 1
+VERTEX_BIT = tuple(1 << v for v in range(54))
+EDGE_BIT = tuple(1 << e for e in range(72))
+VERTEX_VERTICES = tuple(mask(neighbours) for neighbours in static_board.VERTEX_VERTEX)
+VERTEX_EDGES = tuple(mask(edges) for edges in static_board.VERTEX_EDGE)
+EDGE_VERTICES = tuple(mask(vertices) for vertices in static_board.EDGE_VERTEX)
+EDGE_EDGES = tuple(mask(neighbours) for neighbours in static_board.EDGE_EDGE)
+TILE_VERTICES = tuple(mask(vertices) for vertices in static_board.TILE_VERTEX)
+TILE_EDGES = tuple(mask(edges) for edges in static_board.TILE_EDGE)
+
+
+class Bitboards:
+    def __init__(self) -> None:
+        self.buildings: dict[int, int] = {} # player -> vertex mask, settlements and cities
+        self.cities: dict[int, int] = {} # player -> vertex mask
+        self.roads: dict[int, int] = {} # player -> edge mask
+        self.occupied = 0 # vertices with a building
+        self.blocked = 0 # vertices with a building or next to one (distance rule)
+        self.all_roads = 0 # edges with a road
+
+    def copy(self) -> 'Bitboards':
+        bitboards = Bitboards.__new__(Bitboards)
+        bitboards.buildings = dict(self.buildings)
+        bitboards.cities = dict(self.cities)
+        bitboards.roads = dict(self.roads)
+        bitboards.occupied = self.occupied
+        bitboards.blocked = self.blocked
+        bitboards.all_roads = self.all_roads
+        return bitboards
+
+    # Updates
+    def add_settlement(self, vertex_id: int, player_id: int) -> None:
+        bit = VERTEX_BIT[vertex_id]
+        self.buildings[player_id] = self.buildings.get(player_id, 0) | bit
+        self.occupied |= bit
+        self.blocked |= bit | VERTEX_VERTICES[vertex_id]
+
+    def add_city(self, vertex_id: int, player_id: int) -> None:
+        self.cities[player_id] = self.cities.get(player_id, 0) | VERTEX_BIT[vertex_id]
+
+    def add_road(self, edge_id: int, player_id: int) -> None:
+        bit = EDGE_BIT[edge_id]
+        self.roads[player_id] = self.roads.get(player_id, 0) | bit
+        self.all_roads |= bit
+
+    # Rules
+    def distance_rule(self, vertex_id: int) -> bool:
+        # Nothing built on the vertex or its neighbours
+        return not self.blocked & VERTEX_BIT[vertex_id]
+
+    def can_place_settlement(self, vertex_id: int, player_id: int) -> bool:
+        return not self.blocked & VERTEX_BIT[vertex_id] and bool(self.roads.get(player_id, 0) & VERTEX_EDGES[vertex_id])
+
+    def can_place_city(self, vertex_id: int, player_id: int) -> bool:
+        bit = VERTEX_BIT[vertex_id]
+        return bool(self.buildings.get(player_id, 0) & bit) and not self.cities.get(player_id, 0) & bit
+
+    def can_place_road(self, edge_id: int, player_id: int) -> bool:
+        if self.all_roads & EDGE_BIT[edge_id]:
+            return False
+        return bool(self.buildings.get(player_id, 0) & EDGE_VERTICES[edge_id] or self.roads.get(player_id, 0) & EDGE_EDGES[edge_id])
+
+    def players_on_tile(self, tile_id: int) -> list[int]:
+        # Players with a settlement or city on the tile, sorted
+        corners = TILE_VERTICES[tile_id]
+        if not self.occupied & corners:
+            return []
+        return sorted([player_id for player_id, buildings in self.buildings.items() if buildings & corners])
+
+    def has_building_on_tile(self, tile_id: int, player_id: int) -> bool:
+        return bool(self.buildings.get(player_id, 0) & TILE_VERTICES[tile_id])
+
+    # Whole board
+    def settlement_spots(self, player_id: int) -> int:
+        # Vertex mask of can_place_settlement for every vertex
+        spots = 0
+        for edge_id in ids(self.roads.get(player_id, 0)):
+            spots |= EDGE_VERTICES[edge_id]
+        return spots & ~self.blocked
+
+    def road_spots(self, player_id: int) -> int:
+        # Edge mask of can_place_road for every edge
+        spots = 0
+        for vertex_id in ids(self.buildings.get(player_id, 0)):
+            spots |= VERTEX_EDGES[vertex_id]
+        for edge_id in ids(self.roads.get(player_id, 0)):
+            spots |= EDGE_EDGES[edge_id]
+        return spots & ~self.all_roads
@@ -1,5 +1,10 @@
 import random
+from array import array
 from game import static_board
+from game.rng import GameRandom
+from game.board_generator import BoardPool, random_layout
+from game.production import ProductionIndex
+from game.placement import PlacementCandidates
 '''
 Analysis:
 A board has 19 Hexagon: (TILES)
@@ -32,67 +37,36 @@ Dice should be 2 random six-sided dice. (can be implented as random.randint(1, 6
 
 In total we have 72 street tiles and 54 settlement tiles. Each of them will be saved in an adjacency list.
 '''
+# There are only two possible configurations for the ports (index is the port_config)
+PORT_POSITIONS = (
+    [[5, 6], [15, 25], [36, 46], [52, 53], [49, 50], [38, 39], [16, 27], [7, 8], [2, 3]],
+    [[0, 1], [3, 4], [14,  15], [26, 37], [45, 46], [50, 51], [47, 48], [28, 38], [7, 17]],
+)
+
+
 class Board:
-    def __init__(self) -> None:
+    def __init__(self, rng: random.Random | None = None, pool: BoardPool | None = None) -> None:
+        # rng: the game's generator (game/rng.py), a new unseeded one if None
+        # pool: pre-generated layouts (game/board_generator.py) to draw from instead of generating one
+        rng = rng if rng is not None else GameRandom()
         # The index is also the id of the object, each element is a reference to the object
         self.tiles = [None]*19 # id -> Tile
         self.vertices = None # id -> Vertex
         self.edges = None # id -> Edge
-        self.port_config = random.randint(0, 1)
+        self.port_config = 0
         self.robber_tile = 0 # Tile id where the robber is located, starts on the desert tile
-        self.create_board()
+        self.create_board(pool.draw(rng) if pool is not None else random_layout(rng))
+        self.production = ProductionIndex(self) # dice number -> producing buildings, kept up to date by game/action.py
+        self.candidates = PlacementCandidates(self) # buildable vertices/edges, kept up to date by game/action.py
        
-    def create_board(self) -> None:
-        # Setup Board
-
-        HEXES = [
-            'sheep', 'sheep', 'sheep', 'sheep',
-            'wheat', 'wheat', 'wheat', 'wheat',
-            'wood', 'wood', 'wood', 'wood',
-            'brick', 'brick', 'brick',
-            'ore', 'ore', 'ore',
-        ]
-        PORTS = [
-            '3:1', '3:1', '3:1', '3:1',
-            '2:1 Sheep', '2:1 Wheat', '2:1 Wood', '2:1 Brick', '2:1 Ore'
-        ]
-
-        NUMBERS = [0, 2, 3, 3, 4, 4, 5, 5, 6, 6, 8, 8, 9, 9, 10, 10, 11, 11, 12]
-        
-        random.shuffle(HEXES)
-        random.shuffle(PORTS)
-
-        # Check that 6 and 8 are not adjacent
-        def six_eight_placement() -> bool:
-            idx_six_eight = {i for i, v in enumerate(NUMBERS) if v in (6,8)}
-
-            return not any(
-                (neighbor in idx_six_eight)
-                for idx in idx_six_eight
-                for neighbor in static_board.TILE_TILE[idx]
-            ) # for every idx in idx_six_eight check if any neighbor is also in idx_six_eight
-
-          
-        valid_tiles_numbers = False
-        while not valid_tiles_numbers:
-            random.shuffle(NUMBERS)
-            valid_tiles_numbers = six_eight_placement()
-          
+    def create_board(self, layout: tuple) -> None:
+        # Setup Board from a layout of game/board_generator.py
+        self.port_config, resources, numbers, ports = layout
+        self.robber_tile = numbers.index(0) # the desert
 
         for i in range(19):
-            number = NUMBERS[i]
-
+            self.tiles[i] = static_board.Tile(resources[i], numbers[i], i)
 
-            if number == 0:
-                resource = 'Desert'
-                self.robber_tile = i
-            else:
-                resource = HEXES.pop()
-                
-            
-            self.tiles[i] = static_board.Tile(resource, number, i)
-
-        
         self.vertices = [static_board.Vertex(i) for i in range(54)]
         self.edges = [static_board.Edge(i) for i in range(72)]
 
@@ -115,30 +89,25 @@ class Board:
             edge.edges = static_board.EDGE_EDGE[edge.id]
 
         # Place Ports
-        # There are only two possible configurations for the ports
-        if self.port_config:
-            port_positions = [[0, 1], [3, 4], [14,  15], [26, 37], [45, 46], [50, 51], [47, 48], [28, 38], [7, 17]]
-        else:
-            port_positions = [[5, 6], [15, 25], [36, 46], [52, 53], [49, 50], [38, 39], [16, 27], [7, 8], [2, 3]]
-        
-        for i in range(9):
-                port_pos = port_positions[i]
-                for vertex_id in port_pos:
-                    self.vertices[vertex_id].port = PORTS[i]
+        for i, port_pos in enumerate(self.port_positions()):
+            for vertex_id in port_pos:
+                self.vertices[vertex_id].port = ports[i]
+
+    def port_positions(self) -> list[list[int]]:
+        return PORT_POSITIONS[self.port_config]
 
     
     # Just for Network Transmission
-    def board_to_json(self) -> dict:
-        return {
+    # Only the dynamic fields, the static adjacency is referenced by its hash (see static_board.topology_to_json)
+    def board_to_json(self, include_topology: bool = False) -> dict:
+        board = {
+            "topology": static_board.TOPOLOGY_HASH,
             "tiles": [
                 {
                     "id": tile.id,
                     "resource": tile.resource,
                     "number": tile.number,
-                    "robber": tile.robber,
-                    "tiles": tile.tiles,
-                    "vertices": tile.vertices,
-                    "edges": tile.edges
+                    "robber": tile.robber
                 }
                 for tile in self.tiles
             ],
@@ -147,28 +116,42 @@ class Board:
                     "id": vertex.id,
                     "building": vertex.building,
                     "player": vertex.owner,
-                    "port": vertex.port,
-                    "tiles": vertex.tiles,
-                    "vertices": vertex.vertices,
-                    "edges": vertex.edges
+                    "port": vertex.port
                 }
                 for vertex in self.vertices
             ],
             "edges": [
                 {
                     "id": edge.id,
-                    "player": edge.owner,
-                    "tiles": edge.tiles,
-                    "vertices": edge.vertices,
-                    "edges": edge.edges
+                    "player": edge.owner
                 }
                 for edge in self.edges
             ]
         }
+        if include_topology:
+            topology = static_board.topology_to_json()
+            for kind in ("tiles", "vertices", "edges"):
+                for item, static in zip(board[kind], topology[kind]):
+                    item.update(static)
+        return board
 
-    def reset_board(self) -> None:
+    def copy(self) -> 'Board':
+        # New Tile/Vertex/Edge objects with the same fields, the adjacency tuples are shared
+        board = Board.__new__(Board)
+        board.tiles = [copy_component(tile) for tile in self.tiles]
+        board.vertices = [copy_component(vertex) for vertex in self.vertices]
+        board.edges = [copy_component(edge) for edge in self.edges]
+        board.port_config = self.port_config
+        board.robber_tile = self.robber_tile
+        board.production = self.production.copy()
+        board.candidates = self.candidates.copy()
+        return board
+
+    def reset_board(self, rng: random.Random | None = None) -> None:
         self.tiles = [None]*19
-        self.create_board()
+        self.create_board(random_layout(rng if rng is not None else GameRandom()))
+        self.production = ProductionIndex(self)
+        self.candidates = PlacementCandidates(self)
 
     def print_board(self) -> None:
         for tile in self.tiles:
@@ -193,4 +176,220 @@ class Board:
             print(f"  Adjacent Vertices: {edge.vertices}")
             print(f"  Adjacent Edges: {edge.edges}")
             print()
-    
\ No newline at end of file
+    
+
+def copy_component(component):
+    copy = component.__class__.__new__(component.__class__)
+    copy.__dict__.update(component.__dict__)
+    return copy
+
+
+# Compact Board
+# Same board as above, but the dynamic state lives in flat int8 arrays and the adjacency is read
+# straight from the static_board tables. Tiles/Vertices/Edges are thin views that are created on access,
+# so game/action.py can keep using board.vertices[v].owner etc.
+RESOURCES = ('Desert', 'sheep', 'wheat', 'wood', 'brick', 'ore')
+PORT_TYPES = (None, '3:1', '2:1 Sheep', '2:1 Wheat', '2:1 Wood', '2:1 Brick', '2:1 Ore')
+BUILDINGS = (None, 'settlement', 'city')
+NO_OWNER = -1
+
+
+class TileView:
+    __slots__ = ('board', 'id')
+
+    def __init__(self, board: 'CompactBoard', id: int) -> None:
+        self.board = board
+        self.id = id
+
+    @property
+    def resource(self) -> str:
+        return RESOURCES[self.board.tile_resource[self.id]]
+
+    @property
+    def number(self) -> int:
+        return self.board.tile_number[self.id]
+
+    @property
+    def robber(self) -> bool:
+        return self.board.robber_tile == self.id
+
+    @robber.setter
+    def robber(self, value: bool) -> None:
+        # The robber position is only stored once (board.robber_tile), clearing the old tile is implicit
+        if value:
+            self.board.robber_tile = self.id
+
+    @property
+    def tiles(self) -> tuple:
+        return static_board.TILE_TILE[self.id]
+
+    @property
+    def vertices(self) -> tuple:
+        return static_board.TILE_VERTEX[self.id]
+
+    @property
+    def edges(self) -> tuple:
+        return static_board.TILE_EDGE[self.id]
+
+
+class VertexView:
+    __slots__ = ('board', 'id')
+
+    def __init__(self, board: 'CompactBoard', id: int) -> None:
+        self.board = board
+        self.id = id
+
+    @property
+    def building(self) -> str | None:
+        return BUILDINGS[self.board.vertex_building[self.id]]
+
+    @building.setter
+    def building(self, value: str | None) -> None:
+        self.board.vertex_building[self.id] = BUILDINGS.index(value)
+
+    @property
+    def owner(self) -> int | None:
+        owner = self.board.vertex_owner[self.id]
+        return None if owner == NO_OWNER else owner
+
+    @owner.setter
+    def owner(self, value: int | None) -> None:
+        self.board.vertex_owner[self.id] = NO_OWNER if value is None else value
+
+    @property
+    def port(self) -> str | None:
+        return PORT_TYPES[self.board.vertex_port[self.id]]
+
+    @port.setter
+    def port(self, value: str | None) -> None:
+        self.board.vertex_port[self.id] = PORT_TYPES.index(value)
+
+    @property
+    def blocked(self) -> bool:
+        return bool(self.board.vertex_blocked[self.id])
+
+    @blocked.setter
+    def blocked(self, value: bool) -> None:
+        self.board.vertex_blocked[self.id] = 1 if value else 0
+
+    @property
+    def tiles(self) -> tuple:
+        return static_board.VERTEX_TILE[self.id]
+
+    @property
+    def vertices(self) -> tuple:
+        return static_board.VERTEX_VERTEX[self.id]
+
+    @property
+    def edges(self) -> tuple:
+        return static_board.VERTEX_EDGE[self.id]
+
+
+class EdgeView:
+    __slots__ = ('board', 'id')
+
+    def __init__(self, board: 'CompactBoard', id: int) -> None:
+        self.board = board
+        self.id = id
+
+    @property
+    def owner(self) -> int | None:
+        owner = self.board.edge_owner[self.id]
+        return None if owner == NO_OWNER else owner
+
+    @owner.setter
+    def owner(self, value: int | None) -> None:
+        self.board.edge_owner[self.id] = NO_OWNER if value is None else value
+
+    @property
+    def tiles(self) -> tuple:
+        return static_board.EDGE_TILE[self.id]
+
+    @property
+    def vertices(self) -> tuple:
+        return static_board.EDGE_VERTEX[self.id]
+
+    @property
+    def edges(self) -> tuple:
+        return static_board.EDGE_EDGE[self.id]
+
+
+class BoardView:
+    # Read-only list of views, board.vertices[3] builds a VertexView on demand
+    __slots__ = ('board', 'view', 'size')
+
+    def __init__(self, board: 'CompactBoard', view: type, size: int) -> None:
+        self.board = board
+        self.view = view
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, id: int):
+        if id < 0:
+            id += self.size
+        if not 0 <= id < self.size:
+            raise IndexError(id)
+        return self.view(self.board, id)
+
+    def __iter__(self):
+        for id in range(self.size):
+            yield self.view(self.board, id)
+
+
+class CompactBoard(Board):
+    def __init__(self, rng: random.Random | None = None, pool: BoardPool | None = None) -> None:
+        rng = rng if rng is not None else GameRandom()
+        # Dynamic state, the index is the id of the tile/vertex/edge
+        self.tile_resource = array('b', bytes(19)) # index into RESOURCES
+        self.tile_number = array('b', bytes(19))
+        self.vertex_owner = array('b', [NO_OWNER]*54)
+        self.vertex_building = array('b', bytes(54)) # index into BUILDINGS
+        self.vertex_port = array('b', bytes(54)) # index into PORT_TYPES
+        self.vertex_blocked = array('b', bytes(54))
+        self.edge_owner = array('b', [NO_OWNER]*72)
+
+        self.tiles = BoardView(self, TileView, 19)
+        self.vertices = BoardView(self, VertexView, 54)
+        self.edges = BoardView(self, EdgeView, 72)
+        self.port_config = 0
+        self.robber_tile = 0
+        self.create_board(pool.draw(rng) if pool is not None else random_layout(rng))
+        self.production = ProductionIndex(self)
+        self.candidates = PlacementCandidates(self)
+
+    def create_board(self, layout: tuple) -> None:
+        self.port_config, resources, numbers, ports = layout
+        self.robber_tile = numbers.index(0)
+
+        for i in range(19):
+            self.tile_resource[i] = RESOURCES.index(resources[i])
+            self.tile_number[i] = numbers[i]
+
+        for i, port_pos in enumerate(self.port_positions()):
+            for vertex_id in port_pos:
+                self.vertex_port[vertex_id] = PORT_TYPES.index(ports[i])
+
+    def reset_board(self, rng: random.Random | None = None) -> None:
+        for buffer in (self.vertex_building, self.vertex_port, self.vertex_blocked):
+            buffer[:] = array('b', bytes(54))
+        self.vertex_owner[:] = array('b', [NO_OWNER]*54)
+        self.edge_owner[:] = array('b', [NO_OWNER]*72)
+        self.create_board(random_layout(rng if rng is not None else GameRandom()))
+        self.production = ProductionIndex(self)
+        self.candidates = PlacementCandidates(self)
+
+    def copy(self) -> 'CompactBoard':
+        # Copying a compact board is 7 small buffer copies, the topology is shared
+        board = CompactBoard.__new__(CompactBoard)
+        for name in ('tile_resource', 'tile_number', 'vertex_owner', 'vertex_building', 'vertex_port', 'vertex_blocked', 'edge_owner'):
+            setattr(board, name, array('b', getattr(self, name)))
+        board.tiles = BoardView(board, TileView, 19)
+        board.vertices = BoardView(board, VertexView, 54)
+        board.edges = BoardView(board, EdgeView, 72)
+        board.port_config = self.port_config
+        board.robber_tile = self.robber_tile
+        board.production = self.production.copy()
+        board.candidates = self.candidates.copy()
+        return board
@@ -0,0 +1,78 @@
+import random
+from itertools import combinations
+
+from game import static_board
+from game.rng import GameRandom
+
+'''
+Board Generation
+
+A layout is everything random about a new board: (port_config, resource per tile, number per tile, port type per port position).
+The numbers used to be reshuffled until no 6/8 were adjacent, an unbounded loop of full shuffles.
+random_layout() builds a valid layout directly with the same distribution:
+every valid arrangement has the same number of ways to fill the other 15 tiles, so the rejection loop picks
+the set of 6/8 tiles uniformly among all sets of 4 pairwise non-adjacent tiles (RED_TILE_SETS, computed once),
+the 6/8 order on them uniformly and the other numbers uniformly. That is exactly what is sampled here.
+The desert is the tile that gets the 0, resources and ports are shuffled as before.
+
+BoardPool pre-generates layouts (e.g. at server start) so a Board can take one without generating it.
+'''
+HEXES = (
+    'sheep', 'sheep', 'sheep', 'sheep',
+    'wheat', 'wheat', 'wheat', 'wheat',
+    'wood', 'wood', 'wood', 'wood',
+    'brick', 'brick', 'brick',
+    'ore', 'ore', 'ore',
+)
+PORTS = (
+    '3:1', '3:1', '3:1', '3:1',
+    '2:1 Sheep', '2:1 Wheat', '2:1 Wood', '2:1 Brick', '2:1 Ore'
+)
+NUMBERS = (0, 2, 3, 3, 4, 4, 5, 5, 6, 6, 8, 8, 9, 9, 10, 10, 11, 11, 12) # 0 is the desert
+RED_NUMBERS = (6, 6, 8, 8)
+OTHER_NUMBERS = tuple(number for number in NUMBERS if number not in RED_NUMBERS)
+
+# Every set of 4 tiles of which no two are adjacent, the possible positions of the 6s and 8s
+RED_TILE_SETS = tuple(
+    tiles for tiles in combinations(range(19), 4)
+    if not any(b in static_board.TILE_TILE[a] for a, b in combinations(tiles, 2))
+)
+
+
+def random_layout(rng: random.Random) -> tuple[int, tuple, tuple, tuple]:
+    port_config = rng.randint(0, 1)
+    hexes = list(HEXES)
+    ports = list(PORTS)
+    rng.shuffle(hexes)
+    rng.shuffle(ports)
+
+    red_tiles = rng.choice(RED_TILE_SETS)
+    red = list(RED_NUMBERS)
+    rng.shuffle(red)
+    others = list(OTHER_NUMBERS)
+    rng.shuffle(others)
+
+    numbers = [0]*19
+    for tile, number in zip(red_tiles, red):
+        numbers[tile] = number
+    rest = iter(others)
+    for tile in range(19):
+        if tile not in red_tiles:
+            numbers[tile] = next(rest)
+
+    resources = ['Desert' if number == 0 else hexes.pop() for number in numbers]
+    return port_config, tuple(resources), tuple(numbers), tuple(ports)
+
+
+class BoardPool:
+    def __init__(self, size: int, seed=None) -> None:
+        # size layouts generated up front from their own generator, drawn with replacement
+        rng = GameRandom(seed)
+        self.layouts = [random_layout(rng) for _ in range(size)]
+
+    def __len__(self) -> int:
+        return len(self.layouts)
+
+    def draw(self, rng: random.Random) -> tuple[int, tuple, tuple, tuple]:
+        # The game's generator picks the layout, so a game with a pool is still reproducible from its seed
+        return rng.choice(self.layouts)
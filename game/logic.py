@@ -1,18 +1,28 @@
+import copy
 import random
 import json
 from game.action import *
-from game.board import Board
+from game.board import Board, BoardPool, CompactBoard
+from game.rng import GameRandom
+from game.road_network import RoadNetwork
+from game import action_space
 
 # Game Logic file
 class Game:
-    def __init__(self):
+    def __init__(self, compact_board: bool = False, seed=None, rng: random.Random | None = None, board_pool: BoardPool | None = None):
+        # Every random draw of the game comes from self.rng (game/rng.py): a GameRandom(seed), or the given generator
+        # board_pool: take the board layout from pre-generated ones (game/board_generator.py)
+        self.rng = rng if rng is not None else GameRandom(seed)
+
         # Main Game State
         self.players = {}
         self.bank = {"wood": 19, "brick": 19, "sheep": 19, "wheat": 19, "ore": 19}
         self.development_cards = ["knight"] * 14 + ["victory_point"] * 5 + ["road_building"] * 2 + ["year_of_plenty"] * 2 + ["monopoly"] * 2
-        random.shuffle(self.development_cards)
+        self.rng.shuffle(self.development_cards)
         self.number = None
-        self.board = Board()
+        self.version = 0 # Increased by every accepted action, used to sync clients with state deltas
+        self.board = CompactBoard(self.rng, board_pool) if compact_board else Board(self.rng, board_pool) # CompactBoard keeps the board in flat arrays (self-play, many games)
+        self.road_network = RoadNetwork() # Cached road components for the longest road
 
         # Inital Placement Phase
         self.initial_placement_order = None
@@ -34,6 +44,47 @@ class Game:
         self.pending_trade: dict | None = None
         self.no_partner: dict[int, dict] = {}
 
+        # Random outcomes of the last accepted action ("dice", "steal"), recorded by game/action_log.py
+        self.draws: dict = {}
+
+
+    def copy(self) -> 'Game':
+        # Independent copy for search/self-play, the static board data is shared (see game/snapshot.py for checkpoints)
+        game = Game.__new__(Game)
+        game.rng = self.rng.copy() if isinstance(self.rng, GameRandom) else copy.copy(self.rng) # same draws as the original from here on
+        game.players = {
+            player_id: {
+                **player,
+                "hand": dict(player["hand"]),
+                "development_cards": dict(player["development_cards"]),
+                "ports": list(player["ports"]),
+            }
+            for player_id, player in self.players.items()
+        }
+        game.bank = dict(self.bank)
+        game.development_cards = list(self.development_cards)
+        game.number = self.number
+        game.version = self.version
+        game.board = self.board.copy()
+        game.road_network = self.road_network.copy()
+        game.initial_placement_order = None if self.initial_placement_order is None else list(self.initial_placement_order)
+        game.counter = self.counter
+        game.last_vertex_initial_placement = self.last_vertex_initial_placement
+        if hasattr(self, "current_turn"):
+            game.current_turn = self.current_turn
+        game.pending_discard = dict(self.pending_discard)
+        game.forced_action = self.forced_action
+        game.robber_candidates = list(self.robber_candidates)
+        game.pending_robber_tile = self.pending_robber_tile
+        game.cards_bought_this_turn = dict(self.cards_bought_this_turn)
+        game.temp_road_building = self.temp_road_building
+        game.pending_trade = None
+        if self.pending_trade is not None:
+            game.pending_trade = {key: set(value) if isinstance(value, set) else value for key, value in self.pending_trade.items()}
+        game.no_partner = dict(self.no_partner)
+        game.draws = {}
+        return game
+
 
     def add_player(self, player_id):
         if player_id not in self.players:
@@ -66,7 +117,7 @@ class Game:
     def start_game(self):
         if len(self.players) < 2 or len(self.players) > 4:
             return False
-        current_turn = random.choice(list(self.players.keys()))
+        current_turn = self.rng.choice(list(self.players.keys()))
         self.players[current_turn]["current_turn"] = True
         order = list(range(1, len(self.players)+1))
         order = order[current_turn-1:] + order[:current_turn-1]
@@ -121,7 +172,10 @@ class Game:
             
 
     
-    def call_action(self, player_id: int, action: dict) -> bool | dict:
+    def call_action(self, player_id: int, action: dict, return_state: bool = True, draws: dict | None = None) -> bool | int | dict:
+        # return_state=False skips building the game states (self-play), True is returned instead
+        # draws: random outcomes to use instead of drawing them (replays), afterwards self.draws holds the ones used
+        self.draws = dict(draws) if draws else {}
         if self.counter < len(self.initial_placement_order): # only allow initial placement actions
             success = self.initial_placement_phase(player_id, action)
         else:
@@ -129,19 +183,48 @@ class Game:
         
         if not success:
             return False
+        self.version += 1
 
-        # Calculate longest road, as it can change after any action
-        for player_id in self.players.keys():
-            calculate_longest_road(self.board, player_id, self.players)
+        # Longest road only changes if a road or a settlement was placed
+        self.update_road_network(player_id, action)
         update_longest_road(self.players)
         
         if self.players[player_id]["victory_points"] >= 10:
             return player_id  # player_id won
         
+        if not return_state:
+            return True
         # return a list of game states for all players
         return self.get_multiplayer_game_state()
 
 
+    def waiting_for(self) -> list[int]:
+        # Players the game is waiting for: initial placement, open discards, trade answers, otherwise the current player
+        if self.initial_placement_order is None:
+            return []
+        if self.counter < len(self.initial_placement_order):
+            return [self.initial_placement_order[self.counter]]
+        if self.forced_action == "Discard":
+            return [pid for pid, owed in self.pending_discard.items() if owed > 0]
+        if self.pending_trade is not None and self.pending_trade["awaiting"]:
+            return sorted(self.pending_trade["awaiting"])
+        return [self.current_turn]
+
+
+    def update_road_network(self, player_id: int, action: dict) -> None:
+        # Only called after a successful action, so the road/settlement is on the board
+        match action.get("type"):
+            case "place_road":
+                changed = self.road_network.add_road(self.board, player_id, int(action.get("edge_id")))
+            case "place_settlement":
+                changed = self.road_network.add_settlement(self.board, player_id, int(action.get("vertex_id")))
+            case _:
+                return
+        for pid in changed:
+            if pid in self.players:
+                self.players[pid]["longest_road_length"] = self.road_network.longest_road(pid)
+
+
     def process_action(self, player_id: int, action: dict) -> bool:
         # Validate turn and phase
         action_type = action.get("type")
@@ -160,15 +243,21 @@ class Game:
             return False
         if self.pending_trade and player_id == self.current_turn and action_type == "end_turn":
             return False
+        # Hands are frozen until everyone has discarded. The amount owed is fixed at the roll (half the hand), a road
+        # bought or a trade confirmed before the discard could leave a player with fewer cards than it owes, and the
+        # game would wait for a discard that can never be made. legal_actions() masks both out the same way.
+        if self.forced_action == "Discard" and action_type in ("place_road", "confirm_trade"):
+            return False
 
         
         # Route action (Return False if action is invalid)
         match action_type:
             # General actions
             case "roll_dice":
-                self.number = roll_dice(board = self.board, players = self.players, player_id = player_id, bank = self.bank)
+                self.number = roll_dice(board = self.board, players = self.players, player_id = player_id, bank = self.bank, number = self.draws.get("dice"), rng = self.rng)
                 if self.number is False:
                     return False
+                self.draws["dice"] = self.number
                 
                 if self.number == 7:
                     self.pending_discard.clear()
@@ -246,8 +335,11 @@ class Game:
                 victim = int(action.get("victim_id"))
                 if victim not in (self.robber_candidates or []):
                     return False
-                if not steal_resource(board=self.board, players=self.players, stealer_id=player_id, victim_id=victim):
+                stolen = steal_resource(board=self.board, players=self.players, stealer_id=player_id, victim_id=victim, resource=self.draws.get("steal"), rng=self.rng)
+                if not stolen:
                     return False
+                if stolen is not True:
+                    self.draws["steal"] = stolen
                 
                 self.robber_candidates = []
                 self.pending_robber_tile = None
@@ -503,6 +595,107 @@ class Game:
             case _:
                 return False
 
+
+    def legal_actions(self, player_id: int) -> list[bool]:
+        # Mask over game.action_space: True if call_action(player_id, decode_action(i)) would be accepted
+        # (DISCARD_RESOURCES and PROPOSE_TRADE only say that the action type is allowed, see action_space)
+        space = action_space
+        mask = [False] * space.N_ACTIONS
+        if player_id not in self.players or self.initial_placement_order is None:
+            return mask
+        player = self.players[player_id]
+        hand = player["hand"]
+        candidates = self.board.candidates
+
+        # Initial placement phase
+        if self.counter < len(self.initial_placement_order):
+            if player_id != self.initial_placement_order[self.counter]:
+                return mask
+            if self.counter % 2 == 0:
+                for vertex in candidates.free_vertices:
+                    mask[space.PLACE_SETTLEMENT + vertex] = True
+            elif self.last_vertex_initial_placement is not None:
+                for edge in self.board.vertices[self.last_vertex_initial_placement].edges:
+                    if self.board.edges[edge].owner is None:
+                        mask[space.PLACE_ROAD + edge] = True
+            return mask
+
+        # Actions that are allowed out of turn
+        trade = self.pending_trade
+        if trade is not None and player_id != trade["trader_id"]:
+            mask[space.DECLINE_TRADE] = True
+            mask[space.ACCEPT_TRADE] = can_do_trade_player(player_id, trade["request"], self.players)
+        if self.forced_action == "Discard" and self.pending_discard.get(player_id, 0) > 0:
+            mask[space.DISCARD_RESOURCES] = True
+        if player_id != self.current_turn:
+            return mask
+
+        forced = self.forced_action
+        dice_rolled = player["dice_rolled"]
+
+        # Forced actions
+        if forced == "Move Robber":
+            for tile in range(19):
+                mask[space.MOVE_ROBBER + tile] = tile != self.board.robber_tile
+        elif forced == "Steal Resource":
+            for victim in self.robber_candidates:
+                if victim in space.PLAYER_IDS and can_steal(self.board, player_id, victim):
+                    mask[space.ROBBER_STEAL + space.PLAYER_IDS.index(victim)] = True
+        elif forced == "Year of Plenty":
+            for i in range(len(space.YEAR_OF_PLENTY_PICKS)):
+                mask[space.YEAR_OF_PLENTY + i] = True
+        elif forced == "Monopoly":
+            for i in range(len(space.RESOURCES)):
+                mask[space.MONOPOLY + i] = True
+
+        # Roads: free during road building, otherwise paid (also allowed during the other forced actions)
+        if forced in ("Place Road 1", "Place Road 2"):
+            road_ok = player["roads"] > 0
+        elif forced == "Discard":
+            road_ok = False
+        else:
+            road_ok = dice_rolled and player["roads"] > 0 and hand["brick"] >= 1 and hand["wood"] >= 1
+        if road_ok:
+            for edge in candidates.road_frontier.get(player_id, ()):
+                mask[space.PLACE_ROAD + edge] = True
+
+        # Running trade
+        if trade is not None and player_id == trade["trader_id"]:
+            mask[space.END_TRADE] = True
+            if forced != "Discard" and can_do_trade_player(player_id, trade["offer"], self.players):
+                for partner in trade["accepted_by"]:
+                    if partner in space.PLAYER_IDS and can_do_trade_player(partner, trade["request"], self.players):
+                        mask[space.CONFIRM_TRADE + space.PLAYER_IDS.index(partner)] = True
+
+        if forced:
+            return mask
+
+        # Free turn
+        mask[space.ROLL_DICE] = not dice_rolled and player["current_turn"]
+        mask[space.END_TURN] = dice_rolled and player["current_turn"] and trade is None
+        mask[space.PROPOSE_TRADE] = trade is None and sum(hand.values()) > 0
+
+        if dice_rolled:
+            if player["settlements"] > 0 and hand["brick"] >= 1 and hand["wood"] >= 1 and hand["sheep"] >= 1 and hand["wheat"] >= 1:
+                for vertex in candidates.settlement_spots(player_id):
+                    mask[space.PLACE_SETTLEMENT + vertex] = True
+            if player["cities"] > 0 and hand["ore"] >= 3 and hand["wheat"] >= 2:
+                for vertex in candidates.settlements.get(player_id, ()):
+                    mask[space.PLACE_CITY + vertex] = True
+            mask[space.BUY_DEVELOPMENT_CARD] = len(self.development_cards) > 0 and hand["sheep"] >= 1 and hand["wheat"] >= 1 and hand["ore"] >= 1
+
+        cards = player["development_cards"]
+        playable = not player["played_card_this_turn"] and player["current_turn"]
+        mask[space.PLAY_KNIGHT] = playable and cards["knight"] > self.cards_bought_this_turn["knight"]
+        mask[space.PLAY_ROAD_BUILDING] = playable and cards["road_building"] > self.cards_bought_this_turn["road_building"] and player["roads"] > 0
+        mask[space.PLAY_YEAR_OF_PLENTY] = playable and cards["year_of_plenty"] > self.cards_bought_this_turn["year_of_plenty"]
+        mask[space.PLAY_MONOPOLY] = playable and cards["monopoly"] > self.cards_bought_this_turn["monopoly"]
+
+        ratios = port_ratios_for_player(player_id, self.players)
+        for i, (give, receive) in enumerate(space.BANK_TRADES):
+            mask[space.BANK_TRADE + i] = hand[give] >= ratios[give] and self.bank[receive] >= 1
+        return mask
+
    
     # Update we always want the full game state for each player (since hidden info) (And send it to everyone)
     def get_multiplayer_game_state(self) -> dict:
@@ -525,6 +718,10 @@ class Game:
                 "target": self.pending_trade["target"],
             }
 
+        # The board and bank are the same for every player, the copies keep older states intact for diffing
+        board = self.board.board_to_json()
+        bank = dict(self.bank)
+
         result = {}
         for player in self.players.keys():
             player_data = {player: json.dumps(self.players[player])}
@@ -533,9 +730,10 @@ class Game:
             must_discard = self.pending_discard.get(player, 0) if self.forced_action == "Discard" else 0
 
             result[player] = {
-                "board": self.board.board_to_json(),
+                "version": self.version,
+                "board": board,
                 "players": players,
-                "bank": self.bank,
+                "bank": bank,
                 "development_cards_remaining": len(self.development_cards),
                 "current_turn": self.current_turn,
                 "current_roll": self.number,
@@ -572,7 +770,7 @@ class Game:
                 "settlements": pdata["settlements"],
                 "cities": pdata["cities"],
                 "roads": pdata["roads"],
-                "ports": pdata["ports"],
+                "ports": list(pdata["ports"]),
                 "longest_road": pdata["longest_road"],
                 "largest_army": pdata["largest_army"],
                 "played_card_this_turn": pdata["played_card_this_turn"],
@@ -0,0 +1,69 @@
+from game import static_board
+from game.bitboard import Bitboards
+
+'''
+Placement Candidates
+
+Incrementally maintained sets, so legal moves don't need a scan of the whole board:
+- free_vertices: empty vertices that satisfy the distance rule (nothing built on them or their neighbours)
+- road_vertices[player]: vertices touched by the player's roads (a settlement needs one of them)
+- road_frontier[player]: empty edges the player may build a road on (same rule as can_place_road)
+- settlements[player]: the player's settlements (can be upgraded to cities)
+- bits: the same buildings and roads as bit masks (game/bitboard.py), for the single vertex/edge/tile rule checks
+Updated by the building functions in game/action.py.
+'''
+class PlacementCandidates:
+    def __init__(self, board) -> None:
+        self.rebuild(board)
+
+    def rebuild(self, board) -> None:
+        self.free_vertices: set[int] = set(range(54))
+        self.road_vertices: dict[int, set[int]] = {}
+        self.road_frontier: dict[int, set[int]] = {}
+        self.settlements: dict[int, set[int]] = {}
+        self.bits = Bitboards()
+        for vertex in board.vertices:
+            if vertex.owner is not None:
+                self.add_settlement(board, vertex.id, vertex.owner)
+                if vertex.building == "city":
+                    self.add_city(vertex.id, vertex.owner)
+        for edge in board.edges:
+            if edge.owner is not None:
+                self.add_road(board, edge.id, edge.owner)
+
+    def copy(self) -> 'PlacementCandidates':
+        candidates = PlacementCandidates.__new__(PlacementCandidates)
+        candidates.free_vertices = set(self.free_vertices)
+        candidates.road_vertices = {pid: set(vertices) for pid, vertices in self.road_vertices.items()}
+        candidates.road_frontier = {pid: set(edges) for pid, edges in self.road_frontier.items()}
+        candidates.settlements = {pid: set(vertices) for pid, vertices in self.settlements.items()}
+        candidates.bits = self.bits.copy()
+        return candidates
+
+    def add_settlement(self, board, vertex_id: int, player_id: int) -> None:
+        self.free_vertices.discard(vertex_id)
+        self.free_vertices.difference_update(static_board.VERTEX_VERTEX[vertex_id])
+        self.settlements.setdefault(player_id, set()).add(vertex_id)
+        self.bits.add_settlement(vertex_id, player_id)
+        frontier = self.road_frontier.setdefault(player_id, set())
+        for edge in static_board.VERTEX_EDGE[vertex_id]:
+            if board.edges[edge].owner is None:
+                frontier.add(edge)
+
+    def add_city(self, vertex_id: int, player_id: int) -> None:
+        self.settlements.get(player_id, set()).discard(vertex_id)
+        self.bits.add_city(vertex_id, player_id)
+
+    def add_road(self, board, edge_id: int, player_id: int) -> None:
+        for frontier in self.road_frontier.values():
+            frontier.discard(edge_id)
+        self.bits.add_road(edge_id, player_id)
+        self.road_vertices.setdefault(player_id, set()).update(static_board.EDGE_VERTEX[edge_id])
+        frontier = self.road_frontier.setdefault(player_id, set())
+        for edge in static_board.EDGE_EDGE[edge_id]:
+            if board.edges[edge].owner is None:
+                frontier.add(edge)
+
+    def settlement_spots(self, player_id: int) -> set[int]:
+        # Same as can_place_settlement for every vertex
+        return self.free_vertices & self.road_vertices.get(player_id, set())
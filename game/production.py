@@ -0,0 +1,70 @@
+from game import static_board
+
+# Chance of each dice number with two six-sided dice
+DICE_PROBABILITY = {number: (6 - abs(7 - number)) / 36 for number in range(2, 13)}
+
+
+'''
+Production Index
+
+For every dice number we keep the (tile, vertex, resource) triples of all built vertices next to a tile with that number,
+so a dice roll only looks at the buildings that actually produce instead of scanning every tile.
+The index has to be updated whenever a building is placed/upgraded or the robber moves (see game/action.py).
+'''
+class ProductionIndex:
+    def __init__(self, board) -> None:
+        self.by_number: dict[int, list[tuple[int, int, str]]] = {} # number -> [(tile, vertex, resource)]
+        self.buildings: dict[int, tuple[int, int]] = {} # vertex -> (owner, amount) (settlement 1, city 2)
+        self.robber_tile = board.robber_tile
+        self.rebuild(board)
+
+    def rebuild(self, board) -> None:
+        self.by_number = {number: [] for number in range(2, 13) if number != 7}
+        self.buildings = {}
+        self.robber_tile = board.robber_tile
+        for vertex in board.vertices:
+            if vertex.owner is not None and vertex.building is not None:
+                self.add_building(board, vertex.id, vertex.owner, vertex.building)
+
+    def copy(self) -> 'ProductionIndex':
+        index = ProductionIndex.__new__(ProductionIndex)
+        index.by_number = {number: list(entries) for number, entries in self.by_number.items()}
+        index.buildings = dict(self.buildings)
+        index.robber_tile = self.robber_tile
+        return index
+
+    def add_building(self, board, vertex_id: int, player_id: int, building: str) -> None:
+        # New settlement or settlement upgraded to a city
+        if vertex_id not in self.buildings:
+            for tile_id in static_board.VERTEX_TILE[vertex_id]:
+                tile = board.tiles[tile_id]
+                if tile.number in self.by_number:
+                    self.by_number[tile.number].append((tile_id, vertex_id, tile.resource))
+        self.buildings[vertex_id] = (player_id, 2 if building == "city" else 1)
+
+    def move_robber(self, tile_id: int) -> None:
+        self.robber_tile = tile_id
+
+    def roll(self, number: int) -> tuple[dict, dict]:
+        # Returns the total per resource and the amount per resource per player for a dice number
+        totals = {"wood": 0, "brick": 0, "sheep": 0, "wheat": 0, "ore": 0}
+        per_player = {resource: {} for resource in totals}
+        for tile_id, vertex_id, resource in self.by_number.get(number, ()):
+            if tile_id == self.robber_tile:
+                continue
+            owner, amount = self.buildings[vertex_id]
+            totals[resource] += amount
+            per_player[resource][owner] = per_player[resource].get(owner, 0) + amount
+        return totals, per_player
+
+    def expected_production(self, player_id: int, robber: bool = True) -> dict:
+        # Expected resources per dice roll for one player (robber=False ignores the robber)
+        expected = {"wood": 0.0, "brick": 0.0, "sheep": 0.0, "wheat": 0.0, "ore": 0.0}
+        for number, entries in self.by_number.items():
+            for tile_id, vertex_id, resource in entries:
+                if robber and tile_id == self.robber_tile:
+                    continue
+                owner, amount = self.buildings[vertex_id]
+                if owner == player_id:
+                    expected[resource] += DICE_PROBABILITY[number] * amount
+        return expected
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import random
+
+'''
+Game Random Numbers
+
+Every Game draws from its own GameRandom (board layout, development cards, first player, dice, steals),
+so a game is reproducible from its seed and games in the same process or in parallel workers never share state.
+
+GameRandom is counter based: the n-th number of a generator is SplitMix64(key + n * GAMMA), the whole state is
+(key, counter). That makes copies and snapshots cheap (two integers instead of the 2.5 kB Mersenne Twister state)
+and gives independent streams without coordination: stream(i) derives a new key from (key, i),
+so worker i of a batch can use GameRandom(seed).stream(i) and get the same numbers on every machine.
+All the usual random.Random methods (randint, choice, shuffle, choices, ...) work on top of it.
+'''
+MASK = (1 << 64) - 1
+GAMMA = 0x9E3779B97F4A7C15
+
+
+def mix(z: int) -> int:
+    # SplitMix64 finalizer
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+
+def seed_key(seed) -> int:
+    if seed is None:
+        return int.from_bytes(os.urandom(8), "little")
+    if isinstance(seed, int):
+        return mix((seed * GAMMA) & MASK)
+    if isinstance(seed, str):
+        seed = seed.encode()
+    return int.from_bytes(hashlib.blake2b(bytes(seed), digest_size=8).digest(), "little")
+
+
+class GameRandom(random.Random):
+    def __init__(self, seed=None, counter: int = 0) -> None:
+        super().__init__(seed)
+        self.counter = counter
+
+    def seed(self, seed=None, version: int = 2) -> None:
+        self.key = seed_key(seed)
+        self.counter = 0
+        self.gauss_next = None
+
+    def next64(self) -> int:
+        # mix() inlined, this is called for every draw
+        self.counter += 1
+        z = (self.key + self.counter * GAMMA) & MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+        return z ^ (z >> 31)
+
+    def random(self) -> float:
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def _randbelow(self, n: int) -> int:
+        # Used by randint, choice, shuffle, sample: one draw scaled to [0, n) instead of rejection sampling on bits,
+        # the bias is below n / 2**64
+        if n > MASK:
+            return self._randbelow_with_getrandbits(n)
+        return (self.next64() * n) >> 64
+
+    def shuffle(self, x: list) -> None:
+        # Same result as random.Random.shuffle with _randbelow, without a method call per element (board generation)
+        key, counter = self.key, self.counter
+        for i in reversed(range(1, len(x))):
+            counter += 1
+            z = (key + counter * GAMMA) & MASK
+            z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+            z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+            j = ((z ^ (z >> 31)) * (i + 1)) >> 64
+            x[i], x[j] = x[j], x[i]
+        self.counter = counter
+
+    def getrandbits(self, k: int) -> int:
+        if k <= 64:
+            return self.next64() >> (64 - k)
+        bits = 0
+        for shift in range(0, k, 64):
+            bits |= self.next64() << shift
+        return bits & ((1 << k) - 1)
+
+    def getstate(self) -> tuple:
+        return (self.key, self.counter, self.gauss_next)
+
+    def setstate(self, state: tuple) -> None:
+        self.key, self.counter, self.gauss_next = state
+
+    def stream(self, index: int) -> 'GameRandom':
+        # Independent generator number index, depends only on the key (not on how far this one got)
+        rng = GameRandom.__new__(GameRandom)
+        rng.setstate((mix(self.key ^ mix(((index + 1) * GAMMA) & MASK)), 0, None))
+        return rng
+
+    def copy(self) -> 'GameRandom':
+        rng = GameRandom.__new__(GameRandom)
+        rng.setstate(self.getstate())
+        return rng
@@ -0,0 +1,134 @@
+from game import static_board
+
+'''
+Incremental Longest Road
+
+A road network of a player is split into components: roads that are connected through vertices
+which are not built on by an opponent (an opponent settlement cuts a road).
+The longest road of a player is the longest trail (no edge used twice) in any of their components.
+
+Roads only ever get added, so the components only change when
+- the player places a road (the new road can merge components), or
+- an opponent places a settlement on a vertex the player's road passes through (the component can split).
+Only the affected component is searched again, all other components keep their cached length.
+'''
+class RoadNetwork:
+    def __init__(self) -> None:
+        self.components: dict[int, list[frozenset[int]]] = {} # player_id -> list of edge id sets
+        self.lengths: dict[int, list[int]] = {} # player_id -> longest trail per component (same order as components)
+
+    def longest_road(self, player_id: int) -> int:
+        return max(self.lengths.get(player_id, ()), default=0)
+
+    def copy(self) -> 'RoadNetwork':
+        # The components are frozensets, only the lists need copying
+        network = RoadNetwork.__new__(RoadNetwork)
+        network.components = {pid: list(components) for pid, components in self.components.items()}
+        network.lengths = {pid: list(lengths) for pid, lengths in self.lengths.items()}
+        return network
+
+    def rebuild(self, board, player_ids) -> None:
+        # Full recomputation, e.g. for a board that was not built through this network
+        self.components.clear()
+        self.lengths.clear()
+        for player_id in player_ids:
+            self.components[player_id] = []
+            self.lengths[player_id] = []
+            seen = set()
+            for edge in board.edges:
+                if edge.owner == player_id and edge.id not in seen:
+                    component = collect_component(board, player_id, edge.id)
+                    seen |= component
+                    self.components[player_id].append(component)
+                    self.lengths[player_id].append(longest_trail(board, player_id, component))
+
+    def add_road(self, board, player_id: int, edge_id: int) -> list[int]:
+        # Call after the road was placed, returns the players whose longest road may have changed
+        components = self.components.setdefault(player_id, [])
+        lengths = self.lengths.setdefault(player_id, [])
+
+        component = collect_component(board, player_id, edge_id)
+        keep = [i for i, other in enumerate(components) if not (other & component)]
+        self.components[player_id] = [components[i] for i in keep] + [component]
+        self.lengths[player_id] = [lengths[i] for i in keep] + [longest_trail(board, player_id, component)]
+        return [player_id]
+
+    def add_settlement(self, board, player_id: int, vertex_id: int) -> list[int]:
+        # Call after the settlement was placed, returns the players whose longest road may have changed
+        changed = []
+        for other_id, components in self.components.items():
+            if other_id == player_id:
+                continue
+            touching = [edge for edge in static_board.VERTEX_EDGE[vertex_id] if board.edges[edge].owner == other_id]
+            if len(touching) < 2: # the settlement is at the end of the road, nothing is cut
+                continue
+
+            for i, component in enumerate(components):
+                if touching[0] in component:
+                    break
+            else:
+                continue
+
+            # Split the cut component, every touching road starts a (possibly shared) new component
+            parts = []
+            for edge in touching:
+                if not any(edge in part for part in parts):
+                    parts.append(collect_component(board, other_id, edge))
+
+            lengths = self.lengths[other_id]
+            self.components[other_id] = components[:i] + components[i+1:] + parts
+            self.lengths[other_id] = lengths[:i] + lengths[i+1:] + [longest_trail(board, other_id, part) for part in parts]
+            changed.append(other_id)
+        return changed
+
+
+def passable(board, vertex_id: int, player_id: int) -> bool:
+    # A road can only be continued through a vertex that is empty or owned by the player
+    return board.vertices[vertex_id].owner in (None, player_id)
+
+
+def collect_component(board, player_id: int, edge_id: int) -> frozenset[int]:
+    component = {edge_id}
+    stack = [edge_id]
+    while stack:
+        edge = stack.pop()
+        for vertex in static_board.EDGE_VERTEX[edge]:
+            if not passable(board, vertex, player_id):
+                continue
+            for next_edge in static_board.VERTEX_EDGE[vertex]:
+                if next_edge not in component and board.edges[next_edge].owner == player_id:
+                    component.add(next_edge)
+                    stack.append(next_edge)
+    return frozenset(component)
+
+
+def longest_trail(board, player_id: int, component: frozenset[int]) -> int:
+    # Exact search: the longest path that uses every road at most once
+    # A player has at most 15 roads, so a backtracking search is cheap, and it only starts where a longest trail can:
+    # a trail starting at an open vertex with two roads could be extended by the other road (or is a closed loop that
+    # can be started anywhere), so only dead ends, junctions and vertices blocked by an opponent are tried.
+    # Only a plain loop has none of those, any of its vertices will do.
+    neighbours = {} # vertex -> [(edge bit, other vertex)] within the component
+    for edge in component:
+        a, b = static_board.EDGE_VERTEX[edge]
+        neighbours.setdefault(a, []).append((1 << edge, b))
+        neighbours.setdefault(b, []).append((1 << edge, a))
+    open_vertices = {vertex for vertex in neighbours if passable(board, vertex, player_id)}
+
+    def walk(vertex: int, used: int) -> int:
+        best = 0
+        for bit, vertex_2 in neighbours[vertex]:
+            if used & bit:
+                continue
+            length = 1 + (walk(vertex_2, used | bit) if vertex_2 in open_vertices else 0)
+            if length > best:
+                best = length
+        return best
+
+    starts = [vertex for vertex, edges in neighbours.items() if len(edges) != 2 or vertex not in open_vertices]
+    best = 0
+    for vertex in starts or list(neighbours)[:1]:
+        best = max(best, walk(vertex, 0))
+        if best == len(component): # every road is used, nothing can be longer
+            break
+    return best
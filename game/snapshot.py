@@ -0,0 +1,304 @@
+import json
+import random
+import struct
+from array import array
+
+from game import static_board
+from game.board import BUILDINGS, NO_OWNER, PORT_TYPES, RESOURCES, Board, BoardView, CompactBoard, EdgeView, TileView, VertexView
+from game.logic import Game
+from game.placement import PlacementCandidates
+from game.production import ProductionIndex
+from game.rng import GameRandom
+from game.road_network import RoadNetwork
+
+'''
+Game Snapshots
+
+snapshot_game(game) packs the complete state of a Game into a few hundred bytes, restore_game(data) builds an equal Game from them.
+Used for crash recovery (checkpoints on disk) and wherever a game has to be stored or sent away.
+For cloning in the same process (search, self-play) Game.copy() is faster, it skips the encoding.
+
+Layout (little endian): header "<2sBBI" = MAGIC, SNAPSHOT_VERSION, flags, game.version, then
+- scalars (SCALARS, u8 each, NONE = 255 for None)
+- board: tile resource / number, vertex owner / building / port / blocked, edge owner (the CompactBoard arrays, i8 each)
+- bank, cards bought this turn: u8 per resource / card
+- development card stack, initial placement order, robber candidates: u8 count + items
+- pending discards: u8 count + (player id, amount)
+- players: u8 count, then u8 player id, u8 flags (FLAGS bits), u8 COUNTERS, hand, development cards, u8 number of ports + PORT_TYPES indices
+- road network: u8 player count, then u8 player id, u8 component count, per component u8 longest trail + u8 count + edge ids
+- TRADE flag: u32 length + JSON of pending_trade and no_partner (rare and without a fixed layout)
+- RNG flag: state of the game's GameRandom (game/rng.py): u64 key, u64 counter, gauss
+  MERSENNE flag instead: state of an injected random.Random (625 u32 + gauss)
+The production index and the placement candidates are rebuilt on restore.
+'''
+MAGIC = b"GS"
+SNAPSHOT_VERSION = 2
+NONE = 255
+
+COMPACT = 0x01 # board is a CompactBoard
+STARTED = 0x02 # start_game was called
+TRADE = 0x04
+RNG = 0x08
+MERSENNE = 0x10
+
+HEADER = struct.Struct("<2sBBI")
+SCALARS = struct.Struct("<10B") # number, counter, last vertex, current turn, forced action, pending robber tile, road building, port config, robber tile, player count
+TAIL = struct.Struct("<I")
+RNG_STATE = struct.Struct("<QQ?d") # GameRandom.getstate(): key, counter, gauss_next
+MERSENNE_STATE = struct.Struct("<625I?d") # random.Random.getstate(): version 3, 624 words + index, gauss_next
+
+HAND = ("wood", "brick", "sheep", "wheat", "ore") # key order of the hands and the bank
+DEVELOPMENT_CARDS = ("knight", "victory_point", "road_building", "year_of_plenty", "monopoly")
+COUNTERS = ("played_knights", "longest_road_length", "victory_points", "settlements", "cities", "roads",
+            "total_hand", "total_development_cards", "victory_points_without_vp_cards")
+FLAGS = ("longest_road", "largest_army", "played_card_this_turn", "dice_rolled", "current_turn")
+FORCED_ACTIONS = (None, "Discard", "Move Robber", "Steal Resource", "Place Road 1", "Place Road 2",
+                  "Year of Plenty", "Monopoly", "Trade Pending")
+BOARD_ARRAYS = (("tile_resource", 19), ("tile_number", 19), ("vertex_owner", 54), ("vertex_building", 54),
+                ("vertex_port", 54), ("vertex_blocked", 54), ("edge_owner", 72))
+TRADE_SETS = ("awaiting", "declined", "accepted_by")
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def optional(value) -> int:
+    return NONE if value is None else value
+
+
+def board_arrays(board: Board) -> bytes:
+    if isinstance(board, CompactBoard):
+        return b"".join(getattr(board, name).tobytes() for name, _ in BOARD_ARRAYS)
+    return array('b', [
+        *(RESOURCES.index(tile.resource) for tile in board.tiles),
+        *(tile.number for tile in board.tiles),
+        *(NO_OWNER if vertex.owner is None else vertex.owner for vertex in board.vertices),
+        *(BUILDINGS.index(vertex.building) for vertex in board.vertices),
+        *(PORT_TYPES.index(vertex.port) for vertex in board.vertices),
+        *(1 if vertex.blocked else 0 for vertex in board.vertices),
+        *(NO_OWNER if edge.owner is None else edge.owner for edge in board.edges),
+    ]).tobytes()
+
+
+def counted(items) -> bytes:
+    return bytes((len(items), *items))
+
+
+def snapshot_game(game: Game, rng: bool = True) -> bytes:
+    # rng=False leaves out the generator state, the restored game gets a new unseeded generator
+    flags = COMPACT if isinstance(game.board, CompactBoard) else 0
+    started = game.initial_placement_order is not None
+    if started:
+        flags |= STARTED
+    if game.pending_trade is not None or game.no_partner:
+        flags |= TRADE
+    if rng:
+        flags |= RNG if isinstance(game.rng, GameRandom) else MERSENNE
+
+    board = game.board
+    parts = [
+        HEADER.pack(MAGIC, SNAPSHOT_VERSION, flags, game.version),
+        SCALARS.pack(
+            optional(game.number), game.counter, optional(game.last_vertex_initial_placement),
+            optional(getattr(game, "current_turn", None)), FORCED_ACTIONS.index(game.forced_action),
+            optional(game.pending_robber_tile), game.temp_road_building, board.port_config, board.robber_tile,
+            len(game.players),
+        ),
+        board_arrays(board),
+        bytes(game.bank[resource] for resource in HAND),
+        bytes(game.cards_bought_this_turn[card] for card in DEVELOPMENT_CARDS),
+        counted([DEVELOPMENT_CARDS.index(card) for card in game.development_cards]),
+        counted(game.initial_placement_order if started else ()),
+        counted(game.robber_candidates),
+        counted([value for item in game.pending_discard.items() for value in item]),
+    ]
+    for player_id, player in game.players.items():
+        hand, cards = player["hand"], player["development_cards"]
+        parts.append(bytes((
+            player_id,
+            sum(1 << i for i, flag in enumerate(FLAGS) if player[flag]),
+            *(player[counter] for counter in COUNTERS),
+            *(hand[resource] for resource in HAND),
+            *(cards[card] for card in DEVELOPMENT_CARDS),
+            len(player["ports"]), *(PORT_TYPES.index(port) for port in player["ports"]),
+        )))
+    # Longest trail per road component, searching them again is the slow part of a restore
+    network = game.road_network
+    parts.append(bytes((len(network.components),)))
+    for player_id, components in network.components.items():
+        parts.append(bytes((player_id, len(components))))
+        for component, length in zip(components, network.lengths[player_id]):
+            parts += [bytes((length,)), counted(sorted(component))]
+    if flags & TRADE:
+        trade = game.pending_trade
+        if trade is not None:
+            trade = {key: sorted(value) if key in TRADE_SETS else value for key, value in trade.items()}
+        tail = json.dumps({"pending_trade": trade, "no_partner": game.no_partner}, separators=(",", ":")).encode()
+        parts += [TAIL.pack(len(tail)), tail]
+    if flags & RNG:
+        key, counter, gauss = game.rng.getstate()
+        parts.append(RNG_STATE.pack(key, counter, gauss is not None, gauss or 0.0))
+    elif flags & MERSENNE:
+        _, words, gauss = game.rng.getstate()
+        parts.append(MERSENNE_STATE.pack(*words, gauss is not None, gauss or 0.0))
+    return b"".join(parts)
+
+
+class Reader:
+    __slots__ = ('data', 'offset')
+
+    def __init__(self, data: bytes, offset: int = 0) -> None:
+        self.data = data
+        self.offset = offset
+
+    def take(self, n: int) -> bytes:
+        chunk = self.data[self.offset:self.offset + n]
+        if len(chunk) != n:
+            raise SnapshotError("Truncated snapshot")
+        self.offset += n
+        return chunk
+
+    def counted(self) -> bytes:
+        return self.take(self.take(1)[0])
+
+    def unpack(self, layout: struct.Struct) -> tuple:
+        return layout.unpack(self.take(layout.size))
+
+
+def restore_board(buffers: dict, compact: bool, port_config: int, robber_tile: int) -> Board:
+    if compact:
+        board = CompactBoard.__new__(CompactBoard)
+        for name, buffer in buffers.items():
+            setattr(board, name, buffer)
+        board.tiles = BoardView(board, TileView, 19)
+        board.vertices = BoardView(board, VertexView, 54)
+        board.edges = BoardView(board, EdgeView, 72)
+    else:
+        board = Board.__new__(Board)
+        board.tiles = [static_board.Tile(RESOURCES[buffers["tile_resource"][i]], buffers["tile_number"][i], i) for i in range(19)]
+        board.vertices = [static_board.Vertex(i) for i in range(54)]
+        board.edges = [static_board.Edge(i) for i in range(72)]
+        for tile in board.tiles:
+            tile.robber = tile.id == robber_tile
+            tile.tiles = static_board.TILE_TILE[tile.id]
+            tile.vertices = static_board.TILE_VERTEX[tile.id]
+            tile.edges = static_board.TILE_EDGE[tile.id]
+        for vertex in board.vertices:
+            owner = buffers["vertex_owner"][vertex.id]
+            vertex.owner = None if owner == NO_OWNER else owner
+            vertex.building = BUILDINGS[buffers["vertex_building"][vertex.id]]
+            vertex.port = PORT_TYPES[buffers["vertex_port"][vertex.id]]
+            vertex.blocked = bool(buffers["vertex_blocked"][vertex.id])
+            vertex.tiles = static_board.VERTEX_TILE[vertex.id]
+            vertex.edges = static_board.VERTEX_EDGE[vertex.id]
+            vertex.vertices = static_board.VERTEX_VERTEX[vertex.id]
+        for edge in board.edges:
+            owner = buffers["edge_owner"][edge.id]
+            edge.owner = None if owner == NO_OWNER else owner
+            edge.tiles = static_board.EDGE_TILE[edge.id]
+            edge.vertices = static_board.EDGE_VERTEX[edge.id]
+            edge.edges = static_board.EDGE_EDGE[edge.id]
+    board.port_config = port_config
+    board.robber_tile = robber_tile
+    board.production = ProductionIndex(board)
+    board.candidates = PlacementCandidates(board)
+    return board
+
+
+def is_seeded(data: bytes) -> bool:
+    # The snapshot has the state of the game's generator (RNG or MERSENNE), the restored game draws the same dice
+    _, _, flags, _ = HEADER.unpack_from(data)
+    return bool(flags & (RNG | MERSENNE))
+
+
+def restore_game(data: bytes, compact: bool | None = None) -> Game:
+    # compact: None restores the board type of the snapshot, True/False restores into a CompactBoard/Board
+    reader = Reader(data)
+    magic, version, flags, game_version = reader.unpack(HEADER)
+    if magic != MAGIC:
+        raise SnapshotError("Not a game snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+
+    (number, counter, last_vertex, current_turn, forced_action, pending_robber_tile,
+     road_building, port_config, robber_tile, player_count) = reader.unpack(SCALARS)
+
+    buffers = {}
+    for name, size in BOARD_ARRAYS:
+        buffers[name] = array('b', reader.take(size))
+
+    game = Game.__new__(Game)
+    game.version = game_version
+    game.number = None if number == NONE else number
+    game.counter = counter
+    game.last_vertex_initial_placement = None if last_vertex == NONE else last_vertex
+    if current_turn != NONE:
+        game.current_turn = current_turn
+    game.forced_action = FORCED_ACTIONS[forced_action]
+    game.pending_robber_tile = None if pending_robber_tile == NONE else pending_robber_tile
+    game.temp_road_building = bool(road_building)
+    game.board = restore_board(buffers, bool(flags & COMPACT) if compact is None else compact, port_config, robber_tile)
+
+    game.bank = dict(zip(HAND, reader.take(5)))
+    game.cards_bought_this_turn = dict(zip(DEVELOPMENT_CARDS, reader.take(5)))
+    game.development_cards = [DEVELOPMENT_CARDS[card] for card in reader.counted()]
+    order = list(reader.counted())
+    game.initial_placement_order = order if flags & STARTED else None
+    game.robber_candidates = list(reader.counted())
+    discards = reader.counted()
+    game.pending_discard = dict(zip(discards[::2], discards[1::2]))
+
+    game.players = {}
+    for _ in range(player_count):
+        player_id, player_flags, *values = reader.take(2 + len(COUNTERS) + 10)
+        counters = dict(zip(COUNTERS, values))
+        ports = [PORT_TYPES[port] for port in reader.counted()]
+        game.players[player_id] = {
+            "hand": dict(zip(HAND, values[len(COUNTERS):len(COUNTERS) + 5])),
+            "development_cards": dict(zip(DEVELOPMENT_CARDS, values[len(COUNTERS) + 5:])),
+            "played_knights": counters["played_knights"],
+            "longest_road_length": counters["longest_road_length"],
+            "victory_points": counters["victory_points"],
+            "settlements": counters["settlements"],
+            "cities": counters["cities"],
+            "roads": counters["roads"],
+            "ports": ports,
+            **{flag: bool(player_flags >> i & 1) for i, flag in enumerate(FLAGS)},
+            "total_hand": counters["total_hand"],
+            "total_development_cards": counters["total_development_cards"],
+            "victory_points_without_vp_cards": counters["victory_points_without_vp_cards"],
+        }
+
+    game.road_network = network = RoadNetwork()
+    for _ in range(reader.take(1)[0]):
+        player_id, count = reader.take(2)
+        network.components[player_id] = components = []
+        network.lengths[player_id] = lengths = []
+        for _ in range(count):
+            lengths.append(reader.take(1)[0])
+            components.append(frozenset(reader.counted()))
+
+    game.pending_trade = None
+    game.no_partner = {}
+    game.draws = {}
+    if flags & TRADE:
+        tail = json.loads(reader.take(reader.unpack(TAIL)[0]))
+        trade = tail["pending_trade"]
+        if trade is not None:
+            game.pending_trade = {key: set(value) if key in TRADE_SETS else value for key, value in trade.items()}
+        game.no_partner = {int(player_id): value for player_id, value in tail["no_partner"].items()}
+
+    if flags & RNG:
+        key, counter, has_gauss, gauss = reader.unpack(RNG_STATE)
+        game.rng = GameRandom.__new__(GameRandom)
+        game.rng.setstate((key, counter, gauss if has_gauss else None))
+    elif flags & MERSENNE:
+        *words, has_gauss, gauss = reader.unpack(MERSENNE_STATE)
+        game.rng = random.Random()
+        game.rng.setstate((3, tuple(words), gauss if has_gauss else None))
+    else:
+        game.rng = GameRandom()
+    if reader.offset != len(data):
+        raise SnapshotError("Trailing bytes after snapshot")
+    return game
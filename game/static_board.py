@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 # Board Components
 class Tile:
     # Tiles Represent Hexagons
@@ -206,7 +209,7 @@ VERTEX_VERTEX = (
     (6, 13, 15),
     (14, 25),
     # Row 2
-    (17, 26),
+    (17, 27),
     (7, 16, 18),
     (17, 19, 29),
     (9, 18, 20),
@@ -532,7 +535,7 @@ EDGE_EDGE = (
     (32, 48),
     # Row 6
     (33, 40, 49),
-    (34, 39, 41, 39),
+    (34, 39, 41, 49),
     (34, 40, 42, 50),
     (35, 41, 43, 50),
     (35, 42, 44, 51),
@@ -569,3 +572,25 @@ EDGE_EDGE = (
     (64, 69, 71),
     (65, 70)
 )
+
+
+# Topology for Network Transmission
+# The adjacency never changes, so clients fetch it once (GET /board/topology) and game states only carry its hash
+def topology_to_json() -> dict:
+    return {
+        "tiles": [
+            {"id": i, "tiles": TILE_TILE[i], "vertices": TILE_VERTEX[i], "edges": TILE_EDGE[i]}
+            for i in range(19)
+        ],
+        "vertices": [
+            {"id": i, "tiles": VERTEX_TILE[i], "vertices": VERTEX_VERTEX[i], "edges": VERTEX_EDGE[i]}
+            for i in range(54)
+        ],
+        "edges": [
+            {"id": i, "tiles": EDGE_TILE[i], "vertices": EDGE_VERTEX[i], "edges": EDGE_EDGE[i]}
+            for i in range(72)
+        ]
+    }
+
+TOPOLOGY_BYTES = json.dumps(topology_to_json(), separators=(",", ":"), sort_keys=True).encode()
+TOPOLOGY_HASH = hashlib.sha256(TOPOLOGY_BYTES).hexdigest()[:16]
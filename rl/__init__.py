@@ -0,0 +1,2 @@
+from .batch_env import *
+from .env import CatanEnv, CatanParallelEnv, ObservationEncoder
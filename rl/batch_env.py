@@ -0,0 +1,483 @@
+import numpy as np
+
+from game import static_board
+from game.board import PORT_POSITIONS
+from game.board_generator import OTHER_NUMBERS, RED_NUMBERS, RED_TILE_SETS
+from rl.graph import GRAPH
+
+'''
+Batched Environment
+
+Runs N games in lockstep, the whole state lives in NumPy arrays with the game as first axis.
+The rules follow game/logic.py and game/action.py (same placement order, distance rule, road rule, production,
+bank limits, 4:1/3:1/2:1 bank trades, development cards, knights, largest army and longest road).
+
+Players are indexed 0 .. n_players-1 (Game uses 1 .. n_players), -1 means no owner.
+Every game takes one action per step (see the action layout below), step(actions) validates all of them against
+legal_mask() and applies them at once. Dice, production and the bank are fully vectorised,
+the rare parts (discarding on a 7, stealing, longest road) loop over the affected games only.
+
+Differences to Game, because there is no second player to ask in lockstep:
+- a 7 makes players with more than 7 cards discard half of them at random, in the same step
+- the robber steals from a random candidate on the target tile
+- player to player trades and the Road Building / Year of Plenty / Monopoly cards are not played (they still count as cards)
+'''
+RESOURCES = ("wood", "brick", "sheep", "wheat", "ore") # same order as a Game hand
+DEVELOPMENT_CARDS = ("knight", "victory_point", "road_building", "year_of_plenty", "monopoly")
+KNIGHT, VICTORY_POINT = 0, 1
+
+# Tile resource codes: 0 desert, 1 + index in RESOURCES
+TILE_RESOURCES = ['wood'] * 4 + ['brick'] * 3 + ['sheep'] * 4 + ['wheat'] * 4 + ['ore'] * 3
+# Numbers are placed like game/board_generator.py: the 6s and 8s on one of the RED_TILE_SETS, the others on the rest
+RED_TILES = np.array(RED_TILE_SETS, dtype=np.int64)
+RED = np.array(RED_NUMBERS, dtype=np.int8)
+OTHERS = np.array(OTHER_NUMBERS, dtype=np.int8)
+DEVELOPMENT_DECK = np.array([KNIGHT] * 14 + [VICTORY_POINT] * 5 + [2] * 2 + [3] * 2 + [4] * 2, dtype=np.int8)
+
+# Port codes: 0 none, 1 3:1, 2 + index in RESOURCES for the 2:1 ports
+PORTS = np.array([1, 1, 1, 1, 2, 3, 4, 5, 6], dtype=np.int8)
+
+# Costs in RESOURCES order
+ROAD_COST = np.array([1, 1, 0, 0, 0])
+SETTLEMENT_COST = np.array([1, 1, 1, 1, 0])
+CITY_COST = np.array([0, 0, 0, 2, 3])
+DEVELOPMENT_CARD_COST = np.array([0, 0, 1, 1, 1])
+
+# Action layout
+END_TURN = 0
+ROLL_DICE = 1
+SETTLEMENT = 2 # + vertex id
+CITY = SETTLEMENT + 54 # + vertex id
+ROAD = CITY + 54 # + edge id
+ROBBER = ROAD + 72 # + tile id
+BUY_DEVELOPMENT_CARD = ROBBER + 19
+PLAY_KNIGHT = BUY_DEVELOPMENT_CARD + 1
+BANK_TRADE = PLAY_KNIGHT + 1 # + give * 4 + (index of receive among the other 4 resources)
+N_ACTIONS = BANK_TRADE + 20
+TRADES = [(give, receive) for give in range(5) for receive in range(5) if give != receive]
+
+# Phases
+INITIAL_SETTLEMENT, INITIAL_ROAD, TURN, MOVE_ROBBER, DONE = range(5)
+
+
+# Padded neighbour tables from rl/graph.py: padding points to an extra slot at the end of the vertex/edge axis that is always empty
+TILE_VERTEX = GRAPH["tile_vertex"]["index"]
+VERTEX_VERTEX = GRAPH["vertex_vertex"]["index"]
+VERTEX_EDGE = GRAPH["vertex_edge"]["index"]
+VERTEX_TILE = GRAPH["vertex_tile"]["index"]
+EDGE_VERTEX = GRAPH["edge_vertex"]["index"]
+EDGE_EDGE = GRAPH["edge_edge"]["index"]
+
+
+class BatchEnv:
+    def __init__(self, n_games: int, n_players: int = 4, seed: int | None = None, auto_reset: bool = True) -> None:
+        self.n_games = n_games
+        self.n_players = n_players
+        self.auto_reset = auto_reset
+        self.rng = np.random.default_rng(seed)
+        N, P = n_games, n_players
+
+        # Board
+        self.tile_resource = np.zeros((N, 19), dtype=np.int8)
+        self.tile_number = np.zeros((N, 19), dtype=np.int8)
+        self.robber_tile = np.zeros(N, dtype=np.int64)
+        self.vertex_port = np.zeros((N, 54), dtype=np.int8)
+        self.vertex_owner = np.full((N, 55), -1, dtype=np.int8) # last column is the padding slot
+        self.vertex_building = np.zeros((N, 55), dtype=np.int8) # 0 none, 1 settlement, 2 city
+        self.edge_owner = np.full((N, 73), -1, dtype=np.int8) # last column is the padding slot
+
+        # Players
+        self.hands = np.zeros((N, P, 5), dtype=np.int32)
+        self.development_cards = np.zeros((N, P, 5), dtype=np.int32)
+        self.cards_bought_this_turn = np.zeros((N, P, 5), dtype=np.int32)
+        self.played_knights = np.zeros((N, P), dtype=np.int32)
+        self.pieces = np.zeros((N, P, 3), dtype=np.int32) # settlements, cities, roads left
+        self.ports = np.zeros((N, P, 6), dtype=bool) # 3:1, then 2:1 per resource
+        self.longest_road_length = np.zeros((N, P), dtype=np.int32)
+        self.longest_road = np.full(N, -1, dtype=np.int64) # holder
+        self.largest_army = np.full(N, -1, dtype=np.int64) # holder
+
+        # Bank and development deck
+        self.bank = np.zeros((N, 5), dtype=np.int32)
+        self.development_deck = np.zeros((N, 25), dtype=np.int8)
+        self.development_remaining = np.zeros(N, dtype=np.int64)
+
+        # Flow
+        self.phase = np.zeros(N, dtype=np.int8)
+        self.current_player = np.zeros(N, dtype=np.int64)
+        self.placement_order = np.zeros((N, 4 * P), dtype=np.int64)
+        self.counter = np.zeros(N, dtype=np.int64)
+        self.last_vertex = np.zeros(N, dtype=np.int64)
+        self.dice_rolled = np.zeros(N, dtype=bool)
+        self.played_card_this_turn = np.zeros(N, dtype=bool)
+        self.last_roll = np.zeros(N, dtype=np.int8)
+        self.winner = np.full(N, -1, dtype=np.int64)
+
+        self.reset()
+
+    # Setup
+    def reset(self, games: np.ndarray | None = None) -> None:
+        games = np.arange(self.n_games) if games is None else np.flatnonzero(games) if games.dtype == bool else games
+        k, P = len(games), self.n_players
+        if k == 0:
+            return
+        rng = self.rng
+
+        # Numbers: a random set of non-adjacent tiles for the 6s and 8s, no rejection loop
+        red = np.zeros((k, 19), dtype=bool)
+        red[np.arange(k)[:, None], RED_TILES[rng.integers(0, len(RED_TILES), size=k)]] = True
+        numbers = np.empty((k, 19), dtype=np.int8)
+        numbers[red] = RED[np.argsort(rng.random((k, 4)), axis=1)].ravel()
+        numbers[~red] = OTHERS[np.argsort(rng.random((k, 15)), axis=1)].ravel()
+        self.tile_number[games] = numbers
+
+        resources = np.array([1 + RESOURCES.index(r) for r in TILE_RESOURCES], dtype=np.int8)
+        shuffled = resources[np.argsort(rng.random((k, 18)), axis=1)]
+        land = numbers != 0
+        tile_resource = np.zeros((k, 19), dtype=np.int8)
+        tile_resource[land] = shuffled.ravel()
+        self.tile_resource[games] = tile_resource
+        self.robber_tile[games] = np.argmax(~land, axis=1)
+
+        port_config = rng.integers(0, 2, size=k)
+        ports = PORTS[np.argsort(rng.random((k, 9)), axis=1)]
+        vertex_port = np.zeros((k, 54), dtype=np.int8)
+        for config in (0, 1):
+            rows = np.flatnonzero(port_config == config)
+            for i, positions in enumerate(PORT_POSITIONS[config]):
+                for vertex in positions:
+                    vertex_port[rows, vertex] = ports[rows, i]
+        self.vertex_port[games] = vertex_port
+
+        self.vertex_owner[games] = -1
+        self.vertex_building[games] = 0
+        self.edge_owner[games] = -1
+
+        self.hands[games] = 0
+        self.development_cards[games] = 0
+        self.cards_bought_this_turn[games] = 0
+        self.played_knights[games] = 0
+        self.pieces[games] = (5, 4, 15)
+        self.ports[games] = False
+        self.longest_road_length[games] = 0
+        self.longest_road[games] = -1
+        self.largest_army[games] = -1
+
+        self.bank[games] = 19
+        self.development_deck[games] = DEVELOPMENT_DECK[np.argsort(rng.random((k, 25)), axis=1)]
+        self.development_remaining[games] = 25
+
+        # Same placement order as Game.start_game: start player forward, then backwards, settlement + road each
+        start = rng.integers(0, P, size=k)
+        forward = (start[:, None] + np.arange(P)) % P
+        order = np.concatenate([forward, forward[:, ::-1]], axis=1)
+        self.placement_order[games] = np.repeat(order, 2, axis=1)
+        self.counter[games] = 0
+        self.current_player[games] = start
+        self.phase[games] = INITIAL_SETTLEMENT
+        self.dice_rolled[games] = False
+        self.played_card_this_turn[games] = False
+        self.last_roll[games] = 0
+        self.winner[games] = -1
+
+    # Derived state
+    def victory_points(self) -> np.ndarray:
+        # (N, P), including hidden victory point cards
+        players = np.arange(self.n_players)
+        owned = self.vertex_owner[:, None, :54] == players[None, :, None]
+        points = (owned * self.vertex_building[:, None, :54]).sum(axis=2)
+        points += self.development_cards[:, :, VICTORY_POINT]
+        points += 2 * (self.longest_road[:, None] == players[None, :])
+        points += 2 * (self.largest_army[:, None] == players[None, :])
+        return points
+
+    def trade_ratios(self) -> np.ndarray:
+        # (N, P, 5) like port_ratios_for_player
+        ratios = np.full((self.n_games, self.n_players, 5), 4, dtype=np.int32)
+        ratios[self.ports[:, :, 0]] = 3
+        ratios[self.ports[:, :, 1:]] = 2
+        return ratios
+
+    def legal_mask(self) -> np.ndarray:
+        N = self.n_games
+        games = np.arange(N)
+        player = self.current_player
+        hand = self.hands[games, player] # (N, 5)
+        pieces = self.pieces[games, player]
+        phase = self.phase
+        turn = phase == TURN
+        building = turn & self.dice_rolled
+        mask = np.zeros((N, N_ACTIONS), dtype=bool)
+
+        built = self.vertex_owner >= 0
+        free_vertex = ~built[:, :54] & ~built[:, VERTEX_VERTEX].any(axis=2) # empty and distance rule
+        own_edge = self.edge_owner == player[:, None]
+        own_vertex = self.vertex_owner == player[:, None]
+
+        # Initial placement
+        initial_settlement = phase == INITIAL_SETTLEMENT
+        mask[:, SETTLEMENT:CITY] |= initial_settlement[:, None] & free_vertex
+        initial_road = (phase == INITIAL_ROAD)[:, None] & (self.edge_owner[:, :72] < 0) & (EDGE_VERTEX[None] == self.last_vertex[:, None, None]).any(axis=2)
+        mask[:, ROAD:ROBBER] |= initial_road
+
+        # Turn
+        mask[:, END_TURN] = building
+        mask[:, ROLL_DICE] = turn & ~self.dice_rolled
+        can_settle = building & (pieces[:, 0] > 0) & (hand >= SETTLEMENT_COST).all(axis=1)
+        mask[:, SETTLEMENT:CITY] |= can_settle[:, None] & free_vertex & own_edge[:, VERTEX_EDGE].any(axis=2)
+        can_city = building & (pieces[:, 1] > 0) & (hand >= CITY_COST).all(axis=1)
+        mask[:, CITY:ROAD] = can_city[:, None] & own_vertex[:, :54] & (self.vertex_building[:, :54] == 1)
+        # Paid roads are also allowed while the robber waits to be moved after the roll (same as Game)
+        can_road = (building | (phase == MOVE_ROBBER) & self.dice_rolled) & (pieces[:, 2] > 0) & (hand >= ROAD_COST).all(axis=1)
+        connected = own_vertex[:, EDGE_VERTEX].any(axis=2) | own_edge[:, EDGE_EDGE].any(axis=2)
+        mask[:, ROAD:ROBBER] |= can_road[:, None] & (self.edge_owner[:, :72] < 0) & connected
+        mask[:, ROBBER:BUY_DEVELOPMENT_CARD] = (phase == MOVE_ROBBER)[:, None] & (np.arange(19)[None] != self.robber_tile[:, None])
+        mask[:, BUY_DEVELOPMENT_CARD] = building & (self.development_remaining > 0) & (hand >= DEVELOPMENT_CARD_COST).all(axis=1)
+        knights = self.development_cards[games, player, KNIGHT] - self.cards_bought_this_turn[games, player, KNIGHT]
+        mask[:, PLAY_KNIGHT] = turn & ~self.played_card_this_turn & (knights > 0)
+
+        ratios = self.trade_ratios()[games, player]
+        for i, (give, receive) in enumerate(TRADES):
+            mask[:, BANK_TRADE + i] = turn & (hand[:, give] >= ratios[:, give]) & (self.bank[:, receive] >= 1) # also before the roll
+        return mask
+
+    # Step
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Returns (rewards (N, P), done (N,), valid (N,)), invalid actions are ignored
+        actions = np.asarray(actions, dtype=np.int64)
+        games = np.arange(self.n_games)
+        valid = self.legal_mask()[games, actions]
+        player = self.current_player.copy()
+
+        def select(low: int, high: int) -> tuple[np.ndarray, np.ndarray]:
+            g = np.flatnonzero(valid & (actions >= low) & (actions < high))
+            return g, actions[g] - low
+
+        road_changed = np.zeros(self.n_games, dtype=bool)
+
+        g, vertex = select(SETTLEMENT, CITY)
+        if len(g):
+            self.place_settlement(g, player[g], vertex)
+            road_changed[g] = True
+        g, vertex = select(CITY, ROAD)
+        if len(g):
+            self.pay(g, player[g], CITY_COST)
+            self.vertex_building[g, vertex] = 2
+            self.pieces[g, player[g], 1] -= 1
+            self.pieces[g, player[g], 0] += 1
+        g, edge = select(ROAD, ROBBER)
+        if len(g):
+            self.place_road(g, player[g], edge)
+            road_changed[g] = True
+        g, _ = select(ROLL_DICE, ROLL_DICE + 1)
+        if len(g):
+            self.roll_dice(g)
+        g, tile = select(ROBBER, BUY_DEVELOPMENT_CARD)
+        if len(g):
+            self.move_robber(g, player[g], tile)
+        g, _ = select(BUY_DEVELOPMENT_CARD, PLAY_KNIGHT)
+        if len(g):
+            self.pay(g, player[g], DEVELOPMENT_CARD_COST)
+            self.development_remaining[g] -= 1
+            card = self.development_deck[g, self.development_remaining[g]]
+            self.development_cards[g, player[g], card] += 1
+            self.cards_bought_this_turn[g, player[g], card] += 1
+        g, _ = select(PLAY_KNIGHT, BANK_TRADE)
+        if len(g):
+            self.play_knight(g, player[g])
+        g, trade = select(BANK_TRADE, N_ACTIONS)
+        if len(g):
+            give, receive = np.array(TRADES)[trade].T
+            ratio = self.trade_ratios()[g, player[g], give]
+            self.hands[g, player[g], give] -= ratio
+            self.bank[g, give] += ratio
+            self.hands[g, player[g], receive] += 1
+            self.bank[g, receive] -= 1
+        g, _ = select(END_TURN, END_TURN + 1)
+        if len(g):
+            self.current_player[g] = (player[g] + 1) % self.n_players
+            self.dice_rolled[g] = False
+            self.played_card_this_turn[g] = False
+            self.cards_bought_this_turn[g] = 0
+
+        if road_changed.any():
+            self.update_longest_road(np.flatnonzero(road_changed))
+
+        # Like Game.call_action only the acting player can win
+        won = valid & (self.phase != DONE) & (self.victory_points()[games, player] >= 10)
+        self.winner[won] = player[won]
+        self.phase[won] = DONE
+        rewards = np.zeros((self.n_games, self.n_players), dtype=np.float32)
+        rewards[won, player[won]] = 1.0
+        done = self.phase == DONE
+        if self.auto_reset and done.any():
+            self.reset(done)
+        return rewards, done, valid
+
+    def pay(self, g: np.ndarray, player: np.ndarray, cost: np.ndarray) -> None:
+        self.hands[g, player] -= cost
+        self.bank[g] += cost
+
+    def place_settlement(self, g: np.ndarray, player: np.ndarray, vertex: np.ndarray) -> None:
+        initial = self.phase[g] == INITIAL_SETTLEMENT
+        bought = g[~initial]
+        self.pay(bought, player[~initial], SETTLEMENT_COST)
+        self.vertex_owner[g, vertex] = player
+        self.vertex_building[g, vertex] = 1
+        self.pieces[g, player, 0] -= 1
+        port = self.vertex_port[g, vertex]
+        has_port = port > 0
+        self.ports[g[has_port], player[has_port], port[has_port] - 1] = True
+
+        # Initial placement: the second settlement gives one of each adjacent resource
+        g, player, vertex = g[initial], player[initial], vertex[initial]
+        second = self.counter[g] >= 2 * self.n_players
+        tiles = VERTEX_TILE[vertex[second]] # (k, 3), padded with 19
+        resource = np.zeros(tiles.shape, dtype=np.int64)
+        real = tiles < 19
+        resource[real] = self.tile_resource[np.repeat(g[second], tiles.shape[1])[real.ravel()], tiles[real]]
+        for column in range(tiles.shape[1]):
+            gets = resource[:, column] > 0
+            rows = g[second][gets]
+            self.hands[rows, player[second][gets], resource[gets, column] - 1] += 1
+            self.bank[rows, resource[gets, column] - 1] -= 1
+        self.last_vertex[g] = vertex
+        self.counter[g] += 1
+        self.phase[g] = INITIAL_ROAD
+        self.current_player[g] = self.placement_order[g, self.counter[g]]
+
+    def place_road(self, g: np.ndarray, player: np.ndarray, edge: np.ndarray) -> None:
+        initial = self.phase[g] == INITIAL_ROAD
+        self.pay(g[~initial], player[~initial], ROAD_COST)
+        self.edge_owner[g, edge] = player
+        self.pieces[g, player, 2] -= 1
+
+        g = g[initial]
+        self.counter[g] += 1
+        finished = self.counter[g] >= self.placement_order.shape[1]
+        self.phase[g] = np.where(finished, TURN, INITIAL_SETTLEMENT)
+        # After the initial placement the start player begins (same as Game)
+        self.current_player[g] = np.where(finished, self.placement_order[g, 0], self.placement_order[g, np.minimum(self.counter[g], self.placement_order.shape[1] - 1)])
+
+    def roll_dice(self, g: np.ndarray) -> None:
+        dice = self.rng.integers(1, 7, size=(len(g), 2)).sum(axis=1)
+        self.last_roll[g] = dice
+        self.dice_rolled[g] = True
+
+        produce = dice != 7
+        p, d = g[produce], dice[produce]
+        if len(p):
+            gains = self.production(p, d)
+            self.hands[p] += gains
+            self.bank[p] -= gains.sum(axis=1)
+
+        seven = g[~produce]
+        if len(seven):
+            self.discard_half(seven)
+            self.phase[seven] = MOVE_ROBBER
+
+    def production(self, g: np.ndarray, dice: np.ndarray) -> np.ndarray:
+        # (k, P, 5) resources the dice numbers (not 7) hand out in games g
+        hit = (self.tile_number[g] == dice[:, None]) & (np.arange(19)[None] != self.robber_tile[g][:, None]) # (k, 19)
+        owner = self.vertex_owner[g][:, TILE_VERTEX].astype(np.int64) # (k, 19, 6)
+        amount = self.vertex_building[g][:, TILE_VERTEX] * hit[:, :, None] * (owner >= 0)
+        resource = np.broadcast_to(self.tile_resource[g][:, :, None].astype(np.int64) - 1, owner.shape)
+        gains = np.zeros((len(g), self.n_players, 5), dtype=np.int32)
+        rows = np.broadcast_to(np.arange(len(g))[:, None, None], owner.shape)
+        produces = amount > 0
+        np.add.at(gains, (rows[produces], owner[produces], resource[produces]), amount[produces])
+        # Same bank rule as roll_dice: a resource is only handed out if the bank can pay everyone
+        gains *= (gains.sum(axis=1) <= self.bank[g])[:, None, :]
+        return gains
+
+    def discard_half(self, g: np.ndarray) -> None:
+        totals = self.hands[g].sum(axis=2)
+        for row, player in zip(*np.nonzero(totals > 7)):
+            game = g[row]
+            cards = np.repeat(np.arange(5), self.hands[game, player])
+            lost = self.rng.choice(cards, size=len(cards) // 2, replace=False)
+            counts = np.bincount(lost, minlength=5)
+            self.hands[game, player] -= counts
+            self.bank[game] += counts
+
+    def move_robber(self, g: np.ndarray, player: np.ndarray, tile: np.ndarray) -> None:
+        self.robber_tile[g] = tile
+        for game, stealer, target in zip(g, player, tile):
+            victims = self.robbable(game, stealer, target)
+            if victims:
+                victim = self.rng.choice(victims)
+                resource = self.rng.choice(5, p=self.hands[game, victim] / self.hands[game, victim].sum())
+                self.hands[game, victim, resource] -= 1
+                self.hands[game, stealer, resource] += 1
+        self.phase[g] = TURN
+
+    def robbable(self, game: int, stealer: int, tile: int) -> list[int]:
+        # Players with a building on the tile and cards in hand, sorted (robbable_players_on_tile)
+        owners = set(self.vertex_owner[game, TILE_VERTEX[tile]].tolist())
+        return sorted(v for v in owners if v >= 0 and v != stealer and self.hands[game, v].sum() > 0)
+
+    def play_knight(self, g: np.ndarray, player: np.ndarray) -> None:
+        self.development_cards[g, player, KNIGHT] -= 1
+        self.played_knights[g, player] += 1
+        self.played_card_this_turn[g] = True
+        knights = self.played_knights[g, player]
+        holder = self.largest_army[g]
+        holder_knights = np.where(holder >= 0, self.played_knights[g, np.maximum(holder, 0)], 0)
+        takes = (knights >= 3) & (holder != player) & ((holder < 0) | (holder_knights < knights))
+        self.largest_army[g[takes]] = player[takes]
+        self.phase[g] = MOVE_ROBBER
+
+    def update_longest_road(self, g: np.ndarray) -> None:
+        for game in g:
+            for player in range(self.n_players):
+                self.longest_road_length[game, player] = longest_trail(self.edge_owner[game], self.vertex_owner[game], player)
+            # Same rules as update_longest_road
+            lengths = self.longest_road_length[game]
+            best = int(np.argmax(lengths))
+            holder = self.longest_road[game]
+            if lengths[best] < 5:
+                self.longest_road[game] = -1
+            elif holder < 0 or (holder != best and lengths[holder] < lengths[best]):
+                self.longest_road[game] = best
+
+    def observation(self) -> dict:
+        # Views on the state arrays (no copies)
+        return {
+            "tile_resource": self.tile_resource,
+            "tile_number": self.tile_number,
+            "robber_tile": self.robber_tile,
+            "vertex_owner": self.vertex_owner[:, :54],
+            "vertex_building": self.vertex_building[:, :54],
+            "vertex_port": self.vertex_port,
+            "edge_owner": self.edge_owner[:, :72],
+            "hands": self.hands,
+            "development_cards": self.development_cards,
+            "bank": self.bank,
+            "development_remaining": self.development_remaining,
+            "current_player": self.current_player,
+            "phase": self.phase,
+        }
+
+
+def longest_trail(edge_owner: np.ndarray, vertex_owner: np.ndarray, player: int) -> int:
+    # Exact longest trail of one player on one board (same result as game.road_network.longest_trail, which only
+    # starts at dead ends, junctions and blocked vertices; here every vertex is tried, all components at once)
+    edges = set(np.flatnonzero(edge_owner[:72] == player).tolist())
+    if not edges:
+        return 0
+    used = set()
+
+    def walk(vertex: int) -> int:
+        best = 0
+        for edge in static_board.VERTEX_EDGE[vertex]:
+            if edge in used or edge not in edges:
+                continue
+            a, b = static_board.EDGE_VERTEX[edge]
+            vertex_2 = a if b == vertex else b
+            used.add(edge)
+            length = 1 + (walk(vertex_2) if vertex_owner[vertex_2] in (-1, player) else 0)
+            used.discard(edge)
+            best = max(best, length)
+        return best
+
+    return max(walk(vertex) for vertex in {v for edge in edges for v in static_board.EDGE_VERTEX[edge]})
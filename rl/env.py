@@ -0,0 +1,297 @@
+import random
+
+import numpy as np
+
+from game import action_space
+from game.action import port_ratios_for_player
+from game.board import PORT_TYPES, RESOURCES as TILE_TYPES
+from game.logic import Game
+from game.snapshot import FORCED_ACTIONS
+from rl.policies import make_policy, random_discard
+
+try: # optional, the envs follow its API without it
+    import gymnasium
+    from gymnasium import spaces
+except ImportError:
+    gymnasium = None
+
+'''
+Gymnasium Environments
+
+CatanEnv is a single-agent env (gymnasium.Env API: reset(seed) -> (obs, info), step(action) -> (obs, reward,
+terminated, truncated, info)) on top of game.logic.Game: the agent plays one seat, the other seats are rl/policies.py
+policies that move inside step() until the game waits for the agent again.
+CatanParallelEnv is the multi-agent version (PettingZoo ParallelEnv style, dicts keyed by player id):
+every step takes the actions of the players the game waits for.
+
+Actions are indices into game/action_space.py, decoded to call_action payloads (bank trades at the player's port
+ratio, DISCARD_RESOURCES discards the owed number of random cards). PROPOSE_TRADE is never legal here.
+An illegal action leaves the game as it is and sets info["invalid"].
+Rewards: 1 for a win, -1 when another player wins, 0 otherwise. Games are truncated after max_actions actions.
+
+Observations are preallocated NumPy arrays, filled in place from the CompactBoard arrays (no dicts, no JSON),
+the same arrays are returned by every step (copy them to keep them). Seen by one player, players are in turn order
+starting with that player (index 0 is always the observer):
+- tiles (19, 18): resource one-hot (game.board.RESOURCES order), number one-hot (2..12), robber
+- vertices (54, 14): settlement per player, city per player, port one-hot (PORT_TYPES without None)
+- edges (72, 4): road per player
+- players (4, 13): PLAYER_FEATURES, what public_player_state shows (victory points without development cards)
+- hand (5,), development_cards (5,): the observer's own (action_space.RESOURCES, DEVELOPMENT_CARDS order)
+- bank (5,), flags (14,): FLAGS then the forced action one-hot (FORCED_ACTIONS without None)
+- action_mask (N_ACTIONS,) int8: legal actions of the observer
+Gymnasium is optional; with it installed the envs are gymnasium.Env subclasses with observation/action spaces.
+'''
+MAX_ACTIONS = 5000
+DEVELOPMENT_CARDS = ("knight", "victory_point", "road_building", "year_of_plenty", "monopoly")
+PLAYER_FEATURES = (
+    "total_hand", "total_development_cards", "victory_points", "played_knights", "longest_road_length",
+    "settlements", "cities", "roads", "longest_road", "largest_army", "played_card_this_turn", "dice_rolled", "current_turn",
+)
+FLAGS = ("initial_placement", "acting", "must_discard", "pending_trade", "development_cards_remaining", "dice")
+OBSERVATION_SHAPES = {
+    "tiles": (19, len(TILE_TYPES) + 11 + 1),
+    "vertices": (54, 4 * 2 + len(PORT_TYPES) - 1),
+    "edges": (72, 4),
+    "players": (4, len(PLAYER_FEATURES)),
+    "hand": (5,),
+    "development_cards": (5,),
+    "bank": (5,),
+    "flags": (len(FLAGS) + len(FORCED_ACTIONS) - 1,),
+}
+
+
+class ObservationEncoder:
+    # One player's view of one game, written into the same arrays every time
+    def __init__(self, n_players: int = 4) -> None:
+        self.n_players = n_players
+        self.buffers = {name: np.zeros(shape, dtype=np.float32) for name, shape in OBSERVATION_SHAPES.items()}
+        self.buffers["action_mask"] = np.zeros(action_space.N_ACTIONS, dtype=np.int8)
+        self.game = None
+
+    def attach(self, game: Game) -> None:
+        # After a reset: views on the board arrays and the parts that never change (needs a CompactBoard)
+        board = game.board
+        self.game = game
+        self.vertex_owner = np.frombuffer(board.vertex_owner, dtype=np.int8)
+        self.vertex_building = np.frombuffer(board.vertex_building, dtype=np.int8)
+        self.edge_owner = np.frombuffer(board.edge_owner, dtype=np.int8)
+
+        tiles = self.buffers["tiles"]
+        tiles[:] = 0
+        tiles[np.arange(19), np.frombuffer(board.tile_resource, dtype=np.int8)] = 1
+        numbers = np.frombuffer(board.tile_number, dtype=np.int8)
+        land = np.flatnonzero(numbers)
+        tiles[land, len(TILE_TYPES) + numbers[land] - 2] = 1
+
+        vertices = self.buffers["vertices"]
+        vertices[:] = 0
+        ports = np.frombuffer(board.vertex_port, dtype=np.int8)
+        coast = np.flatnonzero(ports)
+        vertices[coast, 4 * 2 + ports[coast] - 1] = 1
+
+    def fill(self, player_id: int) -> dict[str, np.ndarray]:
+        game, buffers, n = self.game, self.buffers, self.n_players
+        board = game.board
+
+        tiles = buffers["tiles"]
+        tiles[:, -1] = 0
+        tiles[board.robber_tile, -1] = 1
+
+        # Owners 1..n become 0..n-1 counted from the observer, -1 stays none
+        vertices = buffers["vertices"]
+        vertices[:, :8] = 0
+        built = np.flatnonzero(self.vertex_owner >= 0)
+        relative = (self.vertex_owner[built] - player_id) % n
+        vertices[built, relative + 4 * (self.vertex_building[built] - 1)] = 1
+
+        edges = buffers["edges"]
+        edges[:] = 0
+        roads = np.flatnonzero(self.edge_owner >= 0)
+        edges[roads, (self.edge_owner[roads] - player_id) % n] = 1
+
+        players = buffers["players"]
+        for pid, player in game.players.items():
+            hand = player["hand"]
+            cards = player["development_cards"]
+            players[(pid - player_id) % n] = (
+                hand["wood"] + hand["brick"] + hand["sheep"] + hand["wheat"] + hand["ore"],
+                cards["knight"] + cards["victory_point"] + cards["road_building"] + cards["year_of_plenty"] + cards["monopoly"],
+                player["victory_points"] - cards["victory_point"], player["played_knights"], player["longest_road_length"],
+                player["settlements"], player["cities"], player["roads"], player["longest_road"], player["largest_army"],
+                player["played_card_this_turn"], player["dice_rolled"], player["current_turn"],
+            )
+
+        player = game.players[player_id]
+        buffers["hand"][:] = [player["hand"][resource] for resource in action_space.RESOURCES]
+        buffers["development_cards"][:] = [player["development_cards"][card] for card in DEVELOPMENT_CARDS]
+        buffers["bank"][:] = [game.bank[resource] for resource in action_space.RESOURCES]
+
+        flags = buffers["flags"]
+        flags[:] = 0
+        flags[0] = game.counter < len(game.initial_placement_order)
+        flags[1] = player_id in game.waiting_for()
+        flags[2] = game.pending_discard.get(player_id, 0) if game.forced_action == "Discard" else 0
+        flags[3] = game.pending_trade is not None
+        flags[4] = len(game.development_cards)
+        flags[5] = game.number or 0
+        if game.forced_action in FORCED_ACTIONS[1:]:
+            flags[len(FLAGS) + FORCED_ACTIONS.index(game.forced_action) - 1] = 1
+
+        mask = buffers["action_mask"]
+        mask[:] = game.legal_actions(player_id)
+        mask[action_space.PROPOSE_TRADE] = 0
+        return buffers
+
+
+def decode(game: Game, player_id: int, index: int, rng: random.Random) -> dict:
+    # Action index -> call_action payload
+    if index == action_space.DISCARD_RESOURCES:
+        return random_discard(game, player_id, rng)
+    return action_space.decode_action(index, port_ratios_for_player(player_id, game.players))
+
+
+def observation_space():
+    spaces_ = {name: spaces.Box(0, np.inf, shape, np.float32) for name, shape in OBSERVATION_SHAPES.items()}
+    spaces_["action_mask"] = spaces.MultiBinary(action_space.N_ACTIONS)
+    return spaces.Dict(spaces_)
+
+
+class CatanEnv(gymnasium.Env if gymnasium else object):
+    metadata = {"render_modes": []}
+
+    def __init__(self, opponents: tuple[str, ...] = ("greedy", "greedy", "greedy"), player_id: int = 1,
+                 seed: int | None = None, max_actions: int = MAX_ACTIONS) -> None:
+        # opponents: policy names (rl/policies.py) for the other seats, the agent sits at player_id
+        self.n_players = len(opponents) + 1
+        self.opponent_names = opponents
+        self.player_id = player_id
+        self.max_actions = max_actions
+        self.rng = random.Random(seed)
+        self.encoder = ObservationEncoder(self.n_players)
+        self.game = None
+        if gymnasium:
+            self.action_space = spaces.Discrete(action_space.N_ACTIONS)
+            self.observation_space = observation_space()
+
+    def reset(self, seed: int | None = None, options: dict | None = None) -> tuple[dict, dict]:
+        if seed is not None:
+            self.rng.seed(seed)
+        self.game = Game(compact_board=True, seed=self.rng.getrandbits(64))
+        for player_id in range(1, self.n_players + 1):
+            self.game.add_player(player_id)
+        self.game.start_game()
+        others = [player_id for player_id in self.game.players if player_id != self.player_id]
+        self.opponents = {player_id: make_policy(name, self.rng.getrandbits(32)) for player_id, name in zip(others, self.opponent_names)}
+        self.actions = 0
+        self.encoder.attach(self.game)
+        winner, stuck = self.play_opponents()
+        return self.encoder.fill(self.player_id), {"winner": winner, "stuck": stuck}
+
+    def play_opponents(self) -> tuple[int | None, bool]:
+        # Lets the other seats move until the game waits for the agent: (winner, stuck)
+        game = self.game
+        while self.actions < self.max_actions:
+            waiting = game.waiting_for()
+            if self.player_id in waiting:
+                return None, False
+            player_id = waiting[0]
+            action = self.opponents[player_id].act(game, player_id)
+            result = game.call_action(player_id, action, return_state=False) if action else False
+            if result is False:
+                return None, True
+            self.actions += 1
+            if result is not True:
+                return result, False
+        return None, False
+
+    def step(self, action: int) -> tuple[dict, float, bool, bool, dict]:
+        game = self.game
+        info = {}
+        result = False
+        if self.encoder.buffers["action_mask"][action]:
+            result = game.call_action(self.player_id, decode(game, self.player_id, int(action), self.rng), return_state=False)
+        if result is False:
+            info["invalid"] = True
+            return self.encoder.fill(self.player_id), 0.0, False, self.actions >= self.max_actions, info
+        self.actions += 1
+        winner, stuck = (result, False) if result is not True else self.play_opponents()
+        terminated = winner is not None
+        truncated = not terminated and (stuck or self.actions >= self.max_actions)
+        reward = 0.0 if winner is None else 1.0 if winner == self.player_id else -1.0
+        info["winner"] = winner
+        return self.encoder.fill(self.player_id), reward, terminated, truncated, info
+
+    def action_masks(self) -> np.ndarray:
+        # Legal actions of the current observation (the name masked PPO implementations look for)
+        return self.encoder.buffers["action_mask"]
+
+
+class CatanParallelEnv:
+    metadata = {"name": "catan_v0", "render_modes": []}
+
+    def __init__(self, n_players: int = 4, seed: int | None = None, max_actions: int = MAX_ACTIONS) -> None:
+        self.possible_agents = list(range(1, n_players + 1))
+        self.agents = []
+        self.max_actions = max_actions
+        self.rng = random.Random(seed)
+        self.encoders = {player_id: ObservationEncoder(n_players) for player_id in self.possible_agents}
+        self.game = None
+        if gymnasium:
+            self.action_spaces = {player_id: spaces.Discrete(action_space.N_ACTIONS) for player_id in self.possible_agents}
+            self.observation_spaces = {player_id: observation_space() for player_id in self.possible_agents}
+
+    def observation_space(self, agent: int):
+        return self.observation_spaces[agent]
+
+    def action_space(self, agent: int):
+        return self.action_spaces[agent]
+
+    def observe(self) -> tuple[dict, dict]:
+        observations = {player_id: encoder.fill(player_id) for player_id, encoder in self.encoders.items()}
+        waiting = self.game.waiting_for()
+        return observations, {player_id: {"acting": player_id in waiting} for player_id in self.agents}
+
+    def reset(self, seed: int | None = None, options: dict | None = None) -> tuple[dict, dict]:
+        if seed is not None:
+            self.rng.seed(seed)
+        self.game = Game(compact_board=True, seed=self.rng.getrandbits(64))
+        for player_id in self.possible_agents:
+            self.game.add_player(player_id)
+        self.game.start_game()
+        self.agents = list(self.possible_agents)
+        self.actions = 0
+        for encoder in self.encoders.values():
+            encoder.attach(self.game)
+        return self.observe()
+
+    def step(self, actions: dict[int, int]) -> tuple[dict, dict, dict, dict, dict]:
+        # Actions of players the game does not wait for are ignored
+        game = self.game
+        winner = None
+        invalid = set()
+        for player_id in game.waiting_for():
+            if player_id not in actions:
+                continue
+            index = int(actions[player_id])
+            result = False
+            if self.encoders[player_id].buffers["action_mask"][index]:
+                result = game.call_action(player_id, decode(game, player_id, index, self.rng), return_state=False)
+            if result is False:
+                invalid.add(player_id)
+                continue
+            self.actions += 1
+            if result is not True:
+                winner = result
+                break
+
+        observations, infos = self.observe()
+        for player_id in invalid:
+            infos[player_id]["invalid"] = True
+        terminated = winner is not None
+        truncated = not terminated and self.actions >= self.max_actions
+        rewards = {player_id: 0.0 if winner is None else 1.0 if winner == player_id else -1.0 for player_id in self.agents}
+        terminations = {player_id: terminated for player_id in self.agents}
+        truncations = {player_id: truncated for player_id in self.agents}
+        if terminated or truncated:
+            self.agents = []
+        return observations, rewards, terminations, truncations, infos
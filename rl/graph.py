@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+
+from game import static_board
+
+'''
+Board Graph Tensors
+
+The static board topology (game/static_board.py) as NumPy index arrays for graph networks, built once at import.
+Every relation ("vertex_edge": the edges at each vertex, ...) has:
+- index (n, max degree): padded neighbour table, padding is the extra slot n_target (one past the last id),
+  so features with an empty row appended can be gathered without masking (see gather)
+- mask (n, max degree): True for real neighbours
+- degree (n,)
+- coo (2, nnz): source and target ids, source major
+- indptr (n + 1,), indices (nnz,): CSR, indices[indptr[i]:indptr[i + 1]] are the neighbours of i
+
+The arrays are read-only and shared by everyone, a batch of states is handled by indexing with them:
+
+    features = np.zeros((n_games, 54, 8)) # per vertex
+    per_edge = gather(features, "edge_vertex") # (n_games, 72, 2, 8)
+    summed = aggregate(features, "vertex_vertex") # (n_games, 54, 8), sum over the neighbours
+
+GRAPH_CACHE: a directory to keep the arrays in as .npy files (under static_board.TOPOLOGY_HASH),
+they are written by the first process and memory-mapped by every later one. Unset: built in memory.
+'''
+GRAPH_CACHE = os.getenv("GRAPH_CACHE") # unset: no files
+SIZES = {"tile": 19, "vertex": 54, "edge": 72}
+TABLES = {
+    "tile_tile": static_board.TILE_TILE,
+    "tile_vertex": static_board.TILE_VERTEX,
+    "tile_edge": static_board.TILE_EDGE,
+    "vertex_tile": static_board.VERTEX_TILE,
+    "vertex_vertex": static_board.VERTEX_VERTEX,
+    "vertex_edge": static_board.VERTEX_EDGE,
+    "edge_tile": static_board.EDGE_TILE,
+    "edge_vertex": static_board.EDGE_VERTEX,
+    "edge_edge": static_board.EDGE_EDGE,
+}
+KINDS = ("index", "mask", "degree", "coo", "indptr", "indices")
+
+
+def build(table: tuple, n_target: int) -> dict[str, np.ndarray]:
+    degree = np.array([len(row) for row in table], dtype=np.int64)
+    width = degree.max()
+    index = np.array([tuple(row) + (n_target,) * (width - len(row)) for row in table], dtype=np.int64)
+    indices = np.array([target for row in table for target in row], dtype=np.int64)
+    return {
+        "index": index,
+        "mask": index < n_target,
+        "degree": degree,
+        "coo": np.stack([np.repeat(np.arange(len(table)), degree), indices]),
+        "indptr": np.concatenate([[0], np.cumsum(degree)]),
+        "indices": indices,
+    }
+
+
+def load(directory: str | None = GRAPH_CACHE) -> dict[str, dict[str, np.ndarray]]:
+    # relation -> kind -> array, memory-mapped from directory if given (written there first if missing)
+    graph = {}
+    if directory:
+        directory = os.path.join(directory, static_board.TOPOLOGY_HASH)
+        os.makedirs(directory, exist_ok=True)
+    for relation, table in TABLES.items():
+        arrays = None
+        graph[relation] = {}
+        for kind in KINDS:
+            if directory is None:
+                arrays = arrays or build(table, SIZES[relation.split("_")[1]])
+                array = arrays[kind]
+                array.flags.writeable = False
+            else:
+                path = os.path.join(directory, f"{relation}.{kind}.npy")
+                if not os.path.exists(path):
+                    arrays = arrays or build(table, SIZES[relation.split("_")[1]])
+                    temporary = f"{path}.{os.getpid()}.tmp"
+                    with open(temporary, "wb") as f:
+                        np.save(f, arrays[kind])
+                    os.replace(temporary, path) # other processes see the whole file or none
+                array = np.load(path, mmap_mode="r")
+            graph[relation][kind] = array
+    return graph
+
+
+GRAPH = load()
+
+
+def gather(features: np.ndarray, relation: str, fill: float = 0) -> np.ndarray:
+    # (..., n_target, F) -> (..., n_source, max degree, F), padding slots get fill
+    pad = [(0, 0)] * features.ndim
+    pad[-2] = (0, 1)
+    padded = np.pad(features, pad, constant_values=fill)
+    return padded[..., GRAPH[relation]["index"], :]
+
+
+def aggregate(features: np.ndarray, relation: str, reduce: str = "sum") -> np.ndarray:
+    # (..., n_target, F) -> (..., n_source, F): sum, mean or max over the neighbours
+    if reduce == "max":
+        lowest = -np.inf if np.issubdtype(features.dtype, np.floating) else np.iinfo(features.dtype).min
+        return gather(features, relation, fill=lowest).max(axis=-2)
+    summed = gather(features, relation).sum(axis=-2)
+    if reduce == "mean":
+        return summed / GRAPH[relation]["degree"][:, None]
+    return summed
@@ -0,0 +1,224 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from game.logic import Game
+from game.rng import GameRandom
+from game.snapshot import restore_game, snapshot_game
+from rl.policies import GreedyPolicy, RandomPolicy
+
+'''
+Monte-Carlo Tree Search Bot
+
+MCTSPolicy picks its moves with information set MCTS (single observer ISMCTS): the bot cannot see the other players'
+hands, their development cards or the order of the deck, so every iteration deals them at random first (determinize),
+consistent with everything the bot can see (hand sizes, card counts, the bank, its own cards, the played knights),
+and gives the copy a fresh generator for dice and steals. The iteration then walks one tree shared by all deals,
+choosing among the actions that are legal in this deal by UCB with availability counts, expands one action,
+plays on with the greedy policy for PLAYOUT_DEPTH actions and scores the result for every player
+(1 for a win, otherwise victory points / 10). Every node is scored for the player who chose its action.
+
+Cloning: the search works on a CompactBoard copy of the game (restore_game(..., compact=True)), Game.copy() of it
+is a few small buffer copies, cheap enough to copy the root once per iteration instead of undoing actions.
+
+Parallel: with workers > 1 the search runs on a process pool as well (root parallelisation): every worker gets the
+snapshot (game/snapshot.py) and searches its own tree until the same deadline, the root visit counts are added up.
+Anytime: searches stop before the deadline (time_limit after the call, minus MARGIN) instead of starting an iteration
+that would end after it, workers that are late are left out, so a move stays within time_limit.
+Moves with one legal action are not searched.
+
+    policy = MCTSPolicy(seed=1, time_limit=0.5, workers=4)
+    action = policy.act(game, player_id)
+
+"mcts" in rl/policies.py uses the defaults below (MCTS_TIME_LIMIT, MCTS_WORKERS).
+'''
+TIME_LIMIT = float(os.getenv("MCTS_TIME_LIMIT", "1.0")) # seconds per move
+WORKERS = int(os.getenv("MCTS_WORKERS", "1")) # searches per move, 1 runs in the calling process only
+EXPLORATION = 0.7 # UCB constant, the rewards are in [0, 1]
+PLAYOUT_DEPTH = 40 # actions played after the tree before scoring
+MARGIN = 0.05 # part of time_limit kept for collecting the results
+HAND = ("wood", "brick", "sheep", "wheat", "ore")
+DEVELOPMENT_CARDS = ("knight", "victory_point", "road_building", "year_of_plenty", "monopoly")
+
+
+class Node:
+    __slots__ = ("player", "children", "visits", "reward", "available")
+
+    def __init__(self, player: int | None = None) -> None:
+        self.player = player # who chose the action leading here
+        self.children = {} # action index -> Node
+        self.visits = 0
+        self.reward = 0.0 # summed rewards of self.player
+        self.available = 1 # iterations in which this action was legal
+
+    def ucb(self, exploration: float) -> float:
+        return self.reward / self.visits + exploration * math.sqrt(math.log(self.available) / self.visits)
+
+
+def determinize(game: Game, observer: int, rng: random.Random) -> None:
+    # Deals the hidden information of observer's view at random, in place (use it on a copy)
+    others = [player_id for player_id in game.players if player_id != observer]
+    resources = [resource for player_id in others for resource, amount in game.players[player_id]["hand"].items() for _ in range(amount)]
+    cards = list(game.development_cards)
+    cards += [card for player_id in others for card, amount in game.players[player_id]["development_cards"].items() for _ in range(amount)]
+    rng.shuffle(resources)
+    rng.shuffle(cards)
+    for player_id in others:
+        player = game.players[player_id]
+        hand = dict.fromkeys(HAND, 0)
+        for _ in range(sum(player["hand"].values())):
+            hand[resources.pop()] += 1
+        development_cards = dict.fromkeys(DEVELOPMENT_CARDS, 0)
+        for _ in range(sum(player["development_cards"].values())):
+            development_cards[cards.pop()] += 1
+        player["victory_points"] += development_cards["victory_point"] - player["development_cards"]["victory_point"]
+        player["hand"] = hand
+        player["development_cards"] = development_cards
+    game.development_cards = cards
+    game.rng = GameRandom(rng.getrandbits(64))
+
+
+def scores(game: Game, winner: int | None) -> dict[int, float]:
+    if winner is not None:
+        return {player_id: float(player_id == winner) for player_id in game.players}
+    return {player_id: min(player["victory_points"], 9) / 10 for player_id, player in game.players.items()}
+
+
+def playout(game: Game, policy: GreedyPolicy, depth: int) -> int | None:
+    # Plays up to depth actions, returns the winner if there is one
+    for _ in range(depth):
+        waiting = game.waiting_for()
+        if not waiting:
+            return None
+        action = policy.act(game, waiting[0])
+        if action is None:
+            return None
+        result = game.call_action(waiting[0], action, return_state=False)
+        if result is False:
+            return None
+        if result is not True:
+            return result
+    return None
+
+
+def iterate(root: Node, game: Game, observer: int, policy: GreedyPolicy, exploration: float, depth: int) -> None:
+    game = game.copy()
+    determinize(game, observer, policy.rng)
+    node, path, winner = root, [], None
+    while True:
+        waiting = game.waiting_for()
+        if not waiting:
+            break
+        player_id = observer if node is root and observer in waiting else waiting[0] # several players can owe discards
+        legal = policy.legal(game, player_id)
+        if not legal:
+            break
+        untried = [index for index in legal if index not in node.children]
+        for index in legal:
+            if index in node.children:
+                node.children[index].available += 1
+        if untried:
+            index = policy.rng.choice(untried)
+            child = node.children[index] = Node(player_id)
+        else:
+            index, child = max(((i, node.children[i]) for i in legal), key=lambda item: item[1].ucb(exploration))
+        result = game.call_action(player_id, policy.decode(game, player_id, index), return_state=False)
+        if result is False: # the mask allowed something the game refused, forget the action
+            if untried:
+                del node.children[index]
+            return
+        node = child
+        path.append(node)
+        if result is not True:
+            winner = result
+            break
+        if untried:
+            winner = playout(game, policy, depth)
+            break
+
+    rewards = scores(game, winner)
+    root.visits += 1
+    for node in path:
+        node.visits += 1
+        node.reward += rewards[node.player]
+
+
+def search(game: Game, player_id: int, deadline: float, iterations: int | None = None, seed=None,
+           exploration: float = EXPLORATION, depth: int = PLAYOUT_DEPTH) -> tuple[dict[int, int], int]:
+    # Searches until deadline (time.time()) or iterations, returns (root action index -> visits, iterations)
+    root = Node()
+    policy = GreedyPolicy(seed)
+    done = 0
+    start = now = time.time()
+    # No new iteration if an average one would end after the deadline
+    while now + (now - start) / max(done, 1) < deadline and (iterations is None or done < iterations):
+        iterate(root, game, player_id, policy, exploration, depth)
+        done += 1
+        now = time.time()
+    return {index: child.visits for index, child in root.children.items()}, done
+
+
+def search_task(task: tuple) -> tuple[dict[int, int], int]:
+    # Runs in a worker process
+    data, player_id, deadline, iterations, seed, exploration, depth = task
+    return search(restore_game(data, compact=True), player_id, deadline, iterations, seed, exploration, depth)
+
+
+POOLS = {} # workers -> ProcessPoolExecutor, kept for the next moves
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    if workers not in POOLS:
+        POOLS[workers] = ProcessPoolExecutor(max_workers=workers)
+    return POOLS[workers]
+
+
+class MCTSPolicy(RandomPolicy):
+    def __init__(self, seed: int | None = None, time_limit: float = TIME_LIMIT, iterations: int | None = None,
+                 workers: int = WORKERS, exploration: float = EXPLORATION, depth: int = PLAYOUT_DEPTH) -> None:
+        # iterations: optional cap per move (over all workers), the search always stops at time_limit
+        super().__init__(seed)
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.workers = workers
+        self.exploration = exploration
+        self.depth = depth
+        self.last = {} # stats of the last search: iterations, seconds, searches that made the deadline
+
+    def choose(self, game: Game, player_id: int, legal: list[int]) -> int:
+        if len(legal) == 1:
+            return legal[0]
+        start = time.time()
+        deadline = start + self.time_limit * (1 - MARGIN)
+        data = snapshot_game(game, rng=False)
+        iterations = None if self.iterations is None else max(1, self.iterations // self.workers)
+        seeds = [self.rng.getrandbits(64) for _ in range(self.workers)]
+
+        futures = []
+        if self.workers > 1:
+            pool = process_pool(self.workers - 1)
+            futures = [
+                pool.submit(search_task, (data, player_id, deadline, iterations, seed, self.exploration, self.depth))
+                for seed in seeds[1:]
+            ]
+        results = [search(restore_game(data, compact=True), player_id, deadline, iterations, seeds[0], self.exploration, self.depth)]
+        if futures:
+            finished, _ = wait(futures, timeout=max(0.0, start + self.time_limit - time.time()))
+            results += [future.result() for future in finished if future.exception() is None]
+
+        visits = {}
+        for counts, _ in results:
+            for index, count in counts.items():
+                visits[index] = visits.get(index, 0) + count
+        self.last = {
+            "iterations": sum(done for _, done in results),
+            "seconds": time.time() - start,
+            "searches": len(results),
+        }
+        allowed = set(legal)
+        best = [index for index in visits if index in allowed]
+        if not best: # not a single iteration finished, fall back to the playout policy
+            return GreedyPolicy.choose(self, game, player_id, legal)
+        return max(best, key=lambda index: visits[index])
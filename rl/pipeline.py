@@ -0,0 +1,316 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from game import action_space
+from game.logic import Game
+from rl.env import OBSERVATION_SHAPES, ObservationEncoder, decode
+from rl.trajectories import RECORD, action_mask, fill_record, observation
+
+'''
+Actor/Learner Pipeline
+
+Asynchronous self-play training on one machine, no services: ACTORS processes play complete games of
+game.logic.Game (all seats) with the current policy, the learner (the calling process) trains on their records
+while they play, so the actors never wait for an update and the learner never waits for a whole game.
+
+- policy: a linear softmax policy over the flattened rl/env.py observation, masked to the legal actions,
+  trained by REINFORCE (return: GAMMA ** actions left in the game * final reward, 1 for the winner, -1 for the others,
+  minus a running mean as baseline)
+- weights: SharedWeights, one shared memory block written by the learner, read by the actors before every game;
+  a sequence number (odd while writing) lets a reader retry instead of locking (seqlock)
+- trajectories: one RingBuffer per actor in shared memory, single producer (the actor) and single consumer
+  (the learner), no locks: the producer only moves head, the consumer only moves tail (aligned int64 counters)
+  records are RECORD rows (rl/trajectories.py) plus the weights version the actor played with and the time it was
+  pushed; a full ring makes its actor wait (backpressure), a finished game is pushed at once
+- metrics: rollouts (games and actions) per second, queue lag (seconds from push to learner), policy staleness
+  (learner updates between the weights an action was chosen with and the update that uses it), ring fill
+
+    python -m rl.pipeline --actors 4 --seconds 60
+'''
+ACTORS = int(os.getenv("PIPELINE_ACTORS", str(max(1, (os.cpu_count() or 2) - 1)))) # one core for the learner
+RING_RECORDS = 1 << 14 # per actor
+BATCH_SIZE = 512
+LEARNING_RATE = 0.001
+GAMMA = 0.999
+MAX_ACTIONS = 3000 # per game, longer games end without a winner
+FEATURES = sum(int(np.prod(shape)) for shape in OBSERVATION_SHAPES.values()) + 1 # + bias
+TRANSITION = np.dtype(RECORD.descr + [("version", "<i8"), ("time", "<f8")])
+
+
+def features(observations: dict[str, np.ndarray]) -> np.ndarray:
+    # (batch, ...) observation arrays -> (batch, FEATURES), last column is the bias
+    batch = len(observations["hand"])
+    return np.concatenate([observations[name].reshape(batch, -1) for name in OBSERVATION_SHAPES] + [np.ones((batch, 1), np.float32)], axis=1)
+
+
+def masked_softmax(logits: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    logits = np.where(mask, logits, -np.inf)
+    logits -= logits.max(axis=-1, keepdims=True)
+    p = np.exp(logits)
+    return p / p.sum(axis=-1, keepdims=True)
+
+
+class SharedWeights:
+    # (FEATURES, N_ACTIONS) float32 weights and their version in shared memory
+    def __init__(self, name: str | None = None) -> None:
+        # name: attach to the block created by the learner (None creates it)
+        size = 16 + FEATURES * action_space.N_ACTIONS * 4
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.header = np.ndarray(2, dtype=np.int64, buffer=self.memory.buf) # sequence, version
+        self.weights = np.ndarray((FEATURES, action_space.N_ACTIONS), dtype=np.float32, buffer=self.memory.buf, offset=16)
+
+    def publish(self, weights: np.ndarray, version: int) -> None:
+        self.header[0] += 1 # odd: writing
+        self.weights[:] = weights
+        self.header[1] = version
+        self.header[0] += 1
+
+    def read(self, out: np.ndarray) -> int:
+        # Copies the weights into out, returns their version
+        while True:
+            sequence = self.header[0]
+            if sequence % 2 == 0:
+                out[:] = self.weights
+                version = int(self.header[1])
+                if self.header[0] == sequence:
+                    return version
+            time.sleep(0)
+
+    def version(self) -> int:
+        return int(self.header[1])
+
+    def close(self, unlink: bool = False) -> None:
+        del self.header, self.weights
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+class RingBuffer:
+    # Single producer, single consumer queue of TRANSITION records in shared memory
+    def __init__(self, name: str | None = None, capacity: int = RING_RECORDS) -> None:
+        self.capacity = capacity
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=16 + capacity * TRANSITION.itemsize)
+        self.counters = np.ndarray(2, dtype=np.int64, buffer=self.memory.buf) # head (records pushed), tail (records popped)
+        self.records = np.ndarray(capacity, dtype=TRANSITION, buffer=self.memory.buf, offset=16)
+        if name is None:
+            self.counters[:] = 0
+
+    def __len__(self) -> int:
+        return int(self.counters[0] - self.counters[1])
+
+    def push(self, records: np.ndarray) -> bool:
+        # Producer: all records or nothing (False: not enough room)
+        head = int(self.counters[0])
+        if head + len(records) - int(self.counters[1]) > self.capacity:
+            return False
+        start = head % self.capacity
+        first = min(len(records), self.capacity - start)
+        self.records[start:start + first] = records[:first]
+        self.records[:len(records) - first] = records[first:]
+        self.counters[0] = head + len(records) # the records are written before they are announced
+        return True
+
+    def pop(self, limit: int) -> np.ndarray:
+        # Consumer: up to limit records, copied out
+        tail = int(self.counters[1])
+        count = min(limit, int(self.counters[0]) - tail)
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        records = np.concatenate([self.records[start:start + first], self.records[:count - first]])
+        self.counters[1] = tail + count # the slots are free once they are copied
+        return records
+
+    def close(self, unlink: bool = False) -> None:
+        del self.counters, self.records
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def play_game(game_id: int, weights: np.ndarray, version: int, rng: np.random.Generator, n_players: int = 4) -> np.ndarray:
+    # One self-play game with the policy on every seat, TRANSITION records with returns
+    game = Game(compact_board=True, seed=int(rng.integers(1 << 62)))
+    for player_id in range(1, n_players + 1):
+        game.add_player(player_id)
+    game.start_game()
+    encoder = ObservationEncoder(n_players) # one for every seat, the record is copied before the next fill
+    encoder.attach(game)
+    decode_rng = random.Random(int(rng.integers(1 << 62))) # discards
+    records = np.zeros(MAX_ACTIONS, dtype=TRANSITION)
+
+    winner = None
+    actions = 0
+    while actions < MAX_ACTIONS:
+        player_id = game.waiting_for()[0]
+        obs = encoder.fill(player_id)
+        mask = obs["action_mask"].astype(bool)
+        if not mask.any():
+            break
+        x = features({name: obs[name][None] for name in OBSERVATION_SHAPES})[0]
+        p = masked_softmax(x @ weights, mask)
+        index = int(rng.choice(action_space.N_ACTIONS, p=p))
+        fill_record(records[actions], game_id, actions, player_id, obs, index)
+        result = game.call_action(player_id, decode(game, player_id, index, decode_rng), return_state=False)
+        if result is False:
+            break
+        actions += 1
+        if result is not True:
+            winner = result
+            break
+
+    records = records[:actions]
+    if winner is not None:
+        outcome = np.where(records["player"] == winner, 1.0, -1.0)
+        records["reward"] = outcome * GAMMA ** (actions - 1 - np.arange(actions))
+    for player_id in game.players:
+        mine = np.flatnonzero(records["player"] == player_id)
+        if len(mine):
+            records["done"][mine[-1]] = 1
+    records["version"] = version
+    return records
+
+
+def actor(number: int, weights_name: str, ring_name: str, stop, seed: int) -> None:
+    # Runs in an actor process until stop is set
+    shared = SharedWeights(weights_name)
+    ring = RingBuffer(ring_name)
+    weights = np.zeros((FEATURES, action_space.N_ACTIONS), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    game_id = number << 32
+    try:
+        while not stop.is_set():
+            version = shared.read(weights)
+            records = play_game(game_id, weights, version, rng)
+            game_id += 1
+            while not stop.is_set():
+                records["time"] = time.time()
+                if ring.push(records):
+                    break
+                time.sleep(0.001) # the learner is behind
+    finally:
+        ring.close()
+        shared.close()
+
+
+class Learner:
+    def __init__(self, actors: int = ACTORS, batch_size: int = BATCH_SIZE, learning_rate: float = LEARNING_RATE, seed: int = 0) -> None:
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.weights = np.zeros((FEATURES, action_space.N_ACTIONS), dtype=np.float32)
+        self.version = 0
+        self.baseline = 0.0
+        self.shared = SharedWeights()
+        self.shared.publish(self.weights, self.version)
+        self.rings = [RingBuffer() for _ in range(actors)]
+        context = multiprocessing.get_context("forkserver")
+        self.stop = context.Event()
+        self.processes = [
+            context.Process(target=actor, args=(number, self.shared.memory.name, ring.memory.name, self.stop, seed + number), daemon=True)
+            for number, ring in enumerate(self.rings)
+        ]
+        self.pending = []
+
+        # Metrics
+        self.start = None
+        self.records = 0
+        self.games = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.staleness = 0
+        self.max_staleness = 0
+
+    def update(self, batch: np.ndarray) -> None:
+        # One REINFORCE step: gradient of log p(action) * advantage, masked softmax
+        x = features(observation(batch))
+        p = masked_softmax(x @ self.weights, action_mask(batch))
+        advantage = batch["reward"] - self.baseline
+        self.baseline += 0.01 * (batch["reward"].mean() - self.baseline)
+        p[np.arange(len(batch)), batch["action"]] -= 1 # -(onehot - p): gradient of the loss
+        gradient = x.T @ (p * advantage[:, None]) / len(batch)
+        self.weights -= self.learning_rate * gradient.astype(np.float32)
+        self.version += 1
+        self.shared.publish(self.weights, self.version)
+
+    def poll(self) -> int:
+        # Takes what the actors pushed, trains on every full batch, returns the records taken
+        taken = 0
+        now = time.time()
+        for ring in self.rings:
+            records = ring.pop(RING_RECORDS)
+            if len(records):
+                self.pending.append(records)
+                taken += len(records)
+                lag = now - records["time"]
+                self.lag += lag.sum()
+                self.max_lag = max(self.max_lag, float(lag.max()))
+                self.games += int((records["step"] == 0).sum()) # games are pushed whole
+        self.records += taken
+        pending = np.concatenate(self.pending) if self.pending else np.zeros(0, dtype=TRANSITION)
+        while len(pending) >= self.batch_size:
+            batch, pending = pending[:self.batch_size], pending[self.batch_size:]
+            staleness = self.version - batch["version"]
+            self.staleness += int(staleness.sum())
+            self.max_staleness = max(self.max_staleness, int(staleness.max()))
+            self.update(batch)
+        self.pending = [pending]
+        return taken
+
+    def run(self, seconds: float) -> dict:
+        for process in self.processes:
+            process.start()
+        self.start = time.perf_counter()
+        try:
+            while time.perf_counter() - self.start < seconds:
+                if not self.poll():
+                    time.sleep(0.005)
+            return self.metrics()
+        finally:
+            self.close()
+
+    def metrics(self) -> dict:
+        seconds = time.perf_counter() - self.start
+        return {
+            "seconds": seconds,
+            "updates": self.version,
+            "games_per_second": self.games / seconds,
+            "actions_per_second": self.records / seconds,
+            "mean_queue_lag_seconds": self.lag / max(self.records, 1),
+            "max_queue_lag_seconds": self.max_lag,
+            "mean_staleness": self.staleness / max(self.version * self.batch_size, 1),
+            "max_staleness": self.max_staleness,
+            "ring_fill": [len(ring) / ring.capacity for ring in self.rings],
+        }
+
+    def close(self) -> None:
+        self.stop.set()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for ring in self.rings:
+            ring.close(unlink=True)
+        self.shared.close(unlink=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asynchronous self-play training")
+    parser.add_argument("--actors", type=int, default=ACTORS)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    m = Learner(args.actors, args.batch_size, args.learning_rate, args.seed).run(args.seconds)
+    print(f"{args.actors} actors, {m['seconds']:.1f}s: {m['games_per_second']:.2f} games/s, "
+          f"{m['actions_per_second']:.0f} actions/s, {m['updates']} updates")
+    print(f"  queue lag mean {m['mean_queue_lag_seconds'] * 1000:.1f}ms max {m['max_queue_lag_seconds'] * 1000:.1f}ms, "
+          f"staleness mean {m['mean_staleness']:.1f} max {m['max_staleness']} updates, "
+          f"ring fill {max(m['ring_fill']):.0%}")
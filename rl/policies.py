@@ -0,0 +1,86 @@
+import random
+from itertools import compress
+
+from game import action_space
+from game.action import port_ratios_for_player
+
+'''
+Bot Policies
+
+A policy picks the next action for one player: act(game, player_id) -> action dict for Game.call_action (or None).
+Policies are looked up by name (POLICIES), so worker processes only need the name and a seed.
+'''
+# Preferred order for the greedy policy, everything else is picked at random
+GREEDY_ORDER = (
+    range(action_space.PLACE_CITY, action_space.PLACE_ROAD),
+    range(action_space.PLACE_SETTLEMENT, action_space.PLACE_CITY),
+    (action_space.BUY_DEVELOPMENT_CARD,),
+    range(action_space.PLACE_ROAD, action_space.MOVE_ROBBER),
+    (action_space.PLAY_KNIGHT, action_space.PLAY_YEAR_OF_PLENTY, action_space.PLAY_MONOPOLY, action_space.PLAY_ROAD_BUILDING),
+)
+
+
+def random_discard(game, player_id: int, rng: random.Random) -> dict:
+    # Payload for DISCARD_RESOURCES: the owed number of random cards
+    cards = [resource for resource, amount in game.players[player_id]["hand"].items() for _ in range(amount)]
+    resources = {}
+    for resource in rng.sample(cards, game.pending_discard[player_id]):
+        resources[resource] = resources.get(resource, 0) + 1
+    return {"type": "discard_resources", "resources": resources}
+
+
+class RandomPolicy:
+    # Uniform over the legal actions (never proposes player trades)
+    def __init__(self, seed: int | None = None) -> None:
+        self.rng = random.Random(seed)
+
+    def legal(self, game, player_id: int) -> list[int]:
+        legal = list(compress(range(action_space.N_ACTIONS), game.legal_actions(player_id)))
+        if action_space.PROPOSE_TRADE in legal:
+            legal.remove(action_space.PROPOSE_TRADE)
+        return legal
+
+    def decode(self, game, player_id: int, index: int) -> dict:
+        if index == action_space.DISCARD_RESOURCES:
+            return random_discard(game, player_id, self.rng)
+        return action_space.decode_action(index, port_ratios_for_player(player_id, game.players))
+
+    def choose(self, game, player_id: int, legal: list[int]) -> int:
+        return self.rng.choice(legal)
+
+    def act(self, game, player_id: int) -> dict | None:
+        legal = self.legal(game, player_id)
+        if not legal:
+            return None
+        return self.decode(game, player_id, self.choose(game, player_id, legal))
+
+
+class GreedyPolicy(RandomPolicy):
+    # Builds whenever possible (cities first), then rolls/ends the turn, trades with the bank sometimes
+    def choose(self, game, player_id: int, legal: list[int]) -> int:
+        for group in GREEDY_ORDER:
+            options = [i for i in legal if i in group]
+            if options:
+                return self.rng.choice(options)
+        trades = [i for i in legal if i >= action_space.BANK_TRADE]
+        if trades and self.rng.random() < 0.5:
+            return self.rng.choice(trades)
+        if action_space.ROLL_DICE in legal:
+            return action_space.ROLL_DICE
+        others = [i for i in legal if i != action_space.END_TURN and i < action_space.BANK_TRADE]
+        if others:
+            return self.rng.choice(others)
+        return self.rng.choice(legal)
+
+
+POLICIES = {
+    "random": RandomPolicy,
+    "greedy": GreedyPolicy,
+}
+
+
+def make_policy(name: str, seed: int | None = None):
+    if name == "mcts": # rl/mcts.py builds on the policies above
+        from rl.mcts import MCTSPolicy
+        return MCTSPolicy(seed)
+    return POLICIES[name](seed)
@@ -0,0 +1,174 @@
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from game.logic import Game
+from rl.policies import make_policy
+
+'''
+Self-Play Runner
+
+Plays complete games of game.logic.Game between policies (rl/policies.py) on a process pool.
+Workers only get (game index, seed, policy names) and send back a small record of plain values, never a Game.
+
+    python -m rl.self_play --games 200 --workers 4 --policies greedy greedy random random
+    python -m rl.self_play --games 200 --scaling 1,2,4,8
+'''
+def phase_of(game: Game) -> str:
+    if game.counter < len(game.initial_placement_order):
+        return "initial_placement"
+    if game.forced_action:
+        return game.forced_action.lower().replace(" ", "_")
+    return "turn"
+
+
+def play_game(task: tuple) -> dict:
+    # Runs in a worker process
+    index, seed, policy_names, max_actions = task
+    start = time.perf_counter()
+
+    game = Game(compact_board=True, seed=seed)
+    policies = {}
+    for player_id, name in enumerate(policy_names, start=1):
+        game.add_player(player_id)
+        policies[player_id] = make_policy(name, seed * 10 + player_id)
+    game.start_game()
+
+    phases = {} # phase -> [actions, decision seconds, engine seconds, slowest action seconds]
+    actions = turns = failed = 0
+    winner = None
+    while actions < max_actions:
+        player_id = game.waiting_for()[0]
+        phase = phase_of(game)
+
+        t0 = time.perf_counter()
+        action = policies[player_id].act(game, player_id)
+        t1 = time.perf_counter()
+        result = game.call_action(player_id, action, return_state=False) if action else False
+        t2 = time.perf_counter()
+
+        if result is False: # the policy has no (valid) move, the game cannot continue
+            failed += 1
+            break
+        actions += 1
+        turns += action["type"] == "end_turn"
+        stats = phases.setdefault(phase, [0, 0.0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += t1 - t0
+        stats[2] += t2 - t1
+        stats[3] = max(stats[3], t2 - t0)
+
+        if game.players[player_id]["victory_points"] >= 10:
+            winner = player_id
+            break
+
+    return {
+        "game": index,
+        "seed": seed,
+        "policies": list(policy_names),
+        "winner": winner,
+        "actions": actions,
+        "turns": turns,
+        "failed": failed,
+        "victory_points": {pid: p["victory_points"] for pid, p in game.players.items()},
+        "seconds": time.perf_counter() - start,
+        "phases": phases,
+    }
+
+
+def run_self_play(games: int, policy_names: list[str], workers: int | None = None, seed: int = 0, max_actions: int = 5000):
+    # Yields the game records as they finish, keeps a few tasks per worker in flight
+    workers = workers or os.cpu_count() or 1
+    tasks = ((i, seed + i, tuple(policy_names), max_actions) for i in range(games))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = set()
+        for task in tasks:
+            running.add(pool.submit(play_game, task))
+            if len(running) >= workers * 4:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in wait(running).done:
+            yield future.result()
+
+
+class SelfPlayStats:
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.games = 0
+        self.actions = 0
+        self.finished = 0
+        self.wins: dict[str, int] = {}
+        self.phases: dict[str, list] = {}
+
+    def add(self, record: dict) -> None:
+        self.games += 1
+        self.actions += record["actions"]
+        if record["winner"] is not None:
+            self.finished += 1
+            name = record["policies"][record["winner"] - 1]
+            self.wins[name] = self.wins.get(name, 0) + 1
+        for phase, (count, decide, engine, slowest) in record["phases"].items():
+            stats = self.phases.setdefault(phase, [0, 0.0, 0.0, 0.0])
+            stats[0] += count
+            stats[1] += decide
+            stats[2] += engine
+            stats[3] = max(stats[3], slowest)
+
+    def summary(self) -> dict:
+        seconds = time.perf_counter() - self.start
+        return {
+            "games": self.games,
+            "finished": self.finished,
+            "seconds": seconds,
+            "games_per_second": self.games / seconds,
+            "actions_per_second": self.actions / seconds,
+            "wins": self.wins,
+            # per phase: actions, mean decision ms, mean engine ms, slowest action ms
+            "phases": {
+                phase: {
+                    "actions": count,
+                    "decision_ms": 1000 * decide / count,
+                    "engine_ms": 1000 * engine / count,
+                    "max_ms": 1000 * slowest,
+                }
+                for phase, (count, decide, engine, slowest) in sorted(self.phases.items())
+            },
+        }
+
+
+def benchmark(games: int, policy_names: list[str], workers: int, seed: int = 0) -> dict:
+    stats = SelfPlayStats()
+    for record in run_self_play(games, policy_names, workers, seed):
+        stats.add(record)
+    return stats.summary()
+
+
+def print_summary(summary: dict) -> None:
+    print(f"{summary['games']} games ({summary['finished']} finished) in {summary['seconds']:.2f}s: "
+          f"{summary['games_per_second']:.1f} games/s, {summary['actions_per_second']:.0f} actions/s")
+    print(f"  wins: {summary['wins']}")
+    for phase, stats in summary["phases"].items():
+        print(f"  {phase:20} {stats['actions']:8} actions  decision {stats['decision_ms']:.3f}ms  "
+              f"engine {stats['engine_ms']:.3f}ms  max {stats['max_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self-play throughput benchmark")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--policies", nargs="+", default=["greedy"] * 4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scaling", type=str, default=None, help="comma separated worker counts, e.g. 1,2,4")
+    args = parser.parse_args()
+
+    if args.scaling:
+        base = None
+        for workers in [int(w) for w in args.scaling.split(",")]:
+            summary = benchmark(args.games, args.policies, workers, args.seed)
+            base = base or summary["games_per_second"]
+            print(f"{workers} workers: {summary['games_per_second']:.1f} games/s "
+                  f"({summary['games_per_second'] / base:.2f}x), {summary['actions_per_second']:.0f} actions/s")
+    else:
+        print_summary(benchmark(args.games, args.policies, args.workers, args.seed))
@@ -0,0 +1,260 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game import action_space
+from game.logic import Game
+from rl.env import OBSERVATION_SHAPES, ObservationEncoder
+from rl.policies import make_policy
+
+'''
+Trajectory Store
+
+Self-play records on disk: one record per action, (observation, action mask, action, reward) plus where it comes from,
+in fixed-width RECORD rows of sharded .npy files, so a training reader can memory-map the shards and pick any record
+without loading a shard or parsing anything.
+
+- observations are the rl/env.py encoding (ObservationEncoder), stored as uint8 (every feature is a small count or a flag),
+  the action mask is bit-packed (np.packbits), observation() and action_mask() turn rows back into float32 / bool arrays
+- a shard is <directory>/<writer>-<number>.npy, an array of SHARD_RECORDS records created at full size (sparse on disk),
+  its index <writer>-<number>.index is an append-only list of INDEX entries (game, first record, records),
+  one per finished game: records are only visible once the index entry of their game is written,
+  a game that was cut off (crash, killed worker) is never read
+- every TrajectoryWriter owns its shards (the name includes the process id), so any number of processes append
+  to the same directory without locks; a game that does not fit in the rest of a shard is moved to the next one
+- TrajectoryReader maps the shards lazily, refresh() picks up games finished since
+
+    writer = TrajectoryWriter("data")
+    writer.append(game_id, player_id, observation, action, reward) ... writer.end_episode(game_id, {winner: 1.0, ...})
+
+    reader = TrajectoryReader("data")
+    batch = reader.sample(256, rng) # RECORD array
+    observations, masks = observation(batch), action_mask(batch)
+
+    python -m rl.trajectories data --games 100 --workers 4 # record self-play games
+'''
+SHARD_RECORDS = int(os.getenv("TRAJECTORY_SHARD_RECORDS", str(1 << 16)))
+MASK_BYTES = (action_space.N_ACTIONS + 7) // 8
+RECORD = np.dtype([
+    ("game", "<i8"),
+    ("step", "<u4"),
+    ("player", "u1"),
+    ("done", "u1"), # last action of this player in the game
+    ("action", "<u2"),
+    ("reward", "<f4"),
+    ("action_mask", "u1", (MASK_BYTES,)),
+    *((name, "u1", shape) for name, shape in OBSERVATION_SHAPES.items()),
+])
+INDEX = np.dtype([("game", "<i8"), ("start", "<u4"), ("length", "<u4")])
+SHARD_SUFFIX = ".npy"
+INDEX_SUFFIX = ".index"
+
+
+def observation(records: np.ndarray) -> dict[str, np.ndarray]:
+    # RECORD rows -> the rl/env.py observation arrays with a batch axis
+    return {name: records[name].astype(np.float32) for name in OBSERVATION_SHAPES}
+
+
+def action_mask(records: np.ndarray) -> np.ndarray:
+    return np.unpackbits(records["action_mask"], axis=-1, count=action_space.N_ACTIONS).astype(bool)
+
+
+def fill_record(record: np.void, game: int, step: int, player: int, observation: dict[str, np.ndarray], action: int,
+                reward: float = 0.0) -> None:
+    # Writes one RECORD row in place (a row of a shard or of any array with the RECORD fields)
+    record["game"] = game
+    record["step"] = step
+    record["player"] = player
+    record["done"] = 0
+    record["action"] = action
+    record["reward"] = reward
+    record["action_mask"] = np.packbits(observation["action_mask"])
+    for name in OBSERVATION_SHAPES:
+        record[name] = observation[name]
+
+
+class TrajectoryWriter:
+    def __init__(self, directory: str, name: str | None = None, shard_records: int = SHARD_RECORDS) -> None:
+        self.directory = directory
+        self.name = name or f"{os.getpid()}-{time.time_ns()}"
+        self.shard_records = shard_records
+        self.number = -1
+        self.shard = None
+        self.index = None
+        self.position = 0 # next free record of the shard
+        self.start = 0 # first record of the running game
+        self.steps = 0
+        os.makedirs(directory, exist_ok=True)
+        self.open_shard()
+
+    def open_shard(self) -> None:
+        self.number += 1
+        path = os.path.join(self.directory, f"{self.name}-{self.number:05d}")
+        self.shard = np.lib.format.open_memmap(path + SHARD_SUFFIX, mode="w+", dtype=RECORD, shape=(self.shard_records,))
+        if self.index:
+            self.index.close()
+        self.index = open(path + INDEX_SUFFIX, "ab")
+        self.position = self.start = 0
+
+    def append(self, game: int, player: int, observation: dict[str, np.ndarray], action: int, reward: float = 0.0) -> None:
+        # observation: ObservationEncoder buffers (with action_mask), copied into the shard
+        if self.position == self.shard_records:
+            length = self.position - self.start
+            if length == self.shard_records:
+                raise ValueError(f"a game has more than {self.shard_records} records, use larger shards")
+            running = np.array(self.shard[self.start:self.position]) # the running game moves to the next shard
+            self.shard.flush()
+            self.open_shard()
+            self.shard[:length] = running
+            self.position = length
+        fill_record(self.shard[self.position], game, self.steps, player, observation, action, reward)
+        self.position += 1
+        self.steps += 1
+
+    def end_episode(self, game: int, rewards: dict[int, float] | None = None) -> int:
+        # Commits the running game, returns its number of records
+        # rewards (final, per player) are added to each player's last record, which is marked done
+        records = self.shard[self.start:self.position]
+        players = records["player"]
+        for player in np.unique(players):
+            last = np.flatnonzero(players == player)[-1]
+            records["done"][last] = 1
+            if rewards:
+                records["reward"][last] += rewards.get(int(player), 0.0)
+        self.shard.flush()
+        self.index.write(np.array([(game, self.start, self.position - self.start)], dtype=INDEX).tobytes())
+        self.index.flush()
+        length = self.position - self.start
+        self.start = self.position
+        self.steps = 0
+        return length
+
+    def close(self) -> None:
+        # The running game (not ended) is dropped
+        self.shard.flush()
+        self.index.close()
+
+
+class TrajectoryReader:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.shards = {} # name -> memory map, opened when first read
+        self.refresh()
+
+    def refresh(self) -> None:
+        # Reads the index files again, records of games finished since become readable
+        names, games, counts = [], [], []
+        for file in sorted(os.listdir(self.directory)):
+            if not file.endswith(INDEX_SUFFIX):
+                continue
+            entries = np.fromfile(os.path.join(self.directory, file), dtype=np.uint8)
+            entries = entries[:len(entries) // INDEX.itemsize * INDEX.itemsize].view(INDEX) # a half written entry is not there yet
+            if len(entries):
+                names.append(file[:-len(INDEX_SUFFIX)])
+                games.append(entries)
+                counts.append(int(entries["start"][-1] + entries["length"][-1])) # games of a shard follow each other
+        self.names = names
+        self.offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]) # first record of every shard
+        # Every finished game: (game, first record, records), first record counted over all shards like the indices of read()
+        self.games = np.zeros(sum(len(entries) for entries in games), dtype=[("game", "<i8"), ("start", "<i8"), ("length", "<i8")])
+        if games:
+            self.games["game"] = np.concatenate([entries["game"] for entries in games])
+            self.games["start"] = np.concatenate([entries["start"] + self.offsets[number] for number, entries in enumerate(games)])
+            self.games["length"] = np.concatenate([entries["length"] for entries in games])
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def shard(self, number: int) -> np.ndarray:
+        name = self.names[number]
+        if name not in self.shards:
+            self.shards[name] = np.load(os.path.join(self.directory, name + SHARD_SUFFIX), mmap_mode="r")
+        return self.shards[name]
+
+    def __getitem__(self, index: int) -> np.void:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        number = int(np.searchsorted(self.offsets, index, side="right")) - 1
+        return self.shard(number)[index - self.offsets[number]]
+
+    def read(self, indices: np.ndarray) -> np.ndarray:
+        # Records at the given global indices, in that order; only their pages are read
+        indices = np.asarray(indices, dtype=np.int64)
+        out = np.empty(len(indices), dtype=RECORD)
+        numbers = np.searchsorted(self.offsets, indices, side="right") - 1
+        for number in np.unique(numbers):
+            where = np.flatnonzero(numbers == number)
+            out[where] = self.shard(number)[indices[where] - self.offsets[number]]
+        return out
+
+    def sample(self, batch_size: int, rng: np.random.Generator) -> np.ndarray:
+        indices = np.sort(rng.integers(0, len(self), batch_size)) # sorted: each shard is read front to back
+        return self.read(indices)
+
+
+# Recording self-play games, one writer per worker process
+WRITERS = {} # directory -> TrajectoryWriter of this process
+
+
+def record_game(task: tuple) -> int:
+    # Runs in a worker process, returns the number of records
+    directory, index, seed, policy_names, max_actions = task
+    if directory not in WRITERS:
+        WRITERS[directory] = TrajectoryWriter(directory)
+    writer = WRITERS[directory]
+
+    game = Game(compact_board=True, seed=seed)
+    policies = {}
+    for player_id, name in enumerate(policy_names, start=1):
+        game.add_player(player_id)
+        policies[player_id] = make_policy(name, seed * 10 + player_id)
+    game.start_game()
+    encoder = ObservationEncoder(len(policy_names))
+    encoder.attach(game)
+
+    winner = None
+    for _ in range(max_actions):
+        player_id = game.waiting_for()[0]
+        observation = encoder.fill(player_id)
+        policy = policies[player_id]
+        legal = policy.legal(game, player_id)
+        if not legal:
+            break
+        action = policy.choose(game, player_id, legal)
+        result = game.call_action(player_id, policy.decode(game, player_id, action), return_state=False)
+        if result is False:
+            break
+        writer.append(index, player_id, observation, action)
+        if result is not True:
+            winner = result
+            break
+    rewards = None if winner is None else {player_id: 1.0 if player_id == winner else -1.0 for player_id in game.players}
+    return writer.end_episode(index, rewards)
+
+
+def record_self_play(directory: str, games: int, policy_names: list[str], workers: int | None = None,
+                     seed: int = 0, max_actions: int = 5000) -> int:
+    # Plays and records games on a process pool, returns the number of records
+    workers = workers or os.cpu_count() or 1
+    tasks = [(directory, seed + i, seed + i, tuple(policy_names), max_actions) for i in range(games)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(record_game, tasks, chunksize=max(1, games // (workers * 4))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record self-play games")
+    parser.add_argument("directory")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--policies", nargs="+", default=["greedy"] * 4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = record_self_play(args.directory, args.games, args.policies, args.workers, args.seed)
+    seconds = time.perf_counter() - start
+    print(f"{records} records of {args.games} games in {seconds:.1f}s ({records / seconds:.0f} records/s), "
+          f"{len(TrajectoryReader(args.directory))} in {args.directory}")
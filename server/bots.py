@@ -0,0 +1,188 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from game.snapshot import restore_game, snapshot_game
+from rl.policies import POLICIES, GreedyPolicy, make_policy
+from server.game_actor import GameStopped
+
+'''
+Bots
+
+A bot takes a seat in GAMES[game_id]["websockets"] like a player, but its "connection" is a BotConnection:
+states are handed to it by function call (send_state), nothing is encoded or sent over a network.
+When the game waits for the bot, it takes a snapshot of the game through the actor (server/game_actor.py),
+lets its policy (rl/policies.py, "mcts" is rl/mcts.py) decide in BOT_EXECUTOR and submits the action
+through the actor like a socket would, so the action log, checkpoints and the other players' states work as usual.
+
+- BOT_EXECUTOR: "process" (default) decides in a process pool, a search bot never competes with the event loop
+  for the GIL; "thread" decides in a thread pool (no process start, fine for the cheap policies)
+- BOT_TIME_LIMIT seconds per decision: a search bot gets most of it as its own limit, a decision that is still
+  not done then is dropped and the greedy policy moves instead, so a bot never holds up the table for longer.
+  A dropped decision cannot be stopped once it runs in the pool: until it is done the bot does not queue another
+  one and the greedy policy keeps moving, so a bot never has more than one job in BOT_EXECUTOR
+- the greedy fallback decides in a thread (the loop's default executor), never on the event loop
+- bot seats are saved with the checkpoints (server/checkpoints.py) and get their BotConnection again on restore
+- metrics() (shown in /metrics) reports decisions, fallbacks and decision times
+'''
+BOT_EXECUTOR = os.getenv("BOT_EXECUTOR", "process")
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", str(os.cpu_count() or 1)))
+BOT_TIME_LIMIT = float(os.getenv("BOT_TIME_LIMIT", "2"))
+BOT_POLICY = os.getenv("BOT_POLICY", "greedy")
+SEARCH_SHARE = 0.8 # part of the time limit a search policy may use
+BOT_POLICIES = (*POLICIES, "mcts")
+
+EXECUTORS = {} # kind -> executor, created with the first bot
+
+
+def bot_executor() -> Executor:
+    if BOT_EXECUTOR not in EXECUTORS:
+        if BOT_EXECUTOR == "thread":
+            EXECUTORS[BOT_EXECUTOR] = ThreadPoolExecutor(max_workers=BOT_WORKERS, thread_name_prefix="bot")
+        else: # forkserver: the server process has threads, forking it directly is not safe
+            EXECUTORS[BOT_EXECUTOR] = executor = ProcessPoolExecutor(max_workers=BOT_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+            for _ in range(BOT_WORKERS): # start the workers now (a bot is added in the lobby), not in the first decision
+                executor.submit(warm_up)
+    return EXECUTORS[BOT_EXECUTOR]
+
+
+def warm_up() -> None:
+    # Runs in a new worker: importing this module (the server package) and the search bot takes a while
+    make_policy("mcts")
+
+
+def waiting_snapshot(game, player_id: int) -> bytes | None:
+    # Runs in the actor: the game if it waits for player_id, None otherwise
+    if player_id not in game.players or player_id not in game.waiting_for():
+        return None
+    return snapshot_game(game, rng=False)
+
+
+def decide(policy_name: str, seed: int, data: bytes, player_id: int, time_limit: float) -> dict | None:
+    # Runs in BOT_EXECUTOR, the policy only sees the snapshot
+    policy = make_policy(policy_name, seed)
+    if hasattr(policy, "time_limit"):
+        policy.time_limit = min(policy.time_limit, time_limit * SEARCH_SHARE)
+    return policy.act(restore_game(data, compact=True), player_id)
+
+
+def fallback_decide(data: bytes, player_id: int) -> dict | None:
+    # Runs in a thread: the greedy move
+    return GreedyPolicy().act(restore_game(data, compact=True), player_id)
+
+
+class BotConnection:
+    def __init__(self, entry: dict, player_id: int, policy: str = BOT_POLICY, time_limit: float = BOT_TIME_LIMIT) -> None:
+        # entry: the game's GAMES entry, the actor is taken from it once the game has started
+        self.entry = entry
+        self.player_id = player_id
+        self.policy = policy
+        self.time_limit = time_limit
+        self.rng = random.Random()
+        self.job = None # the last decision in BOT_EXECUTOR, it may outlive its time limit
+        self.wake = asyncio.Event()
+        self.wake.set() # look once the game has started, a restored game may be waiting for the bot already
+        self.closed = False
+
+        # Metrics
+        self.decisions = 0
+        self.fallbacks = 0 # too slow or refused, the greedy policy moved
+        self.busy = 0 # the previous decision was still running, the greedy policy moved without asking the pool
+        self.failed = 0 # not even the greedy move was accepted
+        self.decision_seconds = 0.0
+        self.max_decision_seconds = 0.0
+
+        bot_executor()
+        self.task = asyncio.create_task(self.run())
+
+    async def send(self, message: dict) -> None:
+        if message.get("status") == "game_over":
+            self.closed = True
+        self.wake.set()
+
+    async def send_state(self, state: dict) -> None:
+        # Only a signal, the bot reads the game itself
+        self.wake.set()
+
+    async def handle(self, message: dict) -> None:
+        pass
+
+    async def run(self) -> None:
+        await self.entry["started"].wait()
+        try:
+            while not self.closed:
+                await self.wake.wait()
+                self.wake.clear()
+                # Keep acting while the game waits for this bot (roll, build, end the turn, ...)
+                try:
+                    while not self.closed and await self.act():
+                        pass
+                except GameStopped:
+                    raise
+                except Exception as e: # the game refused in an unexpected way, wait for the next state
+                    print(f"Bot {self.player_id} ({self.policy}) stopped acting: {e!r}")
+        except GameStopped: # everyone else left
+            self.closed = True
+
+    async def act(self) -> bool:
+        # One decision, False if the game does not wait for this bot (or it is stuck)
+        actor = self.entry.get("actor")
+        if actor is None:
+            return False
+        data = await actor.call(waiting_snapshot, actor.game, self.player_id)
+        if data is None:
+            return False
+
+        loop = asyncio.get_running_loop()
+        action = None
+        if self.job is not None and not self.job.done():
+            self.busy += 1
+        else:
+            start = time.perf_counter()
+            self.job = bot_executor().submit(decide, self.policy, self.rng.getrandbits(32), data, self.player_id, self.time_limit)
+            try:
+                # shield: a timeout must not cancel the wrapper, self.job has to show when the work is really done
+                action = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.job)), self.time_limit)
+            except asyncio.TimeoutError:
+                self.job.cancel() # only succeeds if it has not started yet
+            except Exception as e:
+                print(f"Bot {self.player_id} ({self.policy}) failed: {e!r}")
+            seconds = time.perf_counter() - start
+            self.decisions += 1
+            self.decision_seconds += seconds
+            self.max_decision_seconds = max(self.max_decision_seconds, seconds)
+
+            if action is not None and await actor.submit(self.player_id, action) is not False:
+                return True
+        # Too slow, busy, no move or refused: the greedy policy moves on a fresh snapshot
+        self.fallbacks += 1
+        data = await actor.call(waiting_snapshot, actor.game, self.player_id)
+        if data is None:
+            return False
+        action = await loop.run_in_executor(None, fallback_decide, data, self.player_id)
+        if action is not None and await actor.submit(self.player_id, action) is not False:
+            return True
+        self.failed += 1
+        return False
+
+    async def close(self) -> None:
+        self.closed = True
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    def metrics(self) -> dict:
+        return {
+            "bot": self.policy,
+            "decisions": self.decisions,
+            "fallbacks": self.fallbacks,
+            "busy": self.busy,
+            "failed": self.failed,
+            "mean_decision_ms": 1000 * self.decision_seconds / self.decisions if self.decisions else 0.0,
+            "max_decision_ms": 1000 * self.max_decision_seconds,
+        }
@@ -0,0 +1,142 @@
+import json
+import os
+import time
+from typing import Callable
+
+from game.action_log import ActionLog, Replay, ReplayError
+from game.logic import Game
+from game.snapshot import SnapshotError, restore_game, snapshot_game
+
+'''
+Checkpoints
+
+With CHECKPOINT_DIR set, every running game is written to <CHECKPOINT_DIR>/<game_id>.snapshot
+(game/snapshot.py) every CHECKPOINT_EVERY accepted actions, and the games found there are loaded again
+when the server starts. The players reconnect to /ws/{game_id}/{player_id} and continue where the last checkpoint was.
+Files are replaced atomically, a crash during a write leaves the previous checkpoint.
+Every game has its own generator (game/rng.py), it is part of the checkpoint, so a restored game draws the same dice.
+
+With ACTION_LOG_DIR set, every accepted action of a running game is appended to <ACTION_LOG_DIR>/<game_id>.log
+(game/action_log.py). On startup a log is replayed to its last action, which is newer than any checkpoint,
+and the game keeps appending to it. Logs of finished games are renamed to <game_id>-<time>.log and kept.
+
+The bot seats of a game ({player_id: policy}) are written to <game_id>.bots next to its checkpoint or log when it
+starts, so a restored game gets its bots back (server/bots.py) instead of waiting for a player who never reconnects.
+'''
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR") # unset: no checkpoints
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", "10"))
+ACTION_LOG_DIR = os.getenv("ACTION_LOG_DIR") # unset: no action logs
+SUFFIX = ".snapshot"
+LOG_SUFFIX = ".log"
+BOTS_SUFFIX = ".bots"
+
+
+def path(game_id: int) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"{game_id}{SUFFIX}")
+
+
+def due(game: Game) -> bool:
+    return CHECKPOINT_DIR is not None and game.version % CHECKPOINT_EVERY == 0
+
+
+def write(game_id: int, data: bytes) -> None:
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    temp = path(game_id) + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+    os.replace(temp, path(game_id))
+
+
+def save(game_id: int, game: Game) -> None:
+    # A few hundred bytes, written in place so it cannot race with remove()
+    write(game_id, snapshot_game(game))
+
+
+def log_path(game_id: int) -> str:
+    return os.path.join(ACTION_LOG_DIR, f"{game_id}{LOG_SUFFIX}")
+
+
+def bots_path(game_id: int) -> str | None:
+    directory = CHECKPOINT_DIR or ACTION_LOG_DIR
+    return None if directory is None else os.path.join(directory, f"{game_id}{BOTS_SUFFIX}")
+
+
+def save_bots(game_id: int, bots: dict[int, str]) -> None:
+    # bots: player_id -> policy, the seats are fixed once the game has started
+    if bots_path(game_id) is None or not bots:
+        return
+    os.makedirs(os.path.dirname(bots_path(game_id)), exist_ok=True)
+    temp = bots_path(game_id) + ".tmp"
+    with open(temp, "w") as f:
+        json.dump({str(player_id): policy for player_id, policy in bots.items()}, f)
+    os.replace(temp, bots_path(game_id))
+
+
+def load_bots(game_id: int) -> dict[int, str]:
+    if bots_path(game_id) is None:
+        return {}
+    try:
+        with open(bots_path(game_id)) as f:
+            return {int(player_id): policy for player_id, policy in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        print(f"Skipping bot seats of game {game_id}: {e}")
+        return {}
+
+
+def open_log(game_id: int, game: Game, resume: bool = False) -> ActionLog | None:
+    # resume: the game was replayed from its log, append to it instead of starting a new one
+    if ACTION_LOG_DIR is None:
+        return None
+    os.makedirs(ACTION_LOG_DIR, exist_ok=True)
+    return ActionLog(game, open(log_path(game_id), "ab" if resume else "wb"), start=not resume)
+
+
+def remove(game_id: int) -> None:
+    # The game is over: drop its checkpoint, keep its log under a new name
+    if CHECKPOINT_DIR is not None:
+        try:
+            os.remove(path(game_id))
+        except FileNotFoundError:
+            pass
+    if bots_path(game_id) is not None:
+        try:
+            os.remove(bots_path(game_id))
+        except FileNotFoundError:
+            pass
+    if ACTION_LOG_DIR is not None:
+        try:
+            os.replace(log_path(game_id), os.path.join(ACTION_LOG_DIR, f"{game_id}-{int(time.time())}{LOG_SUFFIX}"))
+        except FileNotFoundError:
+            pass
+
+
+def load_all(owns: Callable[[int], bool] | None = None) -> dict[int, tuple[Game, bool]]:
+    # game_id -> (game, replayed from its log); owns: only these game ids, the files of other games are not touched
+    games = {}
+    if CHECKPOINT_DIR is not None and os.path.isdir(CHECKPOINT_DIR):
+        for name in os.listdir(CHECKPOINT_DIR):
+            if not name.endswith(SUFFIX) or not name[:-len(SUFFIX)].isdigit():
+                continue
+            if owns is not None and not owns(int(name[:-len(SUFFIX)])):
+                continue
+            try:
+                with open(os.path.join(CHECKPOINT_DIR, name), "rb") as f:
+                    games[int(name[:-len(SUFFIX)])] = (restore_game(f.read()), False)
+            except (ValueError, SnapshotError) as e:
+                print(f"Skipping checkpoint {name}: {e}")
+    if ACTION_LOG_DIR is not None and os.path.isdir(ACTION_LOG_DIR):
+        for name in os.listdir(ACTION_LOG_DIR):
+            if not name.endswith(LOG_SUFFIX) or not name[:-len(LOG_SUFFIX)].isdigit(): # finished games have a time
+                continue
+            if owns is not None and not owns(int(name[:-len(LOG_SUFFIX)])):
+                continue
+            try:
+                with open(os.path.join(ACTION_LOG_DIR, name), "rb") as f:
+                    replay = Replay(f.read())
+                games[int(name[:-len(LOG_SUFFIX)])] = (replay.game_at(len(replay)), True)
+                os.truncate(os.path.join(ACTION_LOG_DIR, name), replay.end) # drop a record cut off by the crash
+            except (ValueError, ReplayError) as e:
+                print(f"Skipping action log {name}: {e}")
+    return games
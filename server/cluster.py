@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from typing import Callable
+
+import httpx
+import uvicorn
+import websockets
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+
+from server.server import ALLOWED_ORIGINS, GameIdRequest
+
+'''
+Cluster
+
+Sharded deployment: N worker processes each run the normal server (server/server.py, own GAMES),
+a gateway in front of them owns no games and forwards every request to the worker that owns the game.
+- Ownership is a consistent hash ring over the worker urls (HashRing), game id -> worker.
+  The gateway picks the id of a new game and creates it on its owner (POST /create?game_id=...).
+- /join, /game/{id}/start, /game/{id}/add_bot, /game/{id}/remove_bot are forwarded as they are,
+  /ws/{game_id}/{player_id} is proxied message by message (origin, subprotocols and query string are passed on).
+- /metrics collects the metrics of all workers.
+- Every worker knows the ring (CLUSTER_WORKERS, its own url in CLUSTER_WORKER), on a restart it only restores the
+  checkpoints and action logs of its own games (server/checkpoints.py), the workers can share CHECKPOINT_DIR.
+  Spawned workers get both from the gateway, workers started elsewhere must set them to the gateway's --worker-urls.
+
+    python -m server.cluster --workers 4 --port 8000                  # spawns 4 local workers on ports 8001..8004
+    python -m server.cluster --worker-urls http://10.0.0.2:8000,...   # workers started elsewhere
+'''
+RING_REPLICAS = 160 # virtual nodes per worker
+CLUSTER_WORKERS = os.getenv("CLUSTER_WORKERS") # on a worker: all worker urls, comma separated; unset: not in a cluster
+CLUSTER_WORKER = os.getenv("CLUSTER_WORKER") # on a worker: its own url in CLUSTER_WORKERS
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes: list[str], replicas: int = RING_REPLICAS) -> None:
+        self.nodes = list(nodes)
+        self.ring = sorted((hash_key(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self.keys = [key for key, _ in self.ring]
+
+    def node(self, key) -> str:
+        i = bisect.bisect(self.keys, hash_key(str(key))) % len(self.keys)
+        return self.ring[i][1]
+
+
+def owns_game() -> Callable[[int], bool] | None:
+    # On a worker: whether a game id hashes to this worker, None outside a cluster (every game is its own)
+    if not CLUSTER_WORKERS or not CLUSTER_WORKER:
+        return None
+    ring = HashRing(CLUSTER_WORKERS.split(","))
+    return lambda game_id: ring.node(game_id) == CLUSTER_WORKER
+
+
+def create_gateway(worker_urls: list[str]) -> FastAPI:
+    ring = HashRing(worker_urls)
+    client = httpx.AsyncClient(timeout=10)
+    gateway = FastAPI()
+    gateway.add_middleware(
+        CORSMiddleware,
+        allow_origins=ALLOWED_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    async def forward(request: Request, game_id: int, params=None) -> Response:
+        worker = ring.node(game_id)
+        response = await client.request(
+            request.method,
+            worker + request.url.path,
+            params=params if params is not None else request.query_params,
+            content=await request.body(),
+            headers={"content-type": request.headers.get("content-type", "application/json")},
+        )
+        return Response(content=response.content, status_code=response.status_code, media_type=response.headers.get("content-type"))
+
+    @gateway.get("/board/topology")
+    async def board_topology(request: Request):
+        response = await client.get(worker_urls[0] + "/board/topology", headers={"if-none-match": request.headers.get("if-none-match", "")})
+        headers = {k: v for k, v in response.headers.items() if k in ("etag", "x-topology-hash", "cache-control")}
+        return Response(content=response.content, status_code=response.status_code, media_type="application/json", headers=headers)
+
+    @gateway.get("/metrics")
+    async def metrics():
+        responses = await asyncio.gather(*(client.get(url + "/metrics") for url in worker_urls))
+        return {url: response.json() for url, response in zip(worker_urls, responses)}
+
+    @gateway.post("/create")
+    async def create_game(request: Request):
+        for _ in range(20):
+            game_id = random.randint(1000, 9999)
+            response = await forward(request, game_id, params={"game_id": game_id})
+            if response.status_code != 409: # taken on the owner, try another id
+                return response
+        return JSONResponse(status_code=503, content={"message": "No free game id"})
+
+    @gateway.post("/join")
+    async def join_game(req: GameIdRequest, request: Request):
+        return await forward(request, req.game_id)
+
+    @gateway.post("/game/{game_id}/start")
+    async def start_game(req: GameIdRequest, request: Request):
+        return await forward(request, req.game_id)
+
+    @gateway.post("/game/{game_id}/add_bot")
+    async def add_bot(game_id: int, request: Request):
+        return await forward(request, game_id)
+
+    @gateway.post("/game/{game_id}/remove_bot")
+    async def remove_bot(game_id: int, request: Request):
+        return await forward(request, game_id)
+
+    @gateway.websocket("/ws/{game_id}/{player_id}")
+    async def websocket_proxy(ws: WebSocket, game_id: int, player_id: int):
+        url = ring.node(game_id).replace("http", "ws", 1) + ws.url.path
+        if ws.url.query:
+            url += "?" + ws.url.query
+        try:
+            upstream = await websockets.connect(url, origin=ws.headers.get("origin"), subprotocols=ws.scope.get("subprotocols") or None, max_size=None)
+        except (OSError, websockets.InvalidHandshake):
+            await ws.close(code=1011)
+            return
+        await ws.accept(subprotocol=upstream.subprotocol)
+
+        async def to_worker():
+            while True:
+                message = await ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                await upstream.send(message["text"] if message.get("text") is not None else message["bytes"])
+
+        async def to_client():
+            async for message in upstream:
+                if isinstance(message, str):
+                    await ws.send_text(message)
+                else:
+                    await ws.send_bytes(message)
+            await ws.close(code=upstream.close_code or 1000)
+
+        tasks = [asyncio.create_task(to_worker()), asyncio.create_task(to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await upstream.close()
+
+    return gateway
+
+
+def spawn_workers(n: int, host: str, base_port: int) -> tuple[list[subprocess.Popen], list[str]]:
+    urls = [f"http://{host}:{base_port + i}" for i in range(n)]
+    processes = []
+    for url in urls:
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "server:app",
+            "--host", host, "--port", url.rsplit(":", 1)[1], "--log-level", "warning",
+        ], env=dict(os.environ, CLUSTER_WORKERS=",".join(urls), CLUSTER_WORKER=url)))
+    return processes, urls
+
+
+def wait_for_workers(urls: list[str], timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    for url in urls:
+        while True:
+            try:
+                httpx.get(url + "/board/topology", timeout=1)
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Worker {url} did not start")
+                time.sleep(0.1)
+
+
+def run_cluster(workers: int, host: str, port: int, worker_urls: list[str] | None = None) -> None:
+    processes = []
+    if not worker_urls:
+        processes, worker_urls = spawn_workers(workers, "127.0.0.1", port + 1)
+    # uvicorn re-raises SIGTERM after its shutdown, exit normally instead so the workers are stopped below
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        wait_for_workers(worker_urls)
+        print(f"Gateway on {host}:{port}, workers: {', '.join(worker_urls)}")
+        uvicorn.run(create_gateway(worker_urls), host=host, port=port, log_level="warning")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gateway with game-to-worker affinity")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--worker-urls", type=str, default=os.getenv("WORKER_URLS"), help="comma separated, instead of spawning workers")
+    args = parser.parse_args()
+    run_cluster(args.workers, args.host, args.port, args.worker_urls.split(",") if args.worker_urls else None)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+from fastapi import WebSocket
+
+from server import wire
+from server.state_sync import StateSync
+
+'''
+Outbound Connection
+
+Every websocket gets a send queue and a writer task. Broadcasts only put messages into the queues,
+so a slow client never stalls the table or the acting player's receive loop.
+- Game states are coalesced: a queued, not yet sent state is replaced by the newer one
+  (the frame - full state or delta, see server/state_sync.py - is only built when it is actually sent)
+- Other messages (joins, game over, ...) are never dropped. If a client has SEND_QUEUE_SIZE of them queued,
+  send() waits up to SEND_TIMEOUT seconds for room (backpressure) and then gives up on the client
+- metrics() reports queue depth, dropped states and send latency
+- binary connections (websocket subprotocol wire.SUBPROTOCOL) get their state frames encoded by server/wire.py
+'''
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", "64"))
+SEND_TIMEOUT = float(os.getenv("SEND_TIMEOUT", "5"))
+
+
+class Connection:
+    def __init__(self, ws: WebSocket, sync: StateSync | None = None, max_queue: int = SEND_QUEUE_SIZE, binary: bool = False) -> None:
+        self.ws = ws
+        self.sync = sync or StateSync()
+        self.binary = binary
+        self.max_queue = max_queue
+        self.queue: deque = deque() # (is_state, message, enqueued at)
+        self.changed = asyncio.Condition()
+        self.closed = False
+
+        # Metrics
+        self.sent = 0
+        self.dropped_states = 0
+        self.max_depth = 0
+        self.sent_bytes = 0 # state frames only
+        self.send_seconds = 0.0 # time spent encoding and sending
+        self.max_send_seconds = 0.0
+        self.wait_seconds = 0.0 # time messages spent in the queue
+
+        self.writer = asyncio.create_task(self.run())
+
+    async def send(self, message: dict) -> None:
+        async with self.changed:
+            if len(self.queue) >= self.max_queue:
+                try:
+                    await asyncio.wait_for(self.changed.wait_for(lambda: len(self.queue) < self.max_queue or self.closed), SEND_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.closed = True
+                    self.changed.notify_all()
+            if self.closed:
+                return
+            self.queue.append((False, message, time.perf_counter()))
+            self.enqueued()
+
+    async def send_state(self, state: dict) -> None:
+        # Never waits, an older queued state is dropped
+        async with self.changed:
+            if self.closed:
+                return
+            for i, (is_state, _, _) in enumerate(self.queue):
+                if is_state:
+                    del self.queue[i]
+                    self.dropped_states += 1
+                    break
+            self.queue.append((True, state, time.perf_counter()))
+            self.enqueued()
+
+    async def handle(self, message: dict) -> None:
+        # Sync message from the client (ack / resync)
+        if message.get("type") != "resync":
+            self.sync.handle(message)
+            return
+        self.sync.resync()
+        # A queued state will be sent in full anyway, otherwise resend the last one
+        if self.sync.latest is not None and not any(is_state for is_state, _, _ in self.queue):
+            await self.send_state(self.sync.latest)
+
+    def enqueued(self) -> None:
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self.changed.notify_all()
+
+    async def run(self) -> None:
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.queue or self.closed)
+                if self.closed:
+                    break
+                is_state, message, enqueued = self.queue.popleft()
+                self.changed.notify_all()
+
+            start = time.perf_counter()
+            try:
+                if not is_state:
+                    await self.ws.send_json(message)
+                elif self.binary:
+                    data = wire.encode_frame(self.sync.frame(message))
+                    self.sent_bytes += len(data)
+                    await self.ws.send_bytes(data)
+                else:
+                    text = json.dumps(self.sync.frame(message), separators=(",", ":"))
+                    self.sent_bytes += len(text)
+                    await self.ws.send_text(text)
+            except Exception: # client is gone, the receive loop handles the disconnect
+                self.closed = True
+                return
+            end = time.perf_counter()
+            self.sent += 1
+            self.send_seconds += end - start
+            self.max_send_seconds = max(self.max_send_seconds, end - start)
+            self.wait_seconds += start - enqueued
+
+        # Closed by send(), the client is too slow
+        if self.ws.client_state.name == "CONNECTED":
+            try:
+                await self.ws.close(code=1013) # too slow, the client can reconnect and resync
+            except Exception:
+                pass
+
+    async def close(self) -> None:
+        # Stops the writer and closes the websocket (its receive loop sees a disconnect)
+        async with self.changed:
+            self.closed = True
+            self.changed.notify_all()
+        self.writer.cancel()
+        try:
+            await self.writer
+        except asyncio.CancelledError:
+            pass
+        if self.ws.client_state.name == "CONNECTED":
+            try:
+                await self.ws.close(code=1000)
+            except Exception:
+                pass
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped_states": self.dropped_states,
+            "binary": self.binary,
+            "state_bytes": self.sent_bytes,
+            "mean_send_ms": 1000 * self.send_seconds / self.sent if self.sent else 0.0,
+            "max_send_ms": 1000 * self.max_send_seconds,
+            "mean_queue_wait_ms": 1000 * self.wait_seconds / self.sent if self.sent else 0.0,
+        }
+
+
+async def broadcast(connections, message: dict) -> None:
+    # Fan out to all connections at once, only waits if a queue is full
+    await asyncio.gather(*(conn.send(message) for conn in connections if conn))
@@ -0,0 +1,83 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+Game Actor
+
+Each running game is driven by one actor task with an inbox. Sockets post their actions (submit) and await the result,
+the actor applies them one at a time, so actions from different sockets on the same game are strictly ordered.
+- The game logic (call_action incl. longest road and the state building) runs in GAME_EXECUTOR:
+  "thread" (default) runs it on a shared thread pool, so a heavy game does not block the event loop,
+  "inline" runs it on the event loop. Only the actor touches its game, so no locking is needed.
+- publish(player_id, result) is awaited by the actor after every action and before the next one,
+  so results are handed out in the order they happened.
+- With a log (game/action_log.py) the accepted actions are recorded in the same order.
+'''
+GAME_EXECUTOR = os.getenv("GAME_EXECUTOR", "thread")
+GAME_THREADS = int(os.getenv("GAME_THREADS", "4"))
+
+EXECUTOR = ThreadPoolExecutor(max_workers=GAME_THREADS, thread_name_prefix="game") if GAME_EXECUTOR == "thread" else None
+
+
+class GameStopped(Exception):
+    pass
+
+
+class GameActor:
+    def __init__(self, game, publish=None, executor=EXECUTOR, log=None) -> None:
+        self.game = game
+        self.publish = publish
+        self.executor = executor
+        self.log = log
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self.run())
+
+    async def submit(self, player_id: int, action: dict):
+        # Same results as Game.call_action
+        call_action = self.log.call_action if self.log else self.game.call_action
+        return await self.call(call_action, player_id, action, publish=True)
+
+    async def call(self, fn, *args, publish: bool = False):
+        # Runs fn(*args) in the actor, for everything else that reads or changes the game
+        if self.task.done():
+            raise GameStopped()
+        future = asyncio.get_running_loop().create_future()
+        await self.inbox.put((fn, args, publish, future))
+        return await future
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, args, publish, future = await self.inbox.get()
+            try:
+                if self.executor:
+                    result = await loop.run_in_executor(self.executor, fn, *args)
+                else:
+                    result = fn(*args)
+                if publish and self.publish:
+                    await self.publish(args[0], result)
+            except asyncio.CancelledError:
+                if not future.done(): # the caller may be cancelled already
+                    future.set_exception(GameStopped())
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done(): # the caller may be gone
+                future.set_result(result)
+
+    async def stop(self) -> None:
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        # nobody is going to answer these anymore
+        while not self.inbox.empty():
+            *_, future = self.inbox.get_nowait()
+            if not future.done():
+                future.set_exception(GameStopped())
+        if self.log:
+            self.log.close()
@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+
+from game import static_board
+
+'''
+Load Test
+
+Plays many games at once against a server or cluster gateway over HTTP + websockets, the way the frontend does.
+Every player is a simple client that only sees its game state: it places its initial settlements/roads,
+rolls, handles discards/robber and ends its turn. Reports actions/s and the action -> new state latency.
+
+    python -m server.load_test --url http://127.0.0.1:8000 --games 20 --players 3
+    python -m server.load_test --scaling 0,1,2,4 --games 40 # starts a local cluster (server/cluster.py) per worker count,
+                                                             # 0 is the plain single process server (uvicorn server:app)
+'''
+ORIGIN = "http://localhost:5173"
+
+
+def settlement_spots(board: dict) -> list[int]:
+    owned = {v["id"] for v in board["vertices"] if v["player"] is not None}
+    return [v for v in range(54) if v not in owned and not owned.intersection(static_board.VERTEX_VERTEX[v])]
+
+
+def road_spots(board: dict, player_id: int) -> list[int]:
+    mine = {v["id"] for v in board["vertices"] if v["player"] == player_id}
+    for e in board["edges"]:
+        if e["player"] == player_id:
+            mine.update(static_board.EDGE_VERTEX[e["id"]])
+    return [e["id"] for e in board["edges"] if e["player"] is None and mine.intersection(static_board.EDGE_VERTEX[e["id"]])]
+
+
+def next_action(state: dict, player_id: int, rng: random.Random) -> dict | None:
+    board = state["board"]
+    me = json.loads(state["players"][str(player_id)])
+
+    if state["must_discard"]:
+        cards = [resource for resource, amount in me["hand"].items() for _ in range(amount)]
+        resources = {}
+        for resource in rng.sample(cards, state["must_discard"]):
+            resources[resource] = resources.get(resource, 0) + 1
+        return {"type": "discard_resources", "resources": resources}
+
+    if state["initial_placement_order"] != -1:
+        if state["initial_placement_order"] != player_id:
+            return None
+        settlements = sum(v["player"] == player_id for v in board["vertices"])
+        roads = sum(e["player"] == player_id for e in board["edges"])
+        if settlements > roads: # the road goes next to the settlement that has none yet
+            edges = board["edges"]
+            new = [v["id"] for v in board["vertices"] if v["player"] == player_id and all(edges[e]["player"] != player_id for e in static_board.VERTEX_EDGE[v["id"]])]
+            return {"type": "place_road", "edge_id": rng.choice([e for e in static_board.VERTEX_EDGE[new[0]] if edges[e]["player"] is None])}
+        return {"type": "place_settlement", "vertex_id": rng.choice(settlement_spots(board))}
+
+    if state["current_turn"] != player_id or state["forced_action"] == "Discard":
+        return None
+    match state["forced_action"]:
+        case "Move Robber":
+            robber = next(t["id"] for t in board["tiles"] if t["robber"])
+            return {"type": "move_robber", "target_tile": rng.choice([t for t in range(19) if t != robber])}
+        case "Steal Resource":
+            return {"type": "robber_steal", "victim_id": rng.choice(state["robber_candidates"])}
+        case "Place Road 1" | "Place Road 2":
+            return {"type": "place_road", "edge_id": rng.choice(road_spots(board, player_id) or [0])}
+    if not me["dice_rolled"]:
+        return {"type": "roll_dice"}
+    return {"type": "end_turn"}
+
+
+class LoadStats:
+    def __init__(self) -> None:
+        self.actions = 0
+        self.failed = 0
+        self.latencies: list[float] = []
+
+    def summary(self, seconds: float) -> dict:
+        latencies = sorted(self.latencies) or [0.0]
+        pick = lambda q: 1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+        return {
+            "actions": self.actions,
+            "failed": self.failed,
+            "seconds": seconds,
+            "actions_per_second": self.actions / seconds,
+            "p50_ms": pick(0.5),
+            "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99),
+        }
+
+
+async def play(ws_url: str, player_id: int, budget: list[int], done: asyncio.Event, ready: asyncio.Event, stats: LoadStats, rng: random.Random) -> None:
+    async with websockets.connect(f"{ws_url}/{player_id}", origin=ORIGIN, max_size=None) as ws:
+        ready.set()
+        state = None
+        sent = None # (time, version) of the action in flight
+        failures = idle = 0
+        while not done.is_set():
+            try:
+                message = json.loads(await asyncio.wait_for(ws.recv(), 1))
+                idle = 0
+            except asyncio.TimeoutError:
+                idle += 1
+                if idle >= 5: # the game is stuck
+                    done.set()
+                continue
+            if message.get("status") == "game_over":
+                done.set()
+                break
+            if message.get("status") == "action_failed":
+                stats.failed += 1
+                failures += 1
+                sent = None
+                if failures > 5: # the state is outdated (e.g. simultaneous discards), wait for the next one
+                    continue
+            elif "board" in message:
+                state = message
+                failures = 0
+                if sent and state["version"] > sent[1]:
+                    stats.latencies.append(time.perf_counter() - sent[0])
+                    sent = None
+            else:
+                continue
+
+            if sent or state is None:
+                continue
+            action = next_action(state, player_id, rng)
+            if action is None:
+                continue
+            if budget[0] <= 0:
+                done.set()
+                break
+            budget[0] -= 1
+            stats.actions += 1
+            sent = (time.perf_counter(), state["version"])
+            await ws.send(json.dumps(action))
+
+
+async def run_game(client: httpx.AsyncClient, url: str, players: int, actions: int, stats: LoadStats, seed: int) -> None:
+    game_id = (await client.post(url + "/create")).json()["game_id"]
+    for _ in range(players - 1):
+        await client.post(url + "/join", json={"game_id": game_id})
+
+    ws_url = url.replace("http", "ws", 1) + f"/ws/{game_id}"
+    budget, done = [actions], asyncio.Event()
+    readies = [asyncio.Event() for _ in range(players)]
+    tasks = [
+        asyncio.create_task(play(ws_url, player_id, budget, done, readies[player_id - 1], stats, random.Random(seed * 10 + player_id)))
+        for player_id in range(1, players + 1)
+    ]
+    await asyncio.gather(*(ready.wait() for ready in readies))
+    await client.post(url + f"/game/{game_id}/start", json={"game_id": game_id})
+    await asyncio.gather(*tasks)
+
+
+async def load_test(url: str, games: int, players: int, actions: int, seed: int = 0) -> dict:
+    stats = LoadStats()
+    async with httpx.AsyncClient(timeout=30) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(run_game(client, url, players, actions, stats, seed + i) for i in range(games)))
+        return stats.summary(time.perf_counter() - start)
+
+
+def print_summary(summary: dict) -> None:
+    print(f"{summary['actions']} actions ({summary['failed']} failed) in {summary['seconds']:.2f}s: "
+          f"{summary['actions_per_second']:.0f} actions/s, latency p50 {summary['p50_ms']:.1f}ms "
+          f"p95 {summary['p95_ms']:.1f}ms p99 {summary['p99_ms']:.1f}ms")
+
+
+def scaling(worker_counts: list[int], port: int, games: int, players: int, actions: int) -> None:
+    base = None
+    for workers in worker_counts:
+        if workers == 0:
+            command = [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"]
+        else:
+            command = [sys.executable, "-m", "server.cluster", "--workers", str(workers), "--port", str(port)]
+        cluster = subprocess.Popen(command)
+        try:
+            url = f"http://127.0.0.1:{port}"
+            for _ in range(300):
+                try:
+                    httpx.get(url + "/board/topology", timeout=1)
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            summary = asyncio.run(load_test(url, games, players, actions))
+        finally:
+            cluster.terminate()
+            cluster.wait()
+        base = base or summary["actions_per_second"]
+        print(f"{workers or 'no'} workers: {summary['actions_per_second'] / base:.2f}x ", end="")
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Websocket load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--actions", type=int, default=200, help="actions per game")
+    parser.add_argument("--scaling", type=str, default=None, help="comma separated worker counts, e.g. 0,1,2,4 (0: no gateway)")
+    parser.add_argument("--port", type=int, default=8100, help="gateway port for --scaling")
+    args = parser.parse_args()
+
+    if args.scaling:
+        scaling([int(w) for w in args.scaling.split(",")], args.port, args.games, args.players, args.actions)
+    else:
+        print_summary(asyncio.run(load_test(args.url, args.games, args.players, args.actions)))
@@ -0,0 +1,42 @@
+import asyncio
+import json
+import os
+
+from fastapi import WebSocketDisconnect
+
+from server.connection import Connection
+
+'''
+Lobby
+
+A lobby socket waits on the game's "started" event instead of polling, so /start wakes every waiting socket at once.
+While waiting the socket is also read, so a disconnect is noticed (and announced to the others) immediately.
+Keepalive pings are a separate heartbeat: LOBBY_HEARTBEAT seconds (env var, 0 turns it off), sent through the connection's queue.
+'''
+LOBBY_HEARTBEAT = float(os.getenv("LOBBY_HEARTBEAT", "25"))
+
+
+async def wait_for_start(conn: Connection, started: asyncio.Event, heartbeat: float = LOBBY_HEARTBEAT) -> dict | None:
+    # Returns once the game has started, raises WebSocketDisconnect if the client leaves the lobby
+    # A message that arrives after the start is the client's first action, it is returned instead of dropped
+    ws = conn.ws
+    receiver = asyncio.create_task(ws.receive())
+    waiter = asyncio.create_task(started.wait())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiver, waiter}, timeout=heartbeat or None, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                message = receiver.result()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if started.is_set():
+                    return json.loads(message.get("text") or message.get("bytes"))
+                # Nothing to do in the lobby, messages are ignored
+                receiver = asyncio.create_task(ws.receive())
+            if started.is_set():
+                return None
+            if not done:
+                await conn.send({"type": "ping"})
+    finally:
+        receiver.cancel()
+        waiter.cancel()
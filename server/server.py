@@ -1,20 +1,58 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
 import uvicorn
 import asyncio
 import random
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+import logging
 import os
+from contextlib import asynccontextmanager
 
 from game.logic import Game
+from game.board_generator import BoardPool
+from game import static_board
 from game.action import *
+from server.state_sync import StateSync, SYNC_MESSAGES
+from server.connection import Connection, broadcast
+from server.bots import BOT_POLICIES, BOT_POLICY, BotConnection
+from server.game_actor import GameActor, GameStopped
+from server.lobby import wait_for_start
+from server import checkpoints, wire
 
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
 
-GAMES = {} # game_id -> {"game_state": game_state, "websockets": {player_id: websocket}}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Games of a previous run (server/checkpoints.py), they wait for their players to reconnect, their bots are seated again.
+    # A cluster worker only restores the games the gateway sends to it (server/cluster.py imports this module)
+    from server.cluster import owns_game
+    for game_id, (game, replayed) in checkpoints.load_all(owns_game()).items():
+        logger.info("Restoring game %s from its %s", game_id, "action log" if replayed else "checkpoint")
+        GAMES[game_id] = {"game_state": True, "started": asyncio.Event(), "websockets": {player_id: None for player_id in game.players}}
+        for player_id, policy in checkpoints.load_bots(game_id).items():
+            if player_id in game.players and policy in BOT_POLICIES:
+                GAMES[game_id]["websockets"][player_id] = BotConnection(GAMES[game_id], player_id, policy)
+        GAMES[game_id]["game_instance"] = game
+        GAMES[game_id]["actor"] = GameActor(
+            game,
+            publish=lambda player_id, result, game_id=game_id: publish_result(game_id, player_id, result),
+            log=checkpoints.open_log(game_id, game, resume=replayed),
+        )
+        GAMES[game_id]["started"].set()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+GAMES = {} # game_id -> {"game_state": game_state, "started": asyncio.Event, "websockets": {player_id: Connection}, once started: "game_instance", "actor": GameActor}
+
+# BOARD_POOL=n pre-generates n board layouts at startup, new games draw theirs from it (game/board_generator.py)
+BOARD_POOL_SIZE = int(os.getenv("BOARD_POOL", "0"))
+BOARD_POOL = BoardPool(BOARD_POOL_SIZE) if BOARD_POOL_SIZE > 0 else None
 
 class GameIdRequest(BaseModel):
     game_id: int
@@ -33,14 +71,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/board/topology")
+async def board_topology(request: Request):
+    # Static adjacency of the board, game states only reference it by hash ("topology" in the board)
+    headers = {
+        "ETag": f'"{static_board.TOPOLOGY_HASH}"',
+        "X-Topology-Hash": static_board.TOPOLOGY_HASH,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=static_board.TOPOLOGY_BYTES, media_type="application/json", headers=headers)
+
+
+@app.get("/metrics")
+async def metrics():
+    # Outbound queue depth and send latency of every connection
+    return {
+        game_id: {player_id: conn.metrics() for player_id, conn in game["websockets"].items() if conn}
+        for game_id, game in GAMES.items()
+    }
+
+
 @app.post("/create")
-async def create_game():
-    game_id = random.randint(1000, 9999)
-    while game_id in GAMES:
+async def create_game(game_id: int | None = None):
+    # the cluster coordinator picks the id (it decides which worker owns the game), see server/cluster.py
+    if game_id is not None and game_id in GAMES:
+        return JSONResponse(status_code=409, content={"message": "Game id already in use"})
+    while game_id is None or game_id in GAMES:
         game_id = random.randint(1000, 9999)
     print(f"Creating game {game_id}")
     
-    GAMES[game_id] = {"game_state": False, "websockets": {}}
+    GAMES[game_id] = {"game_state": False, "started": asyncio.Event(), "websockets": {}}
     player_id = 1
     GAMES[game_id]["websockets"][player_id] = None  # Placeholder for WebSocket connection
     return {"game_id": game_id, "player_id": player_id}
@@ -61,22 +123,47 @@ async def join_game(req: GameIdRequest):
     player_id = min(set(range(1, 5)) - set(GAMES[game_id]["websockets"].keys()))
     GAMES[game_id]["websockets"][player_id] = None  # Placeholder for WebSocket connection
 
-    for conn in GAMES[game_id]["websockets"].values():
-        if conn:
-            await conn.send_json({"status": "player_joined", "player_id": player_id})
+    await broadcast(GAMES[game_id]["websockets"].values(), {"status": "player_joined", "player_id": player_id})
 
     return {"player_id": player_id, "game_id": game_id}
 
 
 
 @app.post("/game/{game_id}/add_bot")
-def add_bot(game_id: str):
-    pass # TODO
+async def add_bot(game_id: int, policy: str = BOT_POLICY):
+    # The bot takes the lowest free seat like a joining player, its connection is a BotConnection (server/bots.py)
+    if game_id not in GAMES:
+        return JSONResponse(status_code=404, content={"message": "Game not found"})
+    if policy not in BOT_POLICIES:
+        return JSONResponse(status_code=400, content={"message": f"Unknown bot policy, one of {', '.join(BOT_POLICIES)}"})
+    if len(GAMES[game_id]["websockets"]) >= 4:
+        return JSONResponse(status_code=400, content={"message": "Game is full"})
+    if GAMES[game_id]["game_state"]:
+        return JSONResponse(status_code=400, content={"message": "Game has already started"})
+
+    player_id = min(set(range(1, 5)) - set(GAMES[game_id]["websockets"].keys()))
+    GAMES[game_id]["websockets"][player_id] = BotConnection(GAMES[game_id], player_id, policy)
+
+    await broadcast(GAMES[game_id]["websockets"].values(), {"status": "player_joined", "player_id": player_id, "bot": policy})
+
+    return {"player_id": player_id, "game_id": game_id, "policy": policy}
 
 
 @app.post("/game/{game_id}/remove_bot")
-def remove_bot(game_id: int):
-    pass # TODO
+async def remove_bot(game_id: int, player_id: int | None = None):
+    # Removes the given bot, or the bot with the highest seat (the engine has no way to drop a seat during a game)
+    if game_id not in GAMES:
+        return JSONResponse(status_code=404, content={"message": "Game not found"})
+    if GAMES[game_id]["game_state"]:
+        return JSONResponse(status_code=400, content={"message": "Game has already started"})
+    bots = [pid for pid, conn in GAMES[game_id]["websockets"].items() if isinstance(conn, BotConnection)]
+    if player_id is None and bots:
+        player_id = max(bots)
+    if player_id not in bots:
+        return JSONResponse(status_code=404, content={"message": "Bot not found"})
+
+    await leave_game(game_id, player_id, GAMES[game_id]["websockets"][player_id])
+    return {"player_id": player_id, "game_id": game_id}
 
 
 @app.post("/game/{game_id}/start")
@@ -89,25 +176,36 @@ async def start_game(req: GameIdRequest):
     if len(GAMES[game_id]["websockets"]) < 2:
         return JSONResponse(status_code=400, content={"message": "Not enough players to start the game"})
     
+    # The game and its actor exist before the first await: a disconnect handled meanwhile (leave_game) finds them
     GAMES[game_id]["game_state"] = True
     # create new game class instance here
-    GAMES[game_id]["game_instance"] = Game()
+    GAMES[game_id]["game_instance"] = Game(board_pool=BOARD_POOL)
 
     for player_id in GAMES[game_id]["websockets"].keys():
         GAMES[game_id]['game_instance'].add_player(player_id)
 
-    for conn in GAMES[game_id]["websockets"].values():
-        if conn:
-            await conn.send_json({"game_state": "True"})
-    
     # star game
     start_state = GAMES[game_id]['game_instance'].start_game()
 
+    # from now on every access to the game goes through its actor (see server/game_actor.py)
+    GAMES[game_id]["actor"] = GameActor(
+        GAMES[game_id]["game_instance"],
+        publish=lambda player_id, result: publish_result(game_id, player_id, result),
+        log=checkpoints.open_log(game_id, GAMES[game_id]["game_instance"]),
+    )
+    checkpoints.save_bots(game_id, {pid: conn.policy for pid, conn in GAMES[game_id]["websockets"].items() if isinstance(conn, BotConnection)})
+
+    # players can leave while this awaits, the entry may even be gone from GAMES
+    entry = GAMES[game_id]
+    await broadcast(entry["websockets"].values(), {"game_state": "True"})
+
     # send initial game state to all players
-    for player_id, conn in GAMES[game_id]["websockets"].items():
+    for player_id, conn in list(entry["websockets"].items()):
         if conn:
-            await conn.send_json(start_state[player_id])
+            await conn.send_state(start_state[player_id])
 
+    # wake up the lobby sockets
+    entry["started"].set()
     return {"message": "Game started"}
 
 
@@ -119,78 +217,131 @@ async def websocket_endpoint(ws: WebSocket, game_id: int, player_id: int):
         await ws.close(code=1008) 
         return
     
-    await ws.accept()
+    # Binary state frames if the client asks for the subprotocol (see server/wire.py), JSON otherwise
+    binary = wire.SUBPROTOCOL in ws.scope.get("subprotocols", [])
+    await ws.accept(subprotocol=wire.SUBPROTOCOL if binary else None)
 
     if game_id not in GAMES or player_id not in GAMES[game_id]["websockets"]:
         await ws.close(code=1008)
         return
     
-    GAMES[game_id]["websockets"][player_id] = ws
-
-    await ws.send_json({
+    # ?sync=delta: the client gets state deltas against its last acknowledged version (see server/state_sync.py)
+    # Everything sent to the client goes through the connection's queue (see server/connection.py)
+    conn = Connection(ws, StateSync(delta=ws.query_params.get("sync") == "delta"), binary=binary)
+    # A reconnect replaces the old session, registered first so the old socket's disconnect leaves the player in the game
+    previous = GAMES[game_id]["websockets"].get(player_id)
+    GAMES[game_id]["websockets"][player_id] = conn
+    if previous:
+        await previous.close()
+
+    await conn.send({
         "type": "lobby_state",
         "players": sorted(GAMES[game_id]["websockets"].keys())
     })
 
     try:
-        while not GAMES[game_id]["game_state"]:
-            await ws.send_json({"type": "ping"})
-            await asyncio.sleep(2)
+        first = await wait_for_start(conn, GAMES[game_id]["started"])
     
-        game_instance = GAMES[game_id]["game_instance"]
-        await ws.send_json(game_instance.get_multiplayer_game_state()[player_id])
+        actor = GAMES[game_id]["actor"]
+        states = await actor.call(actor.game.get_multiplayer_game_state)
+        if player_id not in states: # left while the game was starting, leave_game() closed this connection
+            return
+        await conn.send_state(states[player_id])
 
         # Main Game Loop
         while True:
-            data = await ws.receive_json()
+            if conn.closed: # gone or too slow (see server/connection.py)
+                raise WebSocketDisconnect(1013)
+            data = first if first is not None else await ws.receive_json()
+            first = None
+
+            if data.get("type") in SYNC_MESSAGES:
+                await conn.handle(data)
+                continue
             
-            result = game_instance.call_action(player_id, data)
-            
-            # if result is false the aciton failed, if result is 1,2,3,4 the player has won, else the new game state is returned
-            if result is False: 
-                await ws.send_json({"status": "action_failed"})
-            elif result in [1,2,3,4]: # player_id won
-                for conn in GAMES[game_id]["websockets"].values():
-                    if conn:
-                        await conn.send_json({"status": "game_over", "winner": result})
-            else:
-                for pid, conn in GAMES[game_id]["websockets"].items():
-                    if conn:
-                        await conn.send_json(result[pid])
+            # The actor applies the action and publishes the result (publish_result)
+            await actor.submit(player_id, data)
     
     except WebSocketDisconnect:
         print(f"Player {player_id} disconnected from game {game_id}")
+        await leave_game(game_id, player_id, conn)
 
-        # Remove the websocket connection
-        if player_id in GAMES[game_id]["websockets"]:
-            GAMES[game_id]["websockets"].pop(player_id, None)
 
-        # if websockets is empty, remove the game
-        if not GAMES[game_id]["websockets"]:
-            GAMES.pop(game_id, None)
-            return
+async def leave_game(game_id: int, player_id: int, conn) -> None:
+    # A player disconnected or a bot was removed
+    # The game can be removed by another disconnect while this one is handled
+    game = GAMES.get(game_id)
+    if game is None:
+        await conn.close()
+        return
 
-        # Notify remaining players
-        for conn in GAMES[game_id]["websockets"].values():
-            if conn:
-                await conn.send_json({"status": "player_disconnected", "player_id": player_id})
+    # A connection that was replaced by a reconnect: the player is still there
+    if game["websockets"].get(player_id) is not conn:
+        await conn.close()
+        return
+
+    # Remove the connection
+    game["websockets"].pop(player_id, None)
+    await conn.close()
+
+    # if only bots are left (or nobody), remove the game
+    if all(isinstance(other, BotConnection) for other in game["websockets"].values()):
+        if GAMES.get(game_id) is game:
+            GAMES.pop(game_id)
+        for bot in game["websockets"].values():
+            await bot.close()
+        if "actor" in game:
+            await game["actor"].stop()
+        checkpoints.remove(game_id)
+        return
 
-        # Remove from game instance
-        if player_id in game_instance.players:
-            game_instance.remove_player(player_id)
+    # Notify remaining players
+    await broadcast(game["websockets"].values(), {"status": "player_disconnected", "player_id": player_id})
 
+    # Still in the lobby, nothing else to clean up
+    if not game["game_state"]:
+        return
 
-        # Check if enough players remain
-        if len(game_instance.players) < 2:
-            GAMES[game_id]["game_state"] = False
-            for conn in GAMES[game_id]["websockets"].values():
-                if conn:
-                    await conn.send_json({
-                        "status": "game_over",
-                        "message": "Not enough players to continue the game"
-                    })
+    # Remove from game instance
+    actor = game["actor"]
+    if player_id in actor.game.players:
+        try:
+            await actor.call(actor.game.remove_player, player_id)
+        except GameStopped: # the last players left meanwhile
+            return
 
 
+    # Check if enough players remain
+    if len(actor.game.players) < 2:
+        game["game_state"] = False
+        checkpoints.remove(game_id)
+        await broadcast(game["websockets"].values(), {
+            "status": "game_over",
+            "message": "Not enough players to continue the game"
+        })
+
+
+async def publish_result(game_id: int, player_id: int, result) -> None:
+    # if result is false the aciton failed, if result is 1,2,3,4 the player has won, else the new game state is returned
+    if game_id not in GAMES: # everyone left meanwhile
+        return
+    connections = GAMES[game_id]["websockets"]
+    if result is False:
+        if connections.get(player_id):
+            await connections[player_id].send({"status": "action_failed"})
+    elif result in [1,2,3,4]: # player_id won
+        await broadcast(connections.values(), {"status": "game_over", "winner": result})
+        checkpoints.remove(game_id)
+    else:
+        # Only queues the states, every connection's writer sends on its own
+        for pid, conn in connections.items():
+            if conn:
+                await conn.send_state(result[pid])
+        # publish runs in the actor, the game does not change before the snapshot is taken
+        game = GAMES[game_id]["game_instance"]
+        if checkpoints.due(game):
+            checkpoints.save(game_id, game)
+
 
 def start_server(host, port):
     uvicorn.run(app, host=host, port=port)
\ No newline at end of file
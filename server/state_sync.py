@@ -0,0 +1,131 @@
+'''
+Delta State Sync
+
+Every game state a player receives has a "version" (Game.version, increased by every accepted action).
+A connection opts in to deltas with ws://.../ws/{game_id}/{player_id}?sync=delta and then receives
+
+    {"type": "state_delta", "version": v, "base_version": b, "changes": {...}}
+
+where "changes" only holds what differs from version b, the last version the client acknowledged:
+- "board": {"tiles": {id: tile}, "vertices": {id: vertex}, "edges": {id: edge}} (changed entries only)
+- "players": {player_id: entry} and "removed_players": [player_id]
+- "bank": {resource: amount}
+- every other (flow) field that changed, with its new value
+
+The client acknowledges with {"type": "ack", "version": v} and can always ask for a full state with {"type": "resync"}.
+Since deltas are relative to the last acked version, a client has to keep the states it received since its last ack.
+Without ?sync=delta a connection keeps receiving the full state (with "version") after every action.
+'''
+SYNC_MESSAGES = ("ack", "resync")
+MAX_UNACKED = 32 # if a client falls this far behind it gets a full state again
+
+
+def diff_board(old: dict, new: dict) -> dict:
+    changes = {}
+    for kind in ("tiles", "vertices", "edges"):
+        changed = {
+            item["id"]: item
+            for old_item, item in zip(old.get(kind, ()), new.get(kind, ()))
+            if old_item != item
+        }
+        if changed:
+            changes[kind] = changed
+    return changes
+
+
+def diff_state(old: dict, new: dict) -> dict:
+    changes = {}
+    for key, value in new.items():
+        if key == "version":
+            continue
+        if key == "board":
+            board = diff_board(old.get("board", {}), value)
+            if board:
+                changes["board"] = board
+        elif key in ("players", "bank"):
+            old_value = old.get(key, {})
+            changed = {k: v for k, v in value.items() if old_value.get(k) != v}
+            if changed:
+                changes[key] = changed
+            removed = [k for k in old_value if k not in value]
+            if key == "players" and removed:
+                changes["removed_players"] = removed
+        elif old.get(key) != value:
+            changes[key] = value
+    return changes
+
+
+def apply_delta(state: dict, delta: dict) -> dict:
+    # Client side of the protocol (bots, tools), returns the new state and leaves the old one untouched
+    # Works on states before and after a JSON round trip (int or str ids)
+    state = dict(state)
+    for key, value in delta["changes"].items():
+        if key == "board":
+            board = dict(state["board"])
+            for kind, items in value.items():
+                board[kind] = list(board[kind])
+                for id, item in items.items():
+                    board[kind][int(id)] = item
+            state["board"] = board
+        elif key in ("players", "bank"):
+            state[key] = {**state[key], **value}
+        elif key == "removed_players":
+            state["players"] = {k: v for k, v in state["players"].items() if k not in value}
+        else:
+            state[key] = value
+    state["version"] = delta["version"]
+    return state
+
+
+class StateSync:
+    # Per connection: remembers the states that were sent and which one the client acknowledged
+    def __init__(self, delta: bool = False) -> None:
+        self.delta = delta
+        self.sent: dict[int, dict] = {} # version -> state, not yet acknowledged
+        self.acked_version: int | None = None
+        self.acked_state: dict | None = None
+        self.latest: dict | None = None # last state, for resyncs
+
+    def frame(self, state: dict) -> dict:
+        # Message to send for a new state
+        self.latest = state
+        if not self.delta:
+            return state
+
+        self.sent[state["version"]] = state
+        if len(self.sent) > MAX_UNACKED:
+            self.resync()
+            self.sent[state["version"]] = state
+
+        if self.acked_state is None:
+            return state
+        return {
+            "type": "state_delta",
+            "version": state["version"],
+            "base_version": self.acked_version,
+            "changes": diff_state(self.acked_state, state),
+        }
+
+    def ack(self, version: int) -> None:
+        if version not in self.sent:
+            return
+        self.acked_version = version
+        self.acked_state = self.sent[version]
+        self.sent = {v: s for v, s in self.sent.items() if v > version}
+
+    def resync(self) -> None:
+        # The next frame is a full state
+        self.sent.clear()
+        self.acked_version = None
+        self.acked_state = None
+
+    def handle(self, message: dict) -> dict | None:
+        # Handles a sync message from the client, returns a frame to send back (if any)
+        match message.get("type"):
+            case "ack":
+                self.ack(int(message.get("version")))
+            case "resync":
+                self.resync()
+                if self.latest is not None:
+                    return self.frame(self.latest)
+        return None
@@ -0,0 +1,342 @@
+import json
+import struct
+from operator import itemgetter
+
+from game.board import BUILDINGS, PORT_TYPES, RESOURCES
+
+'''
+Binary Wire Protocol
+
+Optional encoding of the state frames (full states and state deltas, see server/state_sync.py).
+A client opts in by asking for the websocket subprotocol SUBPROTOCOL, the server then sends state frames
+as binary messages and everything else (status messages, lobby, pings) stays JSON text.
+Without the subprotocol nothing changes.
+
+Frame: header "<2sBBIIH" = MAGIC, WIRE_VERSION, FULL/DELTA, version, base_version (0 for full states), section mask,
+followed by the sections of the mask bits that are set, in bit order:
+- tiles / vertices / edges: u8 count, then count == 19/54/72: one column per record field in id order, else u8 id + record
+  tile: resource, number (NONE = None), robber    vertex: building, player (0 = none), port    edge: player (0 = none)
+- topology: 8 bytes (static_board.TOPOLOGY_HASH)
+- players: u8 count, then u8 player id + record: u8 flags (FLAGS bits, 0x80 = own private record), u8 COUNTERS,
+  u8 number of ports + their PORT_TYPES indices, own record only: u8 hand (HAND), u8 development cards (DEVELOPMENT_CARDS)
+- removed_players: u8 count + ids    bank: u8 mask of the HAND resources present + their amounts
+- one section per SCALARS field (u8, NONE = 255 for None / -1; forced_action as FORCED_ACTIONS index; lists as u8 count + items)
+- tail: u32 length + JSON object with every other field (pending_trade, no_partner, ...) and the sections whose values
+  do not fit their bytes (a count or bank amount outside 0..255, an unknown forced action), which are sent as JSON instead
+The decoded frame equals the JSON frame, except that the own player record is a dict instead of a JSON string.
+'''
+SUBPROTOCOL = "catan.bin.v1"
+MAGIC = b"CB"
+WIRE_VERSION = 2 # 2: "Trade Pending" in FORCED_ACTIONS
+FULL = 0
+DELTA = 1
+NONE = 255
+
+HEADER = struct.Struct("<2sBBIIH")
+HAND = ("wood", "brick", "sheep", "wheat", "ore")
+DEVELOPMENT_CARDS = ("knight", "victory_point", "road_building", "year_of_plenty", "monopoly")
+COUNTERS = ("total_hand", "total_development_cards", "victory_points_without_vp_cards", "played_knights",
+            "longest_road_length", "victory_points", "settlements", "cities", "roads")
+FLAGS = ("longest_road", "largest_army", "played_card_this_turn", "dice_rolled", "current_turn")
+PRIVATE = 0x80
+FORCED_ACTIONS = (None, "Discard", "Move Robber", "Steal Resource", "Place Road 1", "Place Road 2", "Year of Plenty", "Monopoly",
+                  "Trade Pending")
+
+# Key order of the player records, as built by Game.add_player and Game.public_player_state
+PRIVATE_KEYS = ("hand", "development_cards", "played_knights", "longest_road_length", "victory_points", "settlements",
+                "cities", "roads", "ports", "longest_road", "largest_army", "played_card_this_turn", "dice_rolled",
+                "current_turn", "total_hand", "total_development_cards", "victory_points_without_vp_cards")
+PUBLIC_KEYS = ("total_hand", "total_development_cards", "victory_points_without_vp_cards", "played_knights",
+               "longest_road_length", "victory_points", "settlements", "cities", "roads", "ports", "longest_road",
+               "largest_army", "played_card_this_turn", "dice_rolled", "current_turn")
+
+GET_FLAGS = itemgetter(*FLAGS)
+GET_COUNTERS = itemgetter(*COUNTERS)
+GET_HAND = itemgetter(*HAND)
+GET_DEVELOPMENT_CARDS = itemgetter(*DEVELOPMENT_CARDS)
+
+BOARD = (("tiles", 19, 3), ("vertices", 54, 3), ("edges", 72, 1)) # kind, size, bytes per record
+SCALARS = ("development_cards_remaining", "current_turn", "current_roll", "initial_placement_order",
+           "forced_action", "must_discard", "robber_candidates", "pending_robber_tile")
+LISTS = ("robber_candidates",)
+
+# Section mask bits
+TILES, VERTICES, EDGES, TOPOLOGY, PLAYERS, REMOVED_PLAYERS, BANK = (1 << i for i in range(7))
+SCALAR_BITS = {name: 1 << (7 + i) for i, name in enumerate(SCALARS)}
+TAIL = 1 << 15
+
+RESOURCE_CODES = {resource: i for i, resource in enumerate(RESOURCES)}
+BUILDING_CODES = {building: i for i, building in enumerate(BUILDINGS)}
+PORT_CODES = {port: i for i, port in enumerate(PORT_TYPES)}
+FORCED_ACTION_CODES = {action: i for i, action in enumerate(FORCED_ACTIONS)}
+
+
+def optional(value) -> int:
+    return NONE if value is None or value == -1 else value
+
+
+def tile_record(tile: dict) -> tuple:
+    return RESOURCE_CODES[tile["resource"]], NONE if tile["number"] is None else tile["number"], tile["robber"]
+
+
+def vertex_record(vertex: dict) -> tuple:
+    return BUILDING_CODES[vertex["building"]], vertex["player"] or 0, PORT_CODES[vertex["port"]]
+
+
+def edge_record(edge: dict) -> tuple:
+    return (edge["player"] or 0,)
+
+
+RECORDS = {"tiles": tile_record, "vertices": vertex_record, "edges": edge_record}
+
+
+def dense_tiles(tiles: list) -> bytes:
+    return (bytes([RESOURCE_CODES[t["resource"]] for t in tiles])
+            + bytes([NONE if t["number"] is None else t["number"] for t in tiles])
+            + bytes([t["robber"] for t in tiles]))
+
+
+def dense_vertices(vertices: list) -> bytes:
+    return (bytes([BUILDING_CODES[v["building"]] for v in vertices])
+            + bytes([v["player"] or 0 for v in vertices])
+            + bytes([PORT_CODES[v["port"]] for v in vertices]))
+
+
+def dense_edges(edges: list) -> bytes:
+    return bytes([e["player"] or 0 for e in edges])
+
+
+DENSE = {"tiles": dense_tiles, "vertices": dense_vertices, "edges": dense_edges}
+
+
+def encode_board_section(out: bytearray, kind: str, size: int, items) -> None:
+    # items: list of all entries (full state) or {id: entry} (delta)
+    if isinstance(items, dict):
+        items = sorted((int(id), item) for id, item in items.items())
+        if len(items) == size:
+            items = [item for _, item in items]
+    if len(items) == size: # all entries, column by column
+        out.append(size)
+        out += DENSE[kind](items)
+    else:
+        record = RECORDS[kind]
+        out.append(len(items))
+        for id, item in items:
+            out += bytes((id, *record(item)))
+
+
+def encode_player(out: bytearray, player_id: int, entry) -> None:
+    private = isinstance(entry, str)
+    if private:
+        entry = json.loads(entry)
+    flags = PRIVATE if private else 0
+    for bit, value in enumerate(GET_FLAGS(entry)):
+        if value:
+            flags |= 1 << bit
+    ports = entry["ports"]
+    out += bytes((player_id, flags, *GET_COUNTERS(entry), len(ports), *[PORT_CODES[port] for port in ports]))
+    if private:
+        out += bytes((*GET_HAND(entry["hand"]), *GET_DEVELOPMENT_CARDS(entry["development_cards"])))
+
+
+def encode_scalar(name: str, value) -> bytes:
+    if name in LISTS:
+        return bytes((len(value), *value))
+    if name == "forced_action":
+        return bytes((FORCED_ACTION_CODES[value],))
+    return bytes((optional(value),))
+
+
+def encode_fields(fields: dict, board: dict | None, kind: int, version: int, base_version: int) -> bytes:
+    out = bytearray(HEADER.size)
+    mask = 0
+    tail = {}
+
+    if board is not None:
+        for bit, (name, size, _) in zip((TILES, VERTICES, EDGES), BOARD):
+            if name in board:
+                mask |= bit
+                encode_board_section(out, name, size, board[name])
+        if "topology" in board:
+            mask |= TOPOLOGY
+            out += bytes.fromhex(board["topology"])
+
+    # bytes() raises ValueError for anything outside 0..255: such a section goes into the tail as it is
+    if "players" in fields:
+        players = fields["players"]
+        section = bytearray([len(players)])
+        try:
+            for player_id, entry in players.items():
+                encode_player(section, int(player_id), entry)
+        except (KeyError, ValueError, TypeError):
+            tail["players"] = players
+        else:
+            mask |= PLAYERS
+            out += section
+    if "removed_players" in fields:
+        try:
+            section = bytes((len(fields["removed_players"]), *map(int, fields["removed_players"])))
+        except (ValueError, TypeError):
+            tail["removed_players"] = fields["removed_players"]
+        else:
+            mask |= REMOVED_PLAYERS
+            out += section
+    if "bank" in fields:
+        bank = fields["bank"]
+        present = [i for i, resource in enumerate(HAND) if resource in bank] # deltas only have the changed ones
+        try:
+            section = bytes((sum(1 << i for i in present), *(bank[HAND[i]] for i in present)))
+        except (ValueError, TypeError):
+            tail["bank"] = bank
+        else:
+            mask |= BANK
+            out += section
+
+    for name in SCALARS:
+        if name in fields:
+            try:
+                encoded = encode_scalar(name, fields[name])
+            except (KeyError, ValueError, TypeError): # not representable (e.g. a new forced action), goes into the tail
+                tail[name] = fields[name]
+                continue
+            mask |= SCALAR_BITS[name]
+            out += encoded
+
+    for key, value in fields.items():
+        if key not in ("version", "board", "players", "removed_players", "bank") and key not in SCALARS:
+            tail[key] = value
+    if tail:
+        mask |= TAIL
+        data = json.dumps(tail, separators=(",", ":")).encode()
+        out += struct.pack("<I", len(data)) + data
+
+    HEADER.pack_into(out, 0, MAGIC, WIRE_VERSION, kind, version, base_version, mask)
+    return bytes(out)
+
+
+def encode_frame(frame: dict) -> bytes:
+    # Full state or state_delta frame -> binary message
+    if frame.get("type") == "state_delta":
+        changes = frame["changes"]
+        return encode_fields(changes, changes.get("board"), DELTA, frame["version"], frame["base_version"])
+    return encode_fields(frame, frame["board"], FULL, frame["version"], 0)
+
+
+class Reader:
+    def __init__(self, data: bytes, offset: int) -> None:
+        self.data = data
+        self.offset = offset
+
+    def take(self, n: int) -> bytes:
+        chunk = self.data[self.offset:self.offset + n]
+        if len(chunk) != n:
+            raise ValueError("Truncated frame")
+        self.offset += n
+        return chunk
+
+    def byte(self) -> int:
+        return self.take(1)[0]
+
+
+def decode_tile(id: int, r: bytes) -> dict:
+    return {"id": id, "resource": RESOURCES[r[0]], "number": None if r[1] == NONE else r[1], "robber": bool(r[2])}
+
+
+def decode_vertex(id: int, r: bytes) -> dict:
+    return {"id": id, "building": BUILDINGS[r[0]], "player": r[1] or None, "port": PORT_TYPES[r[2]]}
+
+
+def decode_edge(id: int, r: bytes) -> dict:
+    return {"id": id, "player": r[0] or None}
+
+
+DECODERS = {"tiles": decode_tile, "vertices": decode_vertex, "edges": decode_edge}
+
+
+def dense_decode(kind: str, columns: list) -> list:
+    if kind == "tiles":
+        return [{"id": id, "resource": RESOURCES[r], "number": None if n == NONE else n, "robber": bool(robber)}
+                for id, (r, n, robber) in enumerate(zip(*columns))]
+    if kind == "vertices":
+        return [{"id": id, "building": BUILDINGS[b], "player": p or None, "port": PORT_TYPES[port]}
+                for id, (b, p, port) in enumerate(zip(*columns))]
+    return [{"id": id, "player": p or None} for id, p in enumerate(columns[0])]
+
+
+def decode_board_section(reader: Reader, kind: str, size: int, width: int, full: bool):
+    count = reader.byte()
+    if count == size:
+        data = reader.take(size * width)
+        items = dense_decode(kind, [data[i * size:(i + 1) * size] for i in range(width)])
+        return items if full else {item["id"]: item for item in items}
+    decode = DECODERS[kind]
+    items = {}
+    for _ in range(count):
+        record = reader.take(width + 1)
+        items[record[0]] = decode(record[0], record[1:])
+    return items
+
+
+def decode_player(reader: Reader) -> tuple[int, dict]:
+    player_id, flags = reader.take(2)
+    counters = reader.take(len(COUNTERS))
+    ports = [PORT_TYPES[code] for code in reader.take(reader.byte())]
+    values = dict(zip(COUNTERS, counters))
+    values.update({name: bool(flags & (1 << bit)) for bit, name in enumerate(FLAGS)})
+    values["ports"] = ports
+    if not flags & PRIVATE:
+        return player_id, {key: values[key] for key in PUBLIC_KEYS}
+    values["hand"] = dict(zip(HAND, reader.take(len(HAND))))
+    values["development_cards"] = dict(zip(DEVELOPMENT_CARDS, reader.take(len(DEVELOPMENT_CARDS))))
+    return player_id, {key: values[key] for key in PRIVATE_KEYS}
+
+
+def decode_scalar(reader: Reader, name: str):
+    if name in LISTS:
+        return list(reader.take(reader.byte()))
+    value = reader.byte()
+    if name == "forced_action":
+        return FORCED_ACTIONS[value]
+    if name == "initial_placement_order":
+        return -1 if value == NONE else value
+    if name in ("current_roll", "pending_robber_tile"):
+        return None if value == NONE else value
+    return value
+
+
+def decode_frame(data: bytes) -> dict:
+    # Binary message -> frame, for bots/tools and the benchmarks
+    magic, wire_version, kind, version, base_version, mask = HEADER.unpack_from(data)
+    if magic != MAGIC or wire_version != WIRE_VERSION:
+        raise ValueError("Not a binary state frame")
+    reader = Reader(data, HEADER.size)
+    full = kind == FULL
+    fields = {}
+
+    board = {}
+    for bit, (name, size, width) in zip((TILES, VERTICES, EDGES), BOARD):
+        if mask & bit:
+            board[name] = decode_board_section(reader, name, size, width, full)
+    if mask & TOPOLOGY:
+        board = {"topology": reader.take(8).hex(), **board}
+    if board:
+        fields["board"] = board
+
+    if mask & PLAYERS:
+        fields["players"] = dict(decode_player(reader) for _ in range(reader.byte()))
+    if mask & REMOVED_PLAYERS:
+        fields["removed_players"] = list(reader.take(reader.byte()))
+    if mask & BANK:
+        present = reader.byte()
+        resources = [resource for i, resource in enumerate(HAND) if present & (1 << i)]
+        fields["bank"] = dict(zip(resources, reader.take(len(resources))))
+    for name in SCALARS:
+        if mask & SCALAR_BITS[name]:
+            fields[name] = decode_scalar(reader, name)
+    if mask & TAIL:
+        (length,) = struct.unpack("<I", reader.take(4))
+        fields.update(json.loads(reader.take(length)))
+
+    if full:
+        return {"version": version, **fields}
+    return {"type": "state_delta", "version": version, "base_version": base_version, "changes": fields}
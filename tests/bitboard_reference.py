@@ -0,0 +1,131 @@
+import random
+
+from game import action_space
+from game.action import (
+    can_place_city, can_place_road, can_place_settlement, can_steal, port_ratios_for_player, robbable_players_on_tile,
+)
+from game.bitboard import ids
+from game.board import Board
+from game.logic import Game
+from game.snapshot import restore_game, snapshot_game
+
+'''
+Bitboard reference
+
+The rules that walk the vertex/edge objects (reference_*, the game/action.py functions before the bitboards of
+game/bitboard.py) and the differential check of both versions over random games, used by tests/test_bitboard.py
+and benchmarks/bitboard.py.
+'''
+def reference_can_place_settlement(board: Board, vertex_id: int, player_id: int) -> bool:
+    if board.vertices[vertex_id].owner != None and board.vertices[vertex_id].building != None:
+        return False
+    has_connection = False
+    for edge in board.vertices[vertex_id].edges:
+        if board.edges[edge].owner == player_id:
+            has_connection = True
+            break
+    if not has_connection:
+        return False
+    return reference_distance_rule(board, vertex_id)
+
+
+def reference_distance_rule(board: Board, vertex_id: int) -> bool:
+    # initial_placement_round's check
+    if board.vertices[vertex_id].owner != None and board.vertices[vertex_id].building != None:
+        return False
+    for neighbor in board.vertices[vertex_id].vertices:
+        if board.vertices[neighbor].building != None or board.vertices[neighbor].owner != None:
+            return False
+    return True
+
+
+def reference_can_place_city(board: Board, vertex_id: int, player_id: int) -> bool:
+    return board.vertices[vertex_id].owner == player_id and board.vertices[vertex_id].building == "settlement"
+
+
+def reference_can_place_road(board: Board, edge_id: int, player_id: int) -> bool:
+    if board.edges[edge_id].owner == None:
+        for vertex in board.edges[edge_id].vertices:
+            if board.vertices[vertex].owner == player_id:
+                return True
+        for edge_id2 in board.edges[edge_id].edges:
+            if board.edges[edge_id2].owner == player_id:
+                return True
+    return False
+
+
+def reference_can_steal(board: Board, stealer_id: int, victim_id: int) -> bool:
+    if stealer_id == victim_id:
+        return False
+    if board.robber_tile == None:
+        return False
+    for vertex in board.tiles[board.robber_tile].vertices:
+        if board.vertices[vertex].owner == victim_id:
+            return True
+    return False
+
+
+def reference_robbable_players_on_tile(board: Board, players: dict, tile_id: int, current: int) -> list[int]:
+    seen = set()
+    for vertex in board.tiles[tile_id].vertices:
+        if board.vertices[vertex].building is not None and board.vertices[vertex].owner != current:
+            if sum(players[board.vertices[vertex].owner]["hand"].values()) > 0:
+                seen.add(board.vertices[vertex].owner)
+    return sorted(seen)
+
+
+def differences(game: Game) -> list[str]:
+    # Every rule for every vertex, edge, tile and player, both ways
+    board, bits = game.board, game.board.candidates.bits
+    found = []
+    for player_id in game.players:
+        for vertex_id in range(54):
+            if can_place_settlement(board, vertex_id, player_id) != reference_can_place_settlement(board, vertex_id, player_id):
+                found.append(f"can_place_settlement vertex {vertex_id} player {player_id}")
+            if can_place_city(board, vertex_id, player_id) != reference_can_place_city(board, vertex_id, player_id):
+                found.append(f"can_place_city vertex {vertex_id} player {player_id}")
+        for edge_id in range(72):
+            if can_place_road(board, edge_id, player_id) != reference_can_place_road(board, edge_id, player_id):
+                found.append(f"can_place_road edge {edge_id} player {player_id}")
+        if set(ids(bits.settlement_spots(player_id))) != {v for v in range(54) if reference_can_place_settlement(board, v, player_id)}:
+            found.append(f"settlement_spots player {player_id}")
+        if set(ids(bits.road_spots(player_id))) != {e for e in range(72) if reference_can_place_road(board, e, player_id)}:
+            found.append(f"road_spots player {player_id}")
+        for victim_id in game.players:
+            if can_steal(board, player_id, victim_id) != reference_can_steal(board, player_id, victim_id):
+                found.append(f"can_steal {player_id} from {victim_id} on tile {board.robber_tile}")
+        for tile_id in range(19):
+            if robbable_players_on_tile(board, game.players, tile_id, player_id) != reference_robbable_players_on_tile(board, game.players, tile_id, player_id):
+                found.append(f"robbable_players_on_tile tile {tile_id} current {player_id}")
+    for vertex_id in range(54):
+        if bits.distance_rule(vertex_id) != reference_distance_rule(board, vertex_id):
+            found.append(f"distance_rule vertex {vertex_id}")
+    return found
+
+
+def check(games: int, seed: int = 1, max_actions: int = 1500) -> tuple[int, list[str]]:
+    # (positions checked, differences)
+    positions = 0
+    found = []
+    for index in range(games):
+        game = Game(compact_board=index % 2 == 1, seed=seed + index)
+        for player_id in range(1, 5):
+            game.add_player(player_id)
+        game.start_game()
+        rng = random.Random(seed + index)
+        for step in range(max_actions):
+            player_id = game.waiting_for()[0]
+            legal = [i for i, ok in enumerate(game.legal_actions(player_id)) if ok]
+            legal = [i for i in legal if i not in (action_space.DISCARD_RESOURCES, action_space.PROPOSE_TRADE)]
+            if not legal:
+                break
+            result = game.call_action(player_id, action_space.decode_action(rng.choice(legal), port_ratios_for_player(player_id, game.players)), return_state=False)
+            positions += 1
+            views = [game]
+            if step % 50 == 0: # the masks must survive copies and snapshots too
+                views += [game.copy(), restore_game(snapshot_game(game))]
+            for view in views:
+                found += [f"game {index} step {step}: {difference}" for difference in differences(view)]
+            if result is not True and result is not False: # someone won
+                break
+    return positions, found
@@ -0,0 +1,57 @@
+import random
+
+from game import action_space
+from game.action import port_ratios_for_player
+from game.action_log import HEADER, LOG_VERSION, MAGIC, ActionLog, Replay
+from game.logic import Game
+from game.snapshot import is_seeded, snapshot_game
+
+
+def recorded_game(seed: int, max_actions: int = 400) -> tuple[ActionLog, list[bytes]]:
+    # Random legal play, the log and the snapshot of the game after every accepted action (index 0: the start)
+    game = Game(seed=seed)
+    for player_id in range(1, 4):
+        game.add_player(player_id)
+    game.start_game()
+    log = ActionLog(game)
+    states = [snapshot_game(game)]
+    rng = random.Random(seed)
+    for _ in range(max_actions):
+        player_id = game.waiting_for()[0]
+        legal = [i for i, ok in enumerate(game.legal_actions(player_id)) if ok]
+        index = rng.choice([i for i in legal if i != action_space.PROPOSE_TRADE])
+        action = action_space.decode_action(index, port_ratios_for_player(player_id, game.players))
+        if index == action_space.DISCARD_RESOURCES:
+            cards = [resource for resource, amount in game.players[player_id]["hand"].items() for _ in range(amount)]
+            action = {"type": "discard_resources", "resources": {}}
+            for resource in rng.sample(cards, game.pending_discard[player_id]):
+                action["resources"][resource] = action["resources"].get(resource, 0) + 1
+        result = log.call_action(player_id, action, return_state=False)
+        if result is not False:
+            states.append(snapshot_game(game))
+        if result is not False and result is not True: # a player won
+            break
+    return log, states
+
+
+def test_replay_rebuilds_every_step():
+    # The start snapshot has the game's generator, the replay draws the same dice and steals again
+    log, states = recorded_game(seed=3)
+    replay = Replay(log.to_bytes(), every=16)
+    assert replay.seeded and len(replay) == len(states) - 1
+    for step in (0, 1, 17, len(replay) // 2, len(replay)):
+        assert snapshot_game(replay.game_at(step)) == states[step]
+    assert [snapshot_game(game) for game, *_ in replay] == states[:-1]
+
+
+def test_unseeded_log_uses_the_recorded_draws():
+    # Without the generator in the start snapshot the recorded outcomes are replayed instead
+    log, _ = recorded_game(seed=4)
+    data = log.to_bytes()
+    _, _, length = HEADER.unpack_from(data)
+    start = snapshot_game(Replay(data).start, rng=False)
+    assert is_seeded(data[HEADER.size:HEADER.size + length]) and not is_seeded(start)
+    unseeded = HEADER.pack(MAGIC, LOG_VERSION, len(start)) + start + data[HEADER.size + length:]
+    replay = Replay(unseeded)
+    assert not replay.seeded
+    assert snapshot_game(replay.game_at(len(replay)), rng=False) == snapshot_game(log.game, rng=False)
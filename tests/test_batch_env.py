@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from game import action_space
+from game.action import port_ratios_for_player
+from game.board import Board
+from game.logic import Game
+from game.placement import PlacementCandidates
+from game.production import ProductionIndex
+from rl import batch_env
+from rl.batch_env import BatchEnv
+
+# BatchEnv against Game on the same position, over random rollouts: legal_mask() and Game.legal_actions() agree on
+# every action both have, and applying the action to both leaves the same hands and bank. Out of scope, played
+# differently on purpose (see rl/batch_env.py): which cards a 7 discards (only how many is compared), who the robber
+# steals from and what, player to player trades and the Road Building / Year of Plenty / Monopoly cards.
+
+# Game action index of every BatchEnv action, both layouts keep the same order inside a block
+SHARED = np.concatenate([
+    [action_space.END_TURN, action_space.ROLL_DICE],
+    np.arange(action_space.PLACE_SETTLEMENT, action_space.ROBBER_STEAL), # settlements, cities, roads, robber tiles
+    [action_space.BUY_DEVELOPMENT_CARD, action_space.PLAY_KNIGHT],
+    np.arange(action_space.BANK_TRADE, action_space.N_ACTIONS),
+])
+assert len(SHARED) == batch_env.N_ACTIONS
+
+
+def port_name(code: int) -> str | None:
+    # BatchEnv port code -> Game port
+    if code == 0:
+        return None
+    return "3:1" if code == 1 else f"2:1 {batch_env.RESOURCES[code - 2].capitalize()}"
+
+
+def mirror(env: BatchEnv, g: int) -> Game:
+    # One BatchEnv game as a Game (players 1..P), with everything Game.legal_actions and call_action look at
+    game = Game(seed=0)
+    board = Board()
+    for tile in board.tiles:
+        code = int(env.tile_resource[g, tile.id])
+        tile.resource = "Desert" if code == 0 else batch_env.RESOURCES[code - 1]
+        tile.number = int(env.tile_number[g, tile.id])
+        tile.robber = tile.id == env.robber_tile[g]
+    board.robber_tile = int(env.robber_tile[g])
+    for vertex in board.vertices:
+        owner = int(env.vertex_owner[g, vertex.id])
+        vertex.owner = None if owner < 0 else owner + 1
+        vertex.building = (None, "settlement", "city")[env.vertex_building[g, vertex.id]]
+        vertex.port = port_name(int(env.vertex_port[g, vertex.id]))
+    for edge in board.edges:
+        owner = int(env.edge_owner[g, edge.id])
+        edge.owner = None if owner < 0 else owner + 1
+    board.production = ProductionIndex(board)
+    board.candidates = PlacementCandidates(board)
+    game.board = board
+
+    current = int(env.current_player[g])
+    points = env.victory_points()[g]
+    for player in range(env.n_players):
+        game.add_player(player + 1)
+        state = game.players[player + 1]
+        state["hand"] = dict(zip(batch_env.RESOURCES, env.hands[g, player].tolist()))
+        state["development_cards"] = dict(zip(batch_env.DEVELOPMENT_CARDS, env.development_cards[g, player].tolist()))
+        state["played_knights"] = int(env.played_knights[g, player])
+        state["settlements"], state["cities"], state["roads"] = env.pieces[g, player].tolist()
+        state["ports"] = [port_name(code + 1) for code in np.flatnonzero(env.ports[g, player])]
+        state["victory_points"] = int(points[player])
+        state["longest_road_length"] = int(env.longest_road_length[g, player])
+        state["longest_road"] = env.longest_road[g] == player
+        state["largest_army"] = env.largest_army[g] == player
+        state["current_turn"] = player == current
+        state["dice_rolled"] = player == current and bool(env.dice_rolled[g])
+        state["played_card_this_turn"] = player == current and bool(env.played_card_this_turn[g])
+    game.road_network.rebuild(board, list(game.players))
+
+    game.bank = dict(zip(batch_env.RESOURCES, env.bank[g].tolist()))
+    # Game buys the last card of its list, BatchEnv the card at development_remaining - 1
+    game.development_cards = [batch_env.DEVELOPMENT_CARDS[card] for card in env.development_deck[g, :env.development_remaining[g]]]
+    game.cards_bought_this_turn = dict(zip(batch_env.DEVELOPMENT_CARDS, env.cards_bought_this_turn[g, current].tolist()))
+    game.initial_placement_order = [player + 1 for player in env.placement_order[g].tolist()]
+    game.counter = int(env.counter[g])
+    game.last_vertex_initial_placement = int(env.last_vertex[g])
+    game.current_turn = current + 1
+    game.forced_action = "Move Robber" if env.phase[g] == batch_env.MOVE_ROBBER else None
+    return game
+
+
+def check_step(env: BatchEnv, rng: np.random.Generator, seen: dict) -> None:
+    # Compares the masks, steps every game with a random legal action and compares the outcome with Game
+    mask = env.legal_mask()
+    games = [mirror(env, g) for g in range(env.n_games)]
+    actions = []
+    for g, game in enumerate(games):
+        player = int(env.current_player[g])
+        assert mask[g].tolist() == np.array(game.legal_actions(player + 1))[SHARED].tolist()
+        actions.append(int(rng.choice(np.flatnonzero(mask[g]))))
+        if env.phase[g] == batch_env.MOVE_ROBBER and batch_env.ROAD <= actions[-1] < batch_env.ROBBER:
+            seen["road_before_robber"] += 1
+    victims = [
+        env.robbable(g, int(env.current_player[g]), action - batch_env.ROBBER) if batch_env.ROBBER <= action < batch_env.BUY_DEVELOPMENT_CARD else None
+        for g, action in enumerate(actions)
+    ]
+    hands, bank = env.hands.copy(), env.bank.copy()
+
+    _, done, valid = env.step(np.array(actions))
+    assert valid.all()
+
+    for g, (game, action) in enumerate(zip(games, actions)):
+        if done[g]: # won and reset, nothing left to compare
+            continue
+        payload = action_space.decode_action(int(SHARED[action]), port_ratios_for_player(game.current_turn, game.players))
+        draws = {"dice": int(env.last_roll[g])} if action == batch_env.ROLL_DICE else None
+        assert game.call_action(game.current_turn, payload, return_state=False, draws=draws) is not False
+        if victims[g] is not None:
+            # The steal itself is random, the candidates are the same
+            assert [victim - 1 for victim in game.robber_candidates] == victims[g]
+            continue
+        if action == batch_env.ROLL_DICE and env.last_roll[g] == 7:
+            # Game waits for the discards, BatchEnv makes them at random: the same players lose the same amount
+            lost = (hands[g] - env.hands[g]).sum(axis=1)
+            assert lost.tolist() == [game.pending_discard.get(p + 1, 0) for p in range(env.n_players)]
+            assert (env.bank[g] - bank[g]).sum() == lost.sum()
+            assert env.phase[g] == batch_env.MOVE_ROBBER
+            seen["discards"] += int(lost.any())
+            continue
+        assert env.hands[g].tolist() == [list(game.players[p + 1]["hand"].values()) for p in range(env.n_players)]
+        assert env.bank[g].tolist() == list(game.bank.values())
+        assert (env.phase[g] == batch_env.MOVE_ROBBER) == (game.forced_action == "Move Robber")
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_env_matches_game_rules(seed):
+    env = BatchEnv(6, seed=seed)
+    rng = np.random.default_rng(seed)
+    seen = {"discards": 0, "road_before_robber": 0}
+    for _ in range(300):
+        check_step(env, rng, seen)
+    assert seen["discards"] and seen["road_before_robber"] # the rollouts reached both
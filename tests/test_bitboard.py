@@ -0,0 +1,8 @@
+from tests.bitboard_reference import check
+
+
+def test_bitboards_match_object_walking_rules():
+    # Random games on both board kinds, every rule both ways after every action (python -m benchmarks.bitboard for more)
+    positions, found = check(games=4, seed=1, max_actions=400)
+    assert positions > 0
+    assert found == []
@@ -0,0 +1,31 @@
+from benchmarks.board_generation import compare, homogeneity, rejection_layout, sample
+from game import static_board
+from game.board_generator import random_layout
+
+ALPHA = 0.001 # before the Bonferroni correction, as in python -m benchmarks.board_generation
+
+
+def test_same_distribution_as_rejection_sampling():
+    # Every layout feature of game/board_generator.py against the rejection sampling it replaced
+    results = compare(5000, seed=1)
+    alpha = ALPHA / len(results)
+    assert [name for name, (_, _, p) in results.items() if p < alpha] == []
+
+
+def test_detects_a_different_distribution():
+    # The check has power: numbers shuffled without the 6/8 rule are told apart on red_tiles
+    def unconstrained(rng):
+        port_config, resources, numbers, ports = random_layout(rng)
+        numbers = list(numbers)
+        land = [tile for tile in range(19) if numbers[tile] != 0]
+        shuffled = [numbers[tile] for tile in land]
+        rng.shuffle(shuffled)
+        for tile, number in zip(land, shuffled):
+            numbers[tile] = number
+        return port_config, resources, tuple(numbers), ports
+
+    old = sample(rejection_layout, 5000, 1)
+    new = sample(unconstrained, 5000, 2)
+    assert any(n in static_board.TILE_TILE[t] for tiles in new["red_tiles"] for t in tiles for n in tiles)
+    _, _, p = homogeneity(old["red_tiles"], new["red_tiles"])
+    assert p < ALPHA / len(old)
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from game.logic import Game
+from server import bots, checkpoints, cluster
+from server.bots import BotConnection
+from server.game_actor import GameActor
+from server.server import GAMES, app
+
+
+def started_game(seed: int = 1) -> Game:
+    game = Game(seed=seed)
+    for player_id in (1, 2):
+        game.add_player(player_id)
+    game.start_game()
+    return game
+
+
+def test_timed_out_decision_is_not_queued_again(monkeypatch):
+    # A decision that overruns keeps its worker, the bot must not queue a second one behind it
+    calls = []
+    release = threading.Event()
+
+    def slow_decide(*args):
+        calls.append(args)
+        release.wait(5)
+        return None
+
+    monkeypatch.setattr(bots, "BOT_EXECUTOR", "thread")
+    monkeypatch.setattr(bots, "decide", slow_decide)
+
+    async def main():
+        game = started_game()
+        actor = GameActor(game)
+        bot = BotConnection({"started": asyncio.Event(), "actor": actor}, game.waiting_for()[0], "greedy", time_limit=0.05)
+        await bot.close() # act() is driven by hand
+        assert await bot.act() # times out, the greedy policy places the settlement
+        assert await bot.act() # the decision still runs, the greedy policy places the road without a new job
+        assert len(calls) == 1
+        assert (bot.fallbacks, bot.busy) == (2, 1)
+        release.set()
+        await asyncio.wrap_future(bot.job)
+        await actor.stop()
+
+    asyncio.run(main())
+
+
+def test_restored_game_gets_its_bot_back(monkeypatch, tmp_path):
+    # A checkpointed game waiting for a bot continues after a restart
+    monkeypatch.setattr(bots, "BOT_EXECUTOR", "thread")
+    monkeypatch.setattr(checkpoints, "CHECKPOINT_DIR", str(tmp_path))
+    game = started_game()
+    bot_id = game.waiting_for()[0]
+    checkpoints.save(77, game)
+    checkpoints.save_bots(77, {bot_id: "greedy"})
+
+    with TestClient(app):
+        assert isinstance(GAMES[77]["websockets"][bot_id], BotConnection)
+        deadline = time.monotonic() + 10
+        while GAMES[77]["actor"].game.counter == game.counter and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert GAMES[77]["actor"].game.counter > game.counter
+        GAMES.pop(77)
+
+    checkpoints.remove(77)
+    assert checkpoints.load_bots(77) == {}
+
+
+def test_restored_bots_stay_on_their_worker(monkeypatch, tmp_path):
+    # A cluster worker does not restore (or seat the bots of) a game the ring assigns to another worker
+    monkeypatch.setattr(bots, "BOT_EXECUTOR", "thread")
+    monkeypatch.setattr(checkpoints, "CHECKPOINT_DIR", str(tmp_path))
+    workers = ["http://127.0.0.1:8001", "http://127.0.0.1:8002"]
+    other = next(worker for worker in workers if cluster.HashRing(workers).node(77) != worker)
+    monkeypatch.setattr(cluster, "CLUSTER_WORKERS", ",".join(workers))
+    monkeypatch.setattr(cluster, "CLUSTER_WORKER", other)
+    game = started_game()
+    checkpoints.save(77, game)
+    checkpoints.save_bots(77, {game.waiting_for()[0]: "greedy"})
+
+    with TestClient(app):
+        assert 77 not in GAMES
+
+    assert checkpoints.load_bots(77) # the owner restores them
@@ -0,0 +1,63 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from game.logic import Game
+from server import checkpoints
+from server.cluster import HashRing
+
+
+def free_ports(n: int) -> int:
+    # A port with the n - 1 ports after it free as well (the gateway and its spawned workers)
+    for _ in range(50):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            base = probe.getsockname()[1]
+        try:
+            for port in range(base, base + n):
+                with socket.socket() as probe:
+                    probe.bind(("127.0.0.1", port))
+            return base
+        except OSError:
+            continue
+    raise RuntimeError("No free ports")
+
+
+def test_workers_restore_only_their_own_games(monkeypatch, tmp_path):
+    # The workers share CHECKPOINT_DIR, every checkpointed game is restored once, on the worker the ring sends it to
+    monkeypatch.setattr(checkpoints, "CHECKPOINT_DIR", str(tmp_path))
+    game_ids = list(range(1000, 1012))
+    for game_id in game_ids:
+        game = Game(seed=game_id)
+        for player_id in (1, 2):
+            game.add_player(player_id)
+        game.start_game()
+        checkpoints.save(game_id, game)
+
+    port = free_ports(3)
+    gateway = subprocess.Popen(
+        [sys.executable, "-m", "server.cluster", "--workers", "2", "--port", str(port)],
+        env=dict(os.environ, CHECKPOINT_DIR=str(tmp_path)),
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                metrics = httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=5).json()
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline and gateway.poll() is None
+                time.sleep(0.2)
+    finally:
+        gateway.send_signal(signal.SIGTERM)
+        gateway.wait(30)
+
+    ring = HashRing(list(metrics))
+    restored = {url: sorted(map(int, games)) for url, games in metrics.items()}
+    assert restored == {url: [game_id for game_id in game_ids if ring.node(game_id) == url] for url in metrics}
+    assert all(restored.values())
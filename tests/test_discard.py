@@ -0,0 +1,57 @@
+import random
+
+from game import action_space
+from game.logic import Game
+
+
+def after_seven(seed: int = 1) -> tuple[Game, int]:
+    # A 3 player game right after the current player rolled a 7 with 9 cards (4 owed), 4 roads worth of wood and brick
+    game = Game(seed=seed)
+    for player_id in (1, 2, 3):
+        game.add_player(player_id)
+    game.start_game()
+    rng = random.Random(seed)
+    while game.counter < len(game.initial_placement_order):
+        player_id = game.waiting_for()[0]
+        legal = [i for i, ok in enumerate(game.legal_actions(player_id)) if ok]
+        game.call_action(player_id, action_space.decode_action(rng.choice(legal)), return_state=False)
+    player_id = game.current_turn
+    game.players[player_id]["hand"] = {"wood": 4, "brick": 4, "sheep": 1, "wheat": 0, "ore": 0}
+    assert game.call_action(player_id, {"type": "roll_dice"}, return_state=False, draws={"dice": 7}) is True
+    assert game.forced_action == "Discard" and game.pending_discard[player_id] == 4
+    return game, player_id
+
+
+def road_results(game: Game, player_id: int) -> tuple[list[bool], list[bool]]:
+    # Every edge: (legal_actions says yes, call_action accepts it on a copy)
+    mask = game.legal_actions(player_id)
+    masked, accepted = [], []
+    for edge in range(72):
+        masked.append(mask[action_space.PLACE_ROAD + edge])
+        accepted.append(game.copy().call_action(player_id, {"type": "place_road", "edge_id": edge}, return_state=False) is not False)
+    return masked, accepted
+
+
+def test_no_road_with_owed_cards():
+    # Until the discard the roller can not spend the cards it owes, the mask and call_action agree
+    game, player_id = after_seven()
+    masked, accepted = road_results(game, player_id)
+    assert masked == accepted
+    assert not any(accepted)
+    assert not any(game.legal_actions(player_id)[action_space.CONFIRM_TRADE:action_space.YEAR_OF_PLENTY])
+
+    # After the discard the same roads can be bought (paid roads are allowed while the robber is moved)
+    assert game.call_action(player_id, {"type": "discard_resources", "resources": {"wood": 2, "brick": 1, "sheep": 1}}, return_state=False) is True
+    assert game.forced_action == "Move Robber"
+    masked, accepted = road_results(game, player_id)
+    assert masked == accepted
+    assert any(accepted)
+
+
+def test_discard_stays_possible():
+    # Whatever the roller tries first, it can still pay what it owes and the game goes on
+    game, player_id = after_seven()
+    for edge in range(72):
+        game.call_action(player_id, {"type": "place_road", "edge_id": edge}, return_state=False)
+    assert sum(game.players[player_id]["hand"].values()) == 9
+    assert game.legal_actions(player_id)[action_space.DISCARD_RESOURCES]
@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+import pytest
+
+from server.game_actor import GameActor, GameStopped
+
+
+def test_stop_after_cancelled_call():
+    # A caller cancelled while its call runs (a bot being closed), then the actor is stopped
+    async def main():
+        actor = GameActor(game=None)
+        running = asyncio.create_task(actor.call(time.sleep, 0.2))
+        queued = asyncio.create_task(actor.call(time.sleep, 0))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        queued.cancel()
+        await asyncio.sleep(0)
+        await actor.stop() # must not raise InvalidStateError
+        with pytest.raises(GameStopped):
+            await actor.call(time.sleep, 0)
+
+    asyncio.run(main())
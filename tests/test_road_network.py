@@ -0,0 +1,179 @@
+import random
+
+import pytest
+
+from benchmarks.engine import dense_roads
+from game import action_space, static_board
+from game.action import calculate_longest_road, port_ratios_for_player
+from game.board import Board, CompactBoard
+from game.logic import Game
+from game.road_network import RoadNetwork
+
+
+def brute_force_longest(board, player_id: int) -> int:
+    # Every trail of the player's roads, extended edge by edge; independent of game/road_network.py
+    roads = [edge.id for edge in board.edges if edge.owner == player_id]
+    best = 0
+
+    def extend(vertex: int, used: set, length: int) -> None:
+        nonlocal best
+        best = max(best, length)
+        if board.vertices[vertex].owner not in (None, player_id):
+            return
+        for edge in static_board.VERTEX_EDGE[vertex]:
+            if edge in used or board.edges[edge].owner != player_id:
+                continue
+            a, b = static_board.EDGE_VERTEX[edge]
+            extend(b if a == vertex else a, used | {edge}, length + 1)
+
+    for edge in roads:
+        for end in static_board.EDGE_VERTEX[edge]:
+            extend(end, {edge}, 1)
+    return best
+
+
+def is_forest(board, player_id: int) -> bool:
+    # No loop in the player's roads (ignoring cuts)
+    parent = {}
+
+    def find(vertex: int) -> int:
+        while parent.setdefault(vertex, vertex) != vertex:
+            vertex = parent[vertex]
+        return vertex
+
+    for edge in board.edges:
+        if edge.owner == player_id:
+            a, b = (find(vertex) for vertex in static_board.EDGE_VERTEX[edge.id])
+            if a == b:
+                return False
+            parent[a] = b
+    return True
+
+
+def ring_order(tile_id: int) -> list[int]:
+    # The edges of a tile, each one next to the one before
+    ring = list(static_board.TILE_EDGE[tile_id])
+    ordered = [ring.pop(0)]
+    while ring:
+        following = next(edge for edge in ring if edge in static_board.EDGE_EDGE[ordered[-1]])
+        ring.remove(following)
+        ordered.append(following)
+    return ordered
+
+
+def legacy_longest(board, player_id: int) -> int:
+    players = {player_id: {}}
+    calculate_longest_road(board, player_id, players)
+    return players[player_id]["longest_road_length"]
+
+
+def check_player(board, network: RoadNetwork, player_id: int) -> None:
+    rebuilt = RoadNetwork()
+    rebuilt.rebuild(board, [player_id])
+    exact = brute_force_longest(board, player_id)
+    assert network.longest_road(player_id) == rebuilt.longest_road(player_id) == exact
+    assert sorted(map(sorted, network.components.get(player_id, []))) == sorted(map(sorted, rebuilt.components[player_id]))
+    # The old DFS is exact on trees and can only undercount through loops
+    legacy = legacy_longest(board, player_id)
+    if is_forest(board, player_id):
+        assert legacy == exact
+    else:
+        assert legacy <= exact
+
+
+def test_loop_scores_full_trail():
+    # Three rings around adjacent tiles: the old DFS misses a road the exact search uses
+    board = Board()
+    edges = dense_roads(board)
+    network = RoadNetwork()
+    for edge in edges:
+        network.add_road(board, 1, edge)
+        check_player(board, network, 1)
+    assert network.longest_road(1) == 14
+    assert legacy_longest(board, 1) == 13
+
+
+def test_ring_and_tail():
+    # A closed ring of six roads is a trail of six; a tail at a corner adds to it
+    board = Board()
+    network = RoadNetwork()
+    ring = static_board.TILE_EDGE[9]
+    for edge in ring:
+        board.edges[edge].owner = 1
+        network.add_road(board, 1, edge)
+    assert network.longest_road(1) == 6
+    corner = static_board.TILE_VERTEX[9][0]
+    tail = next(edge for edge in static_board.VERTEX_EDGE[corner] if edge not in ring)
+    board.edges[tail].owner = 1
+    network.add_road(board, 1, tail)
+    assert network.longest_road(1) == 7
+    check_player(board, network, 1)
+
+
+def test_settlement_cuts_road():
+    # An opponent settlement in the middle of a line splits it, only the longer half counts
+    board = Board()
+    network = RoadNetwork()
+    line = ring_order(9)[:5]
+    for edge in line:
+        board.edges[edge].owner = 1
+        network.add_road(board, 1, edge)
+    assert network.longest_road(1) == 5
+    # the vertex shared by the 2nd and 3rd road of the line
+    vertex = (set(static_board.EDGE_VERTEX[line[1]]) & set(static_board.EDGE_VERTEX[line[2]])).pop()
+    board.vertices[vertex].owner = 2
+    board.vertices[vertex].building = "settlement"
+    assert network.add_settlement(board, 2, vertex) == [1]
+    assert network.longest_road(1) == 3
+    assert len(network.components[1]) == 2
+    check_player(board, network, 1)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_random_roads_and_cuts(seed):
+    # Random roads grown next to each other (many loops) and random settlements on them (many cuts)
+    rng = random.Random(seed)
+    board = CompactBoard() if seed % 2 else Board()
+    network = RoadNetwork()
+    players = [1, 2, 3]
+    for _ in range(90):
+        player_id = rng.choice(players)
+        if rng.random() < 0.2:
+            empty = [vertex.id for vertex in board.vertices if vertex.owner is None]
+            vertex_id = rng.choice(empty)
+            board.vertices[vertex_id].owner = player_id
+            board.vertices[vertex_id].building = "settlement"
+            network.add_settlement(board, player_id, vertex_id)
+        else:
+            own = {edge.id for edge in board.edges if edge.owner == player_id}
+            nearby = [edge for road in own for edge in static_board.EDGE_EDGE[road] if board.edges[edge].owner is None]
+            empty = nearby or [edge.id for edge in board.edges if edge.owner is None]
+            if not empty:
+                continue
+            edge_id = rng.choice(empty)
+            board.edges[edge_id].owner = player_id
+            network.add_road(board, player_id, edge_id)
+        for pid in players:
+            check_player(board, network, pid)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_self_play_matches_rebuild(seed):
+    # Random legal self-play: the incremental network and longest_road_length agree with a full rebuild
+    game = Game(compact_board=seed % 2 == 1, seed=seed)
+    for player_id in range(1, 5):
+        game.add_player(player_id)
+    game.start_game()
+    rng = random.Random(seed)
+    for _ in range(600):
+        player_id = game.waiting_for()[0]
+        legal = [i for i, ok in enumerate(game.legal_actions(player_id)) if ok]
+        legal = [i for i in legal if i not in (action_space.DISCARD_RESOURCES, action_space.PROPOSE_TRADE)]
+        if not legal:
+            break
+        result = game.call_action(player_id, action_space.decode_action(rng.choice(legal), port_ratios_for_player(player_id, game.players)), return_state=False)
+        for pid in game.players:
+            check_player(game.board, game.road_network, pid)
+            assert game.players[pid]["longest_road_length"] == game.road_network.longest_road(pid)
+        if result is not True and result is not False:
+            break
@@ -0,0 +1,59 @@
+from fastapi.testclient import TestClient
+
+from server import server
+from server.server import GAMES, app
+
+ORIGIN = {"origin": server.ALLOWED_ORIGINS[0]}
+
+
+def receive_until(ws, key: str) -> dict:
+    while True:
+        message = ws.receive_json()
+        if key in message:
+            return message
+
+
+def test_reconnect_then_stale_disconnect_keeps_player():
+    # A reconnect replaces the old session, the old socket going away later must not remove the player
+    with TestClient(app) as client:
+        game_id = client.post("/create").json()["game_id"]
+        client.post("/join", json={"game_id": game_id})
+        with client.websocket_connect(f"/ws/{game_id}/1", headers=ORIGIN) as stale, \
+             client.websocket_connect(f"/ws/{game_id}/2", headers=ORIGIN) as other:
+            assert client.post(f"/game/{game_id}/start", json={"game_id": game_id}).status_code == 200
+            receive_until(stale, "players")
+            receive_until(other, "players")
+
+            with client.websocket_connect(f"/ws/{game_id}/1", headers=ORIGIN) as fresh:
+                receive_until(fresh, "players")
+                stale.close()
+                receive_until(fresh, "players") # the game state after the reconnect
+
+                assert GAMES[game_id]["game_state"] is True
+                assert sorted(GAMES[game_id]["actor"].game.players) == [1, 2]
+                assert GAMES[game_id]["websockets"][1] is not None
+
+        GAMES.pop(game_id, None)
+
+
+def test_disconnect_while_starting(monkeypatch):
+    # A player leaving while start_game still sends the first states finds the game and its actor
+    original = server.broadcast
+    left = []
+
+    async def broadcast(connections, message):
+        if message == {"game_state": "True"} and not left:
+            left.append(game_id)
+            await server.leave_game(game_id, 2, GAMES[game_id]["websockets"][2])
+        await original(connections, message)
+
+    monkeypatch.setattr(server, "broadcast", broadcast)
+    with TestClient(app) as client:
+        game_id = client.post("/create").json()["game_id"]
+        client.post("/join", json={"game_id": game_id})
+        with client.websocket_connect(f"/ws/{game_id}/1", headers=ORIGIN), \
+             client.websocket_connect(f"/ws/{game_id}/2", headers=ORIGIN):
+            assert client.post(f"/game/{game_id}/start", json={"game_id": game_id}).status_code == 200
+            assert left == [game_id]
+            assert list(GAMES[game_id]["actor"].game.players) == [1]
+        GAMES.pop(game_id, None)
@@ -0,0 +1,41 @@
+import json
+
+from benchmarks.wire import frames
+from server import wire
+
+
+def as_json(frame: dict) -> dict:
+    # What a JSON client gets, with the own player record parsed like decode_frame returns it
+    frame = json.loads(json.dumps(frame))
+    players = (frame.get("changes") or frame).get("players", {})
+    for player_id, entry in players.items():
+        if isinstance(entry, str):
+            players[player_id] = json.loads(entry)
+    return frame
+
+
+def test_frames_round_trip():
+    for frame in frames().values():
+        assert as_json(wire.decode_frame(wire.encode_frame(frame))) == as_json(frame)
+
+
+def test_large_counts_fall_back_to_the_tail():
+    # A bank or hand count above 255 does not fit a byte, the section is sent as JSON
+    frame = frames()["full_state"]
+    frame["bank"] = dict(frame["bank"], wood=300)
+    own = next(player_id for player_id, entry in frame["players"].items() if isinstance(entry, str))
+    record = json.loads(frame["players"][own])
+    record["hand"]["ore"] = 256
+    frame["players"][own] = json.dumps(record)
+    data = wire.encode_frame(frame)
+    _, _, _, _, _, mask = wire.HEADER.unpack_from(data)
+    assert mask & wire.TAIL and not mask & wire.BANK and not mask & wire.PLAYERS
+    assert as_json(wire.decode_frame(data)) == as_json(frame)
+
+
+def test_trade_pending_is_a_forced_action():
+    frame = dict(frames()["full_state"], forced_action="Trade Pending")
+    data = wire.encode_frame(frame)
+    _, _, _, _, _, mask = wire.HEADER.unpack_from(data)
+    assert mask & wire.SCALAR_BITS["forced_action"] # a byte, not the JSON tail
+    assert wire.decode_frame(data)["forced_action"] == "Trade Pending"